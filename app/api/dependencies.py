@@ -1,27 +1,81 @@
 """
 This module contains the dependencies for the API.
 """
+from typing import Union
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.schemas.token import TokenData
+from app.utils.cache import principal_cache
+from app.utils.concurrency import run_service
 from app.utils.oauth import OAuth
-from app.utils.token import Token
-from app.db.database import get_db
-from app.repositories.user_respository import UserRepository
-from app.repositories.auth_repository import AuthRepository
-from app.services.user_service import UserService
-from app.services.auth_service import AuthService
+from app.utils.token import Token, token_cache
+from app.db.database import get_db, get_async_db
+from app.repositories.user_respository import UserRepository, AsyncUserRepository
+from app.repositories.auth_repository import AuthRepository, AsyncAuthRepository
+from app.services.user_service import UserService, AsyncUserService
+from app.services.auth_service import AuthService, AsyncAuthService
 
 # Instancia global para extraer tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 # Instancia de OAuth
-oauth_service = OAuth(Token())
+oauth_service = OAuth(Token(), token_cache)
+
+
+def get_sync_user_service(db: Session = Depends(get_db)) -> UserService:
+    """
+    Function to get user service
+    :param db:
+    :param UserService:
+    """
+    repo = UserRepository(db)
+    return UserService(repo)
+
+
+def get_async_user_service(db: AsyncSession = Depends(get_async_db)) -> AsyncUserService:
+    """
+    Function to get async user service
+    :param db:
+    :param AsyncUserService:
+    """
+    repo = AsyncUserRepository(db)
+    return AsyncUserService(repo)
+
+
+def get_sync_auth_service(db: Session = Depends(get_db)) -> AuthService:
+    """
+    Function to get auth service
+    :param db:
+    :param AuthService:
+    """
+    repo = AuthRepository(db)
+    return AuthService(repo)
+
+
+def get_async_auth_service(db: AsyncSession = Depends(get_async_db)) -> AsyncAuthService:
+    """
+    Function to get async auth service
+    :param db:
+    :param AsyncAuthService:
+    """
+    repo = AsyncAuthRepository(db)
+    return AsyncAuthService(repo)
+
 
+# El stack (sync o async) se elige por configuración (DB_ASYNC)
+get_user_service = get_async_user_service if settings.DB_ASYNC else get_sync_user_service
+get_auth_service = get_async_auth_service if settings.DB_ASYNC else get_sync_auth_service
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> TokenData:
+
+async def get_current_user(
+        token: str = Depends(oauth2_scheme),
+        user_service: Union[UserService, AsyncUserService] = Depends(get_user_service),
+) -> TokenData:
     """
     Función que inyecta la dependencia para los endpoints.
     """
@@ -36,15 +90,21 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Verificar si el usuario existe en la base de datos
-        user_service = get_user_service(db)
-        if not user_service.get_user_by_id(current_user.id):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        if not current_user.active:
+        # Verificar si el usuario existe: primero en la cache de principals, luego en la base de datos.
+        # La versión se lee antes de la consulta: si un delete/update invalida en el medio, lo leído
+        # se guarda bajo la versión vieja y no se vuelve a servir
+        version = principal_cache.version(current_user.id)
+        principal = principal_cache.get(current_user.id, version)
+        if principal is None:
+            user = await run_service(user_service.get_user_by_id, current_user.id)
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            principal = principal_cache.set(user, version)
+        if not current_user.active or not principal.active:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Inactive user",
@@ -58,22 +118,3 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail=str(e),
             headers={"WWW-Authenticate": "Bearer"},
         )
-
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    """
-    Function to get user service
-    :param db:
-    :param UserService:
-    """
-    repo = UserRepository(db)
-    return UserService(repo)
-
-
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    """
-    Function to get auth service
-    :param db:
-    :param AuthService:
-    """
-    repo = AuthRepository(db)
-    return AuthService(repo)
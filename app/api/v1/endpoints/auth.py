@@ -1,28 +1,114 @@
 """
 This module contains the endpoints for the authentication
 """
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 
+from app.core.config import settings
+from app.core.exceptions import InvalidRefreshTokenError, RateLimitExceededError, ServiceOverloadedError
+from app.core.instrumentation import query_budget
 from app.services.auth_service import AuthService
 from app.api.dependencies import get_auth_service
-from app.schemas.token import TokenResponse
+from app.schemas.token import RefreshRequest, TokenResponse
+from app.utils.concurrency import run_service
+from app.utils.rate_limit import login_limiter
 
 auth_router = APIRouter(prefix='/auth', tags=['Auth'])
 
+
+def _throttle_login(request: Request, username: str) -> None:
+    """
+    Count the attempt by client IP and by username, rejecting it with 429 when over the limit.
+    Runs before any database lookup or password hashing
+    :param request: Request
+    :param username: str
+    """
+    if login_limiter is None:
+        return
+    try:
+        login_limiter.check("ip", request.client.host if request.client else "unknown", settings.LOGIN_RATE_LIMIT_PER_IP)
+        login_limiter.check("username", username, settings.LOGIN_RATE_LIMIT_PER_USERNAME)
+    except RateLimitExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
 @auth_router.post('/login',
                   status_code=status.HTTP_200_OK,
                   response_model=TokenResponse)
+@query_budget(3)  # SELECT del usuario + INSERT del refresh token (+ UPDATE si se re-hashea)
 async def get_login(
+        request: Request,
         login: OAuth2PasswordRequestForm = Depends(),
         auth_service: AuthService = Depends(get_auth_service)
 ):
     """
     Get a token
+    :param request:
     :param login:
     :param auth_service:
     :return: dict: token
     """
-
-    jwt = auth_service.auth_user(login)
+    # Usernames en minúscula y acotados: variantes del mismo nombre comparten el límite
+    username = login.username.lower()[:64]
+    _throttle_login(request, username)
+    try:
+        jwt = await run_service(auth_service.auth_user, login)
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+    if login_limiter is not None:
+        login_limiter.reset("username", username)
     return jwt
+
+
+def _invalid_refresh_token(e: InvalidRefreshTokenError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=str(e),
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+@auth_router.post('/refresh',
+                  status_code=status.HTTP_200_OK,
+                  response_model=TokenResponse)
+@query_budget(3)  # rotación (UPDATE) + usuario + INSERT del nuevo refresh token
+async def refresh_token(
+        body: RefreshRequest,
+        auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Exchange a refresh token for a new access and refresh token pair.
+    The presented refresh token is revoked; presenting it again revokes all its descendants
+    :param body: RefreshRequest
+    :param auth_service:
+    :return: dict: token
+    """
+    try:
+        return await run_service(auth_service.refresh, body.refresh_token)
+    except InvalidRefreshTokenError as e:
+        raise _invalid_refresh_token(e)
+
+
+@auth_router.post('/revoke', status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(1)
+async def revoke_token(
+        body: RefreshRequest,
+        auth_service: AuthService = Depends(get_auth_service)
+):
+    """
+    Revoke a refresh token and the tokens rotated from the same login (logout)
+    :param body: RefreshRequest
+    :param auth_service:
+    :return: None
+    """
+    try:
+        await run_service(auth_service.revoke, body.refresh_token)
+    except InvalidRefreshTokenError as e:
+        raise _invalid_refresh_token(e)
@@ -0,0 +1,23 @@
+"""
+JSON Web Key Set endpoint, so other services verify our tokens offline
+"""
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.instrumentation import query_budget
+from app.utils.keyring import get_key_ring
+
+jwks_router = APIRouter(tags=['Auth'])
+
+# Los verificadores pueden cachear el documento; una clave nueva se publica antes de activarla
+JWKS_MAX_AGE = 300
+
+
+@jwks_router.get('/.well-known/jwks.json')
+@query_budget(0)
+async def get_jwks():
+    """
+    Public keys of the key ring with their kid. Empty when tokens are signed with a shared secret
+    :return: JSONResponse
+    """
+    return JSONResponse(get_key_ring().jwks(), headers={"Cache-Control": f"public, max-age={JWKS_MAX_AGE}"})
@@ -0,0 +1,22 @@
+"""
+Metrics endpoint
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.instrumentation import query_budget
+from app.core.metrics import metrics
+
+metrics_router = APIRouter(tags=['Metrics'])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@metrics_router.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+@query_budget(0)
+async def get_metrics():
+    """
+    Export every registered metric in the Prometheus text format
+    :return: PlainTextResponse
+    """
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,18 +1,29 @@
 """
 User endpoints
 """
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Request, status, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import EmailStr
 
+from app.core.config import settings
 from app.core.exceptions import *
+from app.core.instrumentation import query_budget
 from app.schemas.pagination import PaginationParams
 from app.schemas.token import TokenData
 from app.schemas.user import UserCreate, UserResponse, UserUpdate, UserPaginatedResponse
+from app.repositories.user_respository import EXPORT_COLUMNS
 from app.services.user_service import UserService
 from app.api.dependencies import get_user_service
 from app.api.dependencies import get_current_user
+from app.utils.bulk import import_format, import_report, iter_rows
+from app.utils.cache import response_cache
+from app.utils.conditional import cached_response, conditional_response, page_etag, user_etag
+from app.utils.concurrency import run_service
+from app.utils.export import EXPORT_MEDIA_TYPES, encode_rows
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.responses import ModelResponse, RequestStreamingResponse
 
 user_router = APIRouter(prefix='/users', tags=['Users'])
 
@@ -23,6 +34,7 @@ user_router = APIRouter(prefix='/users', tags=['Users'])
     response_model=UserResponse,
     response_description="User created successfully"
 )
+@query_budget(1)
 async def create_user(
         user: UserCreate,
         user_service: UserService = Depends(get_user_service),
@@ -35,7 +47,7 @@ async def create_user(
         :return: UserResponse
     """
     try:
-        new_user = user_service.create_user(user)
+        new_user = await run_service(user_service.create_user, user)
     except UserAlreadyExistsError as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -46,13 +58,59 @@ async def create_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except RepositoryError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-    return new_user
+    return ModelResponse(new_user, status_code=status.HTTP_201_CREATED)
+
+@user_router.post(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_class=RequestStreamingResponse,
+    response_description="Per-row import report (NDJSON)"
+)
+@query_budget(None, max_repeats=None)  # 2 statements por lote, crece con el import
+async def bulk_create_users(
+        request: Request,
+        user_service: UserService = Depends(get_user_service),
+        current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Create users in bulk from an NDJSON or CSV body, streamed in batches
+        :param request: Request
+        :param user_service: UserService
+        :param current_user: TokenData
+        :return: StreamingResponse with one NDJSON result per row and a final summary
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers can import users"
+        )
+
+    fmt = import_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use application/x-ndjson or text/csv"
+        )
+
+    async def import_batch(batch):
+        return await run_service(user_service.import_users, batch)
+
+    # El cuerpo se lee mientras se envía el reporte: cada lote se reporta apenas se confirma
+    rows = iter_rows(request.stream(), fmt, settings.BULK_IMPORT_MAX_LINE_BYTES)
+    report = import_report(rows, import_batch, settings.BULK_IMPORT_BATCH_SIZE)
+    return RequestStreamingResponse(report, media_type="application/x-ndjson")
 
 @user_router.get(
     "/",
@@ -60,38 +118,98 @@ async def create_user(
     response_model=UserPaginatedResponse,
     response_description="List of users"
 )
+@query_budget(4)  # principal + página con total + count/estimado de respaldo
 async def get_users(
+        request: Request,
         pagination: PaginationParams = Depends(),
         user_service: UserService = Depends(get_user_service),
         current_user: TokenData = Depends(get_current_user),
 ):
     """
-    Get a list of users
+    Get a list of users. Answers 304 when If-None-Match has the ETag of the page
+        :param request: Request
         :param pagination:
         :param user_service: UserService
         :param current_user: TokenData
         :return: list[UserResponse]
     """
+    cache_key = response_cache.key("users", sorted(request.query_params.multi_items()))
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        return cached
+
     limit = pagination.limit
     offset = pagination.offset
+    count_mode = pagination.count if pagination.include_total else None
     try:
-        users, count = user_service.get_users(limit, offset)
-        metadata = {
-            "total_count": count,
-            "limit": limit,
-            "offset": offset,
-            "current_page": (offset // limit) + 1,
-            "total_pages": (count // limit) + (1 if count % limit > 0 else 0),
-        }
+        if pagination.mode == "cursor" or pagination.cursor is not None:
+            after_id = decode_cursor(pagination.cursor) if pagination.cursor else None
+            users, next_after_id, count, count_kind = await run_service(
+                user_service.get_users_after, after_id, limit, count_mode
+            )
+            metadata = {
+                "total_count": count,
+                "count_kind": count_kind,
+                "limit": limit,
+                "next_cursor": encode_cursor(next_after_id),
+            }
+        else:
+            users, count, count_kind = await run_service(user_service.get_users, limit, offset, count_mode)
+            metadata = {
+                "total_count": count,
+                "count_kind": count_kind,
+                "limit": limit,
+                "offset": offset,
+                "current_page": (offset // limit) + 1,
+                "total_pages": None if count is None else (count // limit) + (1 if count % limit > 0 else 0),
+            }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except RepositoryError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-    users_response = UserPaginatedResponse(metadata=metadata, data=users)
+    return conditional_response(
+        request, page_etag(users, metadata),
+        lambda: UserPaginatedResponse(metadata=metadata, data=users).model_dump_json(), cache_key,
+    )
+
+@user_router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    response_description="Every user, streamed as NDJSON or CSV"
+)
+@query_budget(2)
+async def export_users(
+        format: Literal["ndjson", "csv"] = "ndjson",
+        user_service: UserService = Depends(get_user_service),
+        current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Export every user with constant memory
+        :param format: ndjson | csv
+        :param user_service: UserService
+        :param current_user: TokenData
+        :return: StreamingResponse
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers can export users"
+        )
 
-    return users_response
+    rows = user_service.export_users(settings.EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        encode_rows(rows, EXPORT_COLUMNS, format, settings.EXPORT_BATCH_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
 
 @user_router.get(
     "/{user_id}",
@@ -99,32 +217,43 @@ async def get_users(
     response_model=UserResponse,
     response_description="User retrieved successfully"
 )
+@query_budget(2)
 async def get_user_by_id(
         user_id: int,
+        request: Request,
         user_service: UserService = Depends(get_user_service),
         current_user: TokenData = Depends(get_current_user),
 ):
     """
-    Get a user by id
+    Get a user by id. Answers 304 when If-None-Match has the ETag of the user
         :param user_id: int
+        :param request: Request
         :param user_service: UserService
         :param current_user: TokenData
         :return: UserResponse
     """
+    cache_key = response_cache.key("user", user_id)
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        user = user_service.get_user_by_id(user_id)
+        user = await run_service(user_service.get_user_by_id, user_id)
     except ItemNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
-    return user
+    return conditional_response(
+        request, user_etag(user), lambda: UserResponse.model_validate(user).model_dump_json(), cache_key
+    )
 
 @user_router.delete(
     "/{user_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     response_description="User deleted successfully"
 )
+@query_budget(3)
 async def delete_user(
         user_id: int,
         user_service: UserService = Depends(get_user_service),
@@ -146,7 +275,7 @@ async def delete_user(
         )
 
     try:
-        response = user_service.delete_user(user_id)
+        response = await run_service(user_service.delete_user, user_id)
     except RepositoryError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -161,6 +290,7 @@ async def delete_user(
     response_model=UserResponse,
     response_description="User updated successfully"
 )
+@query_budget(2)  # principal + UPDATE ... RETURNING
 async def update_user(
         user_id: int,
         user: UserUpdate,
@@ -184,7 +314,7 @@ async def update_user(
         )
 
     try:
-        updated_user = user_service.update_user(user_id, user)
+        updated_user = await run_service(user_service.update_user, user_id, user)
     except ItemNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -195,13 +325,20 @@ async def update_user(
             status_code=status.HTTP_409_CONFLICT,
             detail=str(e)
         )
+    except ServiceOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except RepositoryError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-    return updated_user
+    # El service devuelve la fila del RETURNING: se valida una sola vez aquí
+    return ModelResponse(UserResponse.model_validate(updated_user))
 
 @user_router.get(
     "/email/{email}",
@@ -209,21 +346,28 @@ async def update_user(
     response_model=Optional[UserResponse],
     response_description="User retrieved successfully"
 )
+@query_budget(2)
 async def get_user_by_email(
         email: EmailStr,
+        request: Request,
         user_service: UserService = Depends(get_user_service),
         current_user: TokenData = Depends(get_current_user),
 ):
     """
-    Get a user by email
+    Get a user by email. Answers 304 when If-None-Match has the ETag of the user
         :param email: EmailStr
+        :param request: Request
         :param user_service: UserService
         :param current_user: TokenData
         :return: UserResponse
     """
+    cache_key = response_cache.key("email", email)
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        return cached
 
     try:
-        user = user_service.get_user_by_email(email)
+        user = await run_service(user_service.get_user_by_email, email)
     except ItemNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -235,4 +379,6 @@ async def get_user_by_email(
             detail=str(e)
         )
 
-    return user
\ No newline at end of file
+    return conditional_response(
+        request, user_etag(user), lambda: UserResponse.model_validate(user).model_dump_json(), cache_key
+    )
\ No newline at end of file
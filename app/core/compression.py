@@ -0,0 +1,302 @@
+"""
+Response compression: ASGI middleware negotiating gzip, br or zstd from Accept-Encoding.
+gzip is in the standard library; br needs the 'brotli' package and zstd the 'zstandard' package
+"""
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+ENCODINGS = ("gzip", "br", "zstd")
+
+compression_input_bytes = metrics.counter(
+    "http_response_compression_input_bytes_total", "Response bytes before compression by encoding", ("encoding",)
+)
+compression_output_bytes = metrics.counter(
+    "http_response_compression_output_bytes_total", "Response bytes sent after compression by encoding", ("encoding",)
+)
+compression_ratio = metrics.histogram(
+    "http_response_compression_ratio", "Uncompressed to compressed size of each compressed response", ("encoding",),
+    buckets=(1, 1.5, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+
+
+class CompressionStream(ABC):
+    """
+    Compressor of one response body
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """
+        Method to compress the next chunk of the body
+        :param data: bytes
+        :param final: bool, True for the last chunk: ends the stream
+        :return: bytes the client can already decode (flushed)
+        """
+        pass
+
+
+class GzipStream(CompressionStream):
+    def __init__(self, level: int):
+        # wbits 31: formato gzip (header y CRC), no zlib crudo
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliStream(CompressionStream):
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self._compressor.process(data)
+        return chunk + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class ZstdStream(CompressionStream):
+    def __init__(self, compressobj, flush_block: int, flush_finish: int):
+        self._compressobj = compressobj
+        self._flush_block = flush_block
+        self._flush_finish = flush_finish
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self._compressobj.compress(data)
+        return chunk + self._compressobj.flush(self._flush_finish if final else self._flush_block)
+
+
+def codec(encoding: str, level: int) -> Callable[[], CompressionStream]:
+    """
+    Factory of compression streams for an encoding, importing its optional dependency now
+    :param encoding: gzip | br | zstd
+    :param level: int compression level of the encoding
+    :return: callable building a new CompressionStream per response
+    """
+    if encoding == "gzip":
+        return lambda: GzipStream(level)
+    if encoding == "br":
+        try:
+            import brotli
+        except ImportError as e:
+            raise RuntimeError("The br encoding requires the 'brotli' package") from e
+        return lambda: BrotliStream(brotli.Compressor(quality=level))
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("The zstd encoding requires the 'zstandard' package") from e
+        compressor = zstandard.ZstdCompressor(level=level)
+        return lambda: ZstdStream(
+            compressor.compressobj(), zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+        )
+    raise ValueError(f"Invalid compression encoding: {encoding}")
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, available: tuple[str, ...]) -> Optional[str]:
+    """
+    Pick the encoding with the highest q-value in Accept-Encoding; ties go to the server preference order
+    :param accept_encoding: str header value
+    :param available: encodings in server preference order
+    :return: str | None to send the body as is
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for name in available:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def compression_options() -> dict:
+    """
+    Keyword arguments of CompressionMiddleware from settings. Fails now if an encoding is unknown
+    or its package is missing, not on the first request
+    :return: dict
+    """
+    levels = {
+        "gzip": settings.COMPRESSION_GZIP_LEVEL,
+        "br": settings.COMPRESSION_BROTLI_LEVEL,
+        "zstd": settings.COMPRESSION_ZSTD_LEVEL,
+    }
+    encodings = [name.strip() for name in settings.COMPRESSION_ENCODINGS.split(",") if name.strip()]
+    for name in encodings:
+        if name not in levels:
+            raise ValueError(f"Invalid compression encoding: {name}, expected some of {ENCODINGS}")
+    return {
+        "codecs": {name: codec(name, levels[name]) for name in encodings},
+        "minimum_size": settings.COMPRESSION_MIN_SIZE,
+        "content_types": tuple(
+            prefix.strip() for prefix in settings.COMPRESSION_CONTENT_TYPES.split(",") if prefix.strip()
+        ),
+    }
+
+
+class _EncodingSeries:
+    """
+    Labeled children of the compression metrics for one encoding, resolved once
+    """
+    __slots__ = ("input_bytes", "output_bytes", "ratio")
+
+    def __init__(self, encoding: str):
+        self.input_bytes = compression_input_bytes.labels(encoding)
+        self.output_bytes = compression_output_bytes.labels(encoding)
+        self.ratio = compression_ratio.labels(encoding)
+
+    def observe(self, input_bytes: int, output_bytes: int) -> None:
+        self.input_bytes.inc(input_bytes)
+        self.output_bytes.inc(output_bytes)
+        self.ratio.observe(input_bytes / max(1, output_bytes))
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses whose content type starts with one of `content_types`.
+    A complete body under `minimum_size` bytes, or one that does not shrink, is sent as is; a streamed body
+    (StreamingResponse) is compressed chunk by chunk, each chunk flushed so the client gets it right away.
+    304, 204 and already encoded responses and `Cache-Control: no-transform` are left alone
+    """
+    def __init__(self, app, codecs: dict[str, Callable[[], CompressionStream]], minimum_size: int = 1024,
+                 content_types: tuple[str, ...] = ("application/json",)):
+        """
+        :param app: ASGI app
+        :param codecs: stream factory per encoding, in server preference order (see codec())
+        :param minimum_size: int bytes
+        :param content_types: content type prefixes to compress
+        """
+        self.app = app
+        self.codecs = codecs
+        self.available = tuple(codecs)
+        self.minimum_size = minimum_size
+        self.content_types = content_types
+        self.series = {name: _EncodingSeries(name) for name in codecs}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        encoding = negotiate(accept_encoding, self.available) if accept_encoding else None
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compressible(self, status: int, headers: MutableHeaders) -> bool:
+        """
+        Method to check if a response may be compressed, whatever the client accepts
+        :param status: int
+        :param headers: MutableHeaders of the response
+        :return: bool
+        """
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        return headers.get("content-type", "").startswith(self.content_types)
+
+
+class _CompressionResponder:
+    """
+    send() wrapper of one response: holds the start message until the first body chunk decides the encoding
+    """
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start = None
+        self.stream: Optional[CompressionStream] = None
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start = message
+            return
+        if message_type != "http.response.body":
+            await self._send(message)
+            return
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self._first_body(start, message)
+        elif self.stream is not None:
+            await self._compress(message)
+        else:
+            await self._send(message)
+
+    async def _first_body(self, start, message):
+        headers = MutableHeaders(scope=start)
+        if not self.middleware.compressible(start["status"], headers):
+            await self._send(start)
+            await self._send(message)
+            return
+        # Caches intermedios: la representación depende del Accept-Encoding aunque esta vez no se comprima
+        headers.add_vary_header("Accept-Encoding")
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoding is None or (not more_body and len(body) < self.middleware.minimum_size):
+            await self._send(start)
+            await self._send(message)
+            return
+        content_length = headers.get("content-length")
+        if more_body and content_length is not None and int(content_length) < self.middleware.minimum_size:
+            await self._send(start)
+            await self._send(message)
+            return
+
+        stream = self.middleware.codecs[self.encoding]()
+        if not more_body:
+            compressed = stream.compress(body, final=True)
+            if len(compressed) >= len(body):
+                await self._send(start)
+                await self._send(message)
+                return
+            self._set_encoding(headers)
+            headers["content-length"] = str(len(compressed))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": compressed})
+            self.middleware.series[self.encoding].observe(len(body), len(compressed))
+            return
+
+        self.stream = stream
+        self._set_encoding(headers)
+        del headers["content-length"]
+        await self._send(start)
+        await self._compress(message)
+
+    def _set_encoding(self, headers: MutableHeaders) -> None:
+        headers["content-encoding"] = self.encoding
+        # Otro cuerpo en bytes: un ETag fuerte pasa a ser débil
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+
+    async def _compress(self, message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        compressed = self.stream.compress(body, final=not more_body)
+        self.input_bytes += len(body)
+        self.output_bytes += len(compressed)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+        if not more_body:
+            self.middleware.series[self.encoding].observe(self.input_bytes, self.output_bytes)
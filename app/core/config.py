@@ -1,41 +1,210 @@
 """
-This module contains the settings for the application
+This module contains the settings for the application.
+Defining them reads nothing: they are validated and built once by get_settings(), on the first access to
+`settings`, which happens when the app modules are imported (they do `from app.core.config import settings`)
 """
 import os
-from pathlib import Path
+from functools import lru_cache
+from typing import Literal, Optional
+
 from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from sqlalchemy.engine import URL
+
+
+# Backends que cada escritura invalida o actualiza: con varios workers tienen que ser compartidos
+INVALIDATED_BACKENDS = ('PRINCIPAL_CACHE_BACKEND', 'RESPONSE_CACHE_BACKEND', 'USERNAME_FILTER_BACKEND')
+
+
+def _cpu_count() -> int:
+    return os.cpu_count() or 1
 
-env_path = Path('.') / '.env.test'
-print(f'Loading environment variables from: {env_path}')
-load_dotenv(dotenv_path=env_path)
 
-class Settings:
+class Settings(BaseModel):
     """
-    Settings for the application
+    Settings for the application, one field per environment variable.
+    Values are parsed and validated when the settings are built, an invalid value fails at startup
     """
-    DB = os.getenv('DB')
-    DB_USER: str = os.getenv('DB_USER')
-    DB_PASSWORD: str = os.getenv('DB_PASSWORD')
-    DB_NAME: str = os.getenv('DB_NAME')
-    DB_HOST: str = os.getenv('DB_HOST')
-    DB_PORT: int = os.getenv('DB_PORT')
-    SQLALCHEMY_DATABASE_URI: str = (
-        f'{DB}://{DB_USER}:{DB_PASSWORD}@'
-        f'{DB_HOST}:{DB_PORT}/{DB_NAME}'
-    )
+    model_config = ConfigDict(extra='ignore')
+
+    DB: str = 'postgresql+psycopg2'
+    DB_USER: Optional[str] = None
+    DB_PASSWORD: Optional[str] = None
+    DB_NAME: Optional[str] = None
+    DB_HOST: Optional[str] = None
+    DB_PORT: Optional[int] = Field(None, ge=1, le=65535)
+    # Se arma con los DB_* si no se define
+    SQLALCHEMY_DATABASE_URI: Optional[str] = None
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = False
-    SECRET_KEY: str = os.getenv('SECRET_KEY')
-    ALGORITHM: str = os.getenv('ALGORITHM')
+    # Pool de conexiones
+    DB_POOL_SIZE: int = Field(5, ge=1)
+    DB_MAX_OVERFLOW: int = Field(10, ge=0)
+    DB_POOL_TIMEOUT: float = Field(30, gt=0)
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = Field(0, ge=0)
+    # Modo async: usa AsyncEngine/AsyncSession en los endpoints
+    DB_ASYNC: bool = False
+    DB_ASYNC_DRIVER: str = 'postgresql+asyncpg'
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None
+    # Pool de hashing de contraseñas (bcrypt fuera del event loop)
+    HASH_POOL_KIND: Literal['thread', 'process'] = 'thread'
+    HASH_POOL_WORKERS: int = Field(default_factory=_cpu_count, ge=1)
+    HASH_POOL_QUEUE_SIZE: int = Field(32, ge=0)
+    # Esquema de los hashes nuevos; los hashes de otros esquemas se re-hashean en el próximo login
+    PASSWORD_SCHEME: Literal['bcrypt', 'scrypt', 'argon2'] = 'bcrypt'
+    # Costo de bcrypt (2^rounds iteraciones) para los hashes nuevos
+    BCRYPT_ROUNDS: int = Field(12, ge=4, le=31)
+    # Costo de scrypt (N = 2^rounds, r=8, p=1)
+    SCRYPT_ROUNDS: int = Field(16, ge=1, le=24)
+    # Costo de argon2id: pasadas y memoria en KiB (requiere el paquete argon2-cffi)
+    ARGON2_ROUNDS: int = Field(3, ge=1)
+    ARGON2_MEMORY_COST: int = Field(65536, ge=8)
+    # Si se define, al arrancar se mide el hash en este host y se elige el costo más alto bajo este tiempo
+    PASSWORD_HASH_TARGET_MS: Optional[float] = Field(None, gt=0)
+    # Filas por lote en POST /users/bulk
+    BULK_IMPORT_BATCH_SIZE: int = Field(500, ge=1)
+    # Largo máximo de una línea del cuerpo de POST /users/bulk; una línea más larga se reporta como error de fila
+    BULK_IMPORT_MAX_LINE_BYTES: int = Field(64 * 1024, ge=1)
+    # Filas por round-trip del cursor de GET /users/export
+    EXPORT_BATCH_SIZE: int = Field(1000, ge=1)
+    # Cache de usuarios autenticados (memory | redis | none). Sin definir: memory con un solo worker, none con varios
+    PRINCIPAL_CACHE_BACKEND: Optional[Literal['memory', 'redis', 'none']] = None
+    PRINCIPAL_CACHE_TTL: float = Field(60, ge=0)
+    PRINCIPAL_CACHE_MAX_SIZE: int = Field(10000, ge=1)
+    CACHE_REDIS_URL: str = 'redis://localhost:6379/0'
+    # Cache de respuestas de las lecturas de usuarios (memory | redis | none); cualquier escritura la invalida
+    RESPONSE_CACHE_BACKEND: Literal['memory', 'redis', 'none'] = 'none'
+    RESPONSE_CACHE_TTL: float = Field(30, gt=0)
+    RESPONSE_CACHE_MAX_SIZE: int = Field(10000, ge=1)
+    # Máxima antigüedad (segundos) del total de usuarios con count=cached
+    USER_COUNT_CACHE_TTL: float = Field(30, ge=0)
+    # Cache de tokens ya verificados (0 la deshabilita)
+    TOKEN_CACHE_MAX_SIZE: int = Field(10000, ge=0)
+    # Compresión de respuestas: encodings en orden de preferencia (gzip, br, zstd), vacío la deshabilita.
+    # br requiere el paquete brotli y zstd el paquete zstandard
+    COMPRESSION_ENCODINGS: str = 'gzip'
+    # Cuerpos completos más chicos se envían sin comprimir: no compensa el CPU
+    COMPRESSION_MIN_SIZE: int = Field(1024, ge=0)
+    # Prefijos de content-type que se comprimen, separados por coma
+    COMPRESSION_CONTENT_TYPES: str = 'application/json,application/x-ndjson,text/'
+    COMPRESSION_GZIP_LEVEL: int = Field(6, ge=1, le=9)
+    COMPRESSION_BROTLI_LEVEL: int = Field(4, ge=0, le=11)
+    COMPRESSION_ZSTD_LEVEL: int = Field(3, ge=1, le=22)
+    # Middleware de métricas y endpoint /metrics
+    METRICS_ENABLED: bool = True
+    # Traza de SQL por request: presupuesto de queries por endpoint y detección de N+1
+    SQL_TRACE_ENABLED: bool = False
+    # Veces que un mismo statement puede repetirse en un request antes de marcarlo como N+1
+    SQL_REPEAT_THRESHOLD: int = Field(2, ge=1)
+    # Servidor (python -m app.server)
+    HOST: str = '0.0.0.0'
+    PORT: int = Field(8000, ge=1, le=65535)
+    WEB_CONCURRENCY: int = Field(default_factory=_cpu_count, ge=1)
+    SERVER_LOOP: Literal['auto', 'asyncio', 'uvloop'] = 'auto'
+    SERVER_HTTP: Literal['auto', 'h11', 'httptools'] = 'auto'
+    SERVER_BACKLOG: int = Field(2048, ge=1)
+    SERVER_KEEP_ALIVE: int = Field(5, ge=0)
+    SERVER_GRACEFUL_TIMEOUT: int = Field(30, ge=0)
+    LOG_LEVEL: Literal['critical', 'error', 'warning', 'info', 'debug', 'trace'] = 'info'
+    ACCESS_LOG: bool = False
+    # Superusuario inicial: `python -m app.db.initialize_db` o comprobación al arrancar
+    SUPERUSER_USERNAME: Optional[str] = None
+    SUPERUSER_EMAIL: Optional[str] = None
+    SUPERUSER_PASS: Optional[str] = None
+    SUPERUSER_ON_STARTUP: bool = False
+    # Límite de intentos de login por IP y por username en una ventana deslizante (memory | redis | none)
+    LOGIN_RATE_LIMIT_BACKEND: Literal['memory', 'redis', 'none'] = 'memory'
+    LOGIN_RATE_LIMIT_WINDOW: float = Field(60, gt=0)
+    LOGIN_RATE_LIMIT_PER_IP: int = Field(30, ge=1)
+    LOGIN_RATE_LIMIT_PER_USERNAME: int = Field(5, ge=1)
+    RATE_LIMIT_MAX_KEYS: int = Field(100000, ge=1)
+    # Filtro de Bloom de usernames existentes: rechaza logins de usernames inexistentes sin consultar la base
+    # (memory solo con WEB_CONCURRENCY=1, con varios workers se rechaza; redis se comparte con CACHE_REDIS_URL)
+    USERNAME_FILTER_BACKEND: Literal['memory', 'redis', 'none'] = 'none'
+    USERNAME_FILTER_CAPACITY: int = Field(1000000, ge=1)
+    USERNAME_FILTER_ERROR_RATE: float = Field(0.01, gt=0, lt=1)
+    # Se reconstruye desde la tabla users al arrancar y cada tantos segundos (0: solo al arrancar)
+    USERNAME_FILTER_REBUILD_SECONDS: float = Field(3600, ge=0)
+    # Tokens de acceso
+    # HS256 con SECRET_KEY, o claves RSA/ECDSA <kid>.pem en JWT_KEYS_DIR (firma con JWT_ACTIVE_KID)
+    SECRET_KEY: Optional[str] = Field(None, min_length=1)
+    ALGORITHM: Literal['HS256', 'HS384', 'HS512'] = 'HS256'
+    JWT_KEYS_DIR: Optional[str] = None
+    JWT_ACTIVE_KID: Optional[str] = None
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(30, ge=1)
+    # Los refresh tokens rotan en cada uso; cada rotación renueva la expiración
+    REFRESH_TOKEN_EXPIRE_DAYS: int = Field(14, ge=1)
+
+    @model_validator(mode='after')
+    def build_database_uris(self) -> 'Settings':
+        if self.SQLALCHEMY_DATABASE_URI is None:
+            self.SQLALCHEMY_DATABASE_URI = self._database_uri(self.DB)
+        if self.SQLALCHEMY_ASYNC_DATABASE_URI is None:
+            self.SQLALCHEMY_ASYNC_DATABASE_URI = self._database_uri(self.DB_ASYNC_DRIVER)
+        return self
+
+    @model_validator(mode='after')
+    def check_signing_key(self) -> 'Settings':
+        if not self.SECRET_KEY and not self.JWT_KEYS_DIR:
+            raise ValueError('SECRET_KEY is required unless JWT_KEYS_DIR is set')
+        return self
+
+    @model_validator(mode='after')
+    def check_invalidated_backends(self) -> 'Settings':
+        # Con memory cada worker tiene su copia y una escritura solo llega al worker que la hizo
+        if self.PRINCIPAL_CACHE_BACKEND is None:
+            self.PRINCIPAL_CACHE_BACKEND = 'memory' if self.WEB_CONCURRENCY == 1 else 'none'
+        if self.WEB_CONCURRENCY > 1:
+            for name in INVALIDATED_BACKENDS:
+                if getattr(self, name) == 'memory':
+                    raise ValueError(f'{name}=memory is per worker and WEB_CONCURRENCY={self.WEB_CONCURRENCY}: '
+                                     f'writes on one worker would not invalidate the others, use redis or none')
+        return self
+
+    def _database_uri(self, driver: str) -> str:
+        # URL.create escapa los caracteres especiales de usuario y contraseña
+        return URL.create(
+            driver, username=self.DB_USER, password=self.DB_PASSWORD,
+            host=self.DB_HOST, port=self.DB_PORT, database=self.DB_NAME,
+        ).render_as_string(hide_password=False)
+
+    @classmethod
+    def from_env(cls, environ: Optional[dict] = None) -> 'Settings':
+        """
+        Build the settings from the environment variables named like the fields
+        :param environ: dict, os.environ by default
+        :return: Settings
+        """
+        environ = os.environ if environ is None else environ
+        return cls(**{name: environ[name] for name in cls.model_fields if name in environ})
+
     def __str__(self):
         return (
             f'DB: {self.DB}\n'
             f'DB_USER: {self.DB_USER}\n'
-            f'DB_PASSWORD: {self.DB_PASSWORD}\n'
             f'DB_NAME: {self.DB_NAME}\n'
             f'DB_HOST: {self.DB_HOST}\n'
             f'DB_PORT: {self.DB_PORT}\n'
-            f'SQLALCHEMY_DATABASE_URI: {self.SQLALCHEMY_DATABASE_URI}\n'
             f'SQLALCHEMY_TRACK_MODIFICATIONS: {self.SQLALCHEMY_TRACK_MODIFICATIONS}\n'
+            f'DB_ASYNC: {self.DB_ASYNC}\n'
         )
 
-settings = Settings()
\ No newline at end of file
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Load the env file (ENV_FILE, .env by default) without overriding the process environment
+    and build the settings once. Also usable as a FastAPI dependency
+    :return: Settings
+    """
+    load_dotenv(dotenv_path=os.getenv('ENV_FILE', '.env'))
+    return Settings.from_env()
+
+
+def __getattr__(name: str):
+    # `from app.core.config import settings` construye la configuración en el primer import
+    if name == 'settings':
+        globals()['settings'] = value = get_settings()
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
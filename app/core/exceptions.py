@@ -13,13 +13,34 @@ class ItemNotFoundError(Exception):
 
 class UserAlreadyExistsError(Exception):
     """Exception raised when an item is not found in the database."""
-    def __init__(self, field: str, value: str | int):
+    def __init__(self, field: str, value: str | int | None = None):
         self.field = field
         self.value = value
-        super().__init__(f"User with {field} '{value}' already exists")
+        # Sin valor cuando la colisión viene de un INSERT por lotes: la base no dice qué fila chocó
+        super().__init__(f"User with {field} '{value}' already exists" if value is not None
+                         else f"User with this {field} already exists")
 
 class RepositoryError(Exception):
     """Exception raised when an item is not found in the database."""
     def __init__(self, error: str):
         self.error = error
-        super().__init__(f"Repository error: {error}")
\ No newline at end of file
+        super().__init__(f"Repository error: {error}")
+
+class ServiceOverloadedError(Exception):
+    """Exception raised when a bounded resource rejects work because it is saturated."""
+    def __init__(self, resource: str):
+        self.resource = resource
+        super().__init__(f"Service overloaded: {resource}, try again later")
+
+class InvalidRefreshTokenError(Exception):
+    """Exception raised when a refresh token is invalid, expired, revoked or reused."""
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Invalid refresh token: {reason}")
+
+class RateLimitExceededError(Exception):
+    """Exception raised when a client exceeds a rate limit."""
+    def __init__(self, limiter: str, retry_after: int):
+        self.limiter = limiter
+        self.retry_after = retry_after
+        super().__init__(f"Too many {limiter} attempts, retry in {retry_after} seconds")
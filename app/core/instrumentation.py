@@ -0,0 +1,272 @@
+"""
+Request instrumentation: ASGI metrics middleware, per-request SQL accounting and query budgets
+"""
+import collections
+import logging
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import FAST_BUCKETS, metrics
+
+logger = logging.getLogger(__name__)
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route", ("method", "route"),
+    buckets=FAST_BUCKETS,
+)
+http_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being served")
+http_request_queries = metrics.histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+http_request_db_duration = metrics.histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per HTTP request", ("method", "route"),
+    buckets=FAST_BUCKETS,
+)
+db_queries = metrics.counter("db_queries_total", "SQL statements executed")
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", buckets=FAST_BUCKETS
+)
+query_budget_exceeded = metrics.counter(
+    "db_query_budget_exceeded_total", "Traced requests that ran more SQL statements than their route allows",
+    ("method", "route"),
+)
+repeated_statements = metrics.counter(
+    "db_repeated_statements_total", "Traced requests that ran an identical SQL statement repeatedly (possible N+1)",
+    ("method", "route"),
+)
+
+# Rutas sin match se agrupan en una sola etiqueta para no disparar la cardinalidad
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    """
+    Mutable accounting of the current request, shared with threadpool workers and
+    greenlets through the copied context. Statement texts are only kept when tracing
+    """
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, trace: bool = False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Optional[collections.Counter] = collections.Counter() if trace else None
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class QueryBudget:
+    """
+    SQL budget declared by an endpoint
+    :param max_queries: statements allowed per request, None for unbounded
+    :param max_repeats: times one identical statement may run, None for unbounded
+    """
+    __slots__ = ("max_queries", "max_repeats")
+
+    def __init__(self, max_queries: Optional[int], max_repeats: Optional[int] = settings.SQL_REPEAT_THRESHOLD):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+
+
+def query_budget(max_queries: Optional[int],
+                 max_repeats: Optional[int] = settings.SQL_REPEAT_THRESHOLD) -> Callable:
+    """
+    Declare the SQL budget of an endpoint, checked per request while tracing.
+    Apply it below the router decorator so the route keeps the annotated function
+    :param max_queries: statements allowed per request, None for unbounded
+    :param max_repeats: times one identical statement may run, None for unbounded
+    :return: decorator
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__query_budget__ = QueryBudget(max_queries, max_repeats)
+        return endpoint
+    return decorator
+
+
+class QueryReport:
+    """
+    SQL usage of one traced request checked against its route budget
+    """
+    def __init__(self, method: str, route: str, stats: RequestStats, budget: Optional[QueryBudget]):
+        self.method = method
+        self.route = route
+        self.queries = stats.queries
+        self.db_seconds = stats.db_seconds
+        self.budget = budget
+        max_repeats = budget.max_repeats if budget is not None else settings.SQL_REPEAT_THRESHOLD
+        self.repeated = {} if max_repeats is None else {
+            statement: count for statement, count in stats.statements.items() if count > max_repeats
+        }
+
+    @property
+    def over_budget(self) -> bool:
+        return (self.budget is not None and self.budget.max_queries is not None
+                and self.queries > self.budget.max_queries)
+
+    def violations(self) -> list[str]:
+        """
+        Human readable description of every budget violation
+        :return: list[str]
+        """
+        violations = []
+        if self.over_budget:
+            violations.append(
+                f"{self.method} {self.route} ran {self.queries} SQL statements, budget is {self.budget.max_queries}"
+            )
+        for statement, count in self.repeated.items():
+            violations.append(f"{self.method} {self.route} ran {count} times: {' '.join(statement.split())[:200]}")
+        return violations
+
+
+class SqlTrace:
+    """
+    Opt-in per-request SQL tracing: reports requests over their query budget or repeating
+    identical statements to the log, the metrics and any subscribed listener (e.g. the tests)
+    """
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._listeners: list[Callable[[QueryReport], None]] = []
+
+    def subscribe(self, listener: Callable[[QueryReport], None]) -> None:
+        """
+        Receive the report of every traced request
+        :param listener: callable taking a QueryReport
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[QueryReport], None]) -> None:
+        """
+        Stop receiving reports
+        :param listener: callable previously subscribed
+        """
+        self._listeners.remove(listener)
+
+    def check(self, method: str, route, route_path: str, stats: RequestStats) -> QueryReport:
+        """
+        Build the report of a finished request and flag its violations
+        :param method: str
+        :param route: matched route | None
+        :param route_path: str route label
+        :param stats: RequestStats with statements
+        :return: QueryReport
+        """
+        budget = getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        report = QueryReport(method, route_path, stats, budget)
+        if report.over_budget:
+            query_budget_exceeded.labels(method, route_path).inc()
+        if report.repeated:
+            repeated_statements.labels(method, route_path).inc()
+        for violation in report.violations():
+            logger.warning("SQL budget: %s", violation)
+        for listener in list(self._listeners):
+            listener(report)
+        return report
+
+
+sql_trace = SqlTrace(settings.SQL_TRACE_ENABLED)
+
+
+class _RouteSeries:
+    """
+    Labeled children of the request metrics for one (method, route), resolved once
+    """
+    __slots__ = ("method", "route", "duration", "queries", "db_duration", "statuses")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.duration = http_request_duration.labels(method, route)
+        self.queries = http_request_queries.labels(method, route)
+        self.db_duration = http_request_db_duration.labels(method, route)
+        self.statuses = {}
+
+    def requests(self, status_code: int):
+        counter = self.statuses.get(status_code)
+        if counter is None:
+            counter = self.statuses[status_code] = http_requests.labels(self.method, self.route, str(status_code))
+        return counter
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, in-flight requests, status codes and SQL usage per route.
+    The route label is the path template of the matched route, so /users/{user_id} is one series
+    """
+    def __init__(self, app):
+        self.app = app
+        self._series: dict[tuple[str, str], _RouteSeries] = {}
+
+    def _route_series(self, method: str, route: str) -> _RouteSeries:
+        series = self._series.get((method, route))
+        if series is None:
+            series = self._series[(method, route)] = _RouteSeries(method, route)
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(trace=sql_trace.enabled)
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            request_stats.reset(token)
+            route = scope.get("route")
+            series = self._route_series(scope["method"], getattr(route, "path", UNMATCHED_ROUTE))
+            series.requests(status_code).inc()
+            series.duration.observe(elapsed)
+            series.queries.observe(stats.queries)
+            series.db_duration.observe(stats.db_seconds)
+            if stats.statements is not None:
+                sql_trace.check(series.method, route, series.route, stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # El execution context es propio de cada statement, más barato que conn.info
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+
+
+def instrument_queries(engine: Engine) -> None:
+    """
+    Count and time every SQL statement of the engine, globally and for the current request
+    :param engine: sync Engine (use AsyncEngine.sync_engine for async engines)
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
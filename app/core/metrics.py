@@ -0,0 +1,311 @@
+"""
+In-process metrics (counters, gauges and histograms) shared by the application,
+exported in the Prometheus text format
+"""
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Callable, Iterable, Optional, Sequence, Union
+
+# Buckets por defecto de los clientes de Prometheus, en segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+# Buckets más finos para operaciones que suelen tardar menos de un milisegundo (SQL, JWT)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _Metric:
+    """
+    Base class: a metric without labels holds its own value, a metric with labels holds
+    one child per combination of label values
+    """
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def _child(self) -> "_Metric":
+        return type(self)(self.name, self.documentation)
+
+    def labels(self, *values: str) -> "_Metric":
+        """
+        Get the child metric for the given label values, in labelnames order
+        :param values: str
+        :return: metric of the same type without labels
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def samples(self) -> Iterable[tuple[str, dict, Union[int, float]]]:
+        """
+        Samples to export as (name suffix, labels, value)
+        """
+        if not self.labelnames:
+            yield from self._samples({})
+            return
+        for values, child in list(self._children.items()):
+            yield from child._samples(dict(zip(self.labelnames, values)))
+
+    def _samples(self, labels: dict):
+        yield "", labels, self.value
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter
+    """
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0
+
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        """
+        Increment the counter
+        :param amount: int | float
+        """
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> Union[int, float]:
+        return self._value
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0
+
+    def set(self, value: Union[int, float]) -> None:
+        """
+        Set the gauge value
+        :param value: int | float
+        """
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        """
+        Increment the gauge
+        :param amount: int | float
+        """
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: Union[int, float] = 1) -> None:
+        """
+        Decrement the gauge
+        :param amount: int | float
+        """
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> Union[int, float]:
+        return self._value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets, plus their sum and count
+    """
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def _child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value
+        :param value: float
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def _samples(self, labels: dict):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), counts):
+            cumulative += count
+            yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+        yield "_sum", labels, total
+        yield "_count", labels, cumulative
+
+
+def timed(histogram: Histogram) -> Callable:
+    """
+    Decorator that observes the duration of every call of a sync or async function.
+    Generator functions are returned unchanged: only their creation would be timed
+    :param histogram: Histogram without labels (or a labeled child)
+    :return: decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+            return func
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_methods(histogram: Histogram) -> Callable:
+    """
+    Class decorator that times every public method with `histogram`, labeled by class and method
+    :param histogram: Histogram with labelnames ("class", "method")
+    :return: class decorator
+    """
+    def decorator(cls):
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(attr):
+                continue
+            setattr(cls, name, timed(histogram.labels(cls.__name__, name))(attr))
+        return cls
+    return decorator
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return f"{value:.1f}"
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    Registry of every metric created by the application
+    """
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        Get or create a counter
+        :param name: str
+        :param documentation: str
+        :param labelnames: label names, empty for an unlabeled metric
+        :return: Counter
+        """
+        return self._get_or_create(Counter, name, documentation, labelnames=labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """
+        Get or create a gauge
+        :param name: str
+        :param documentation: str
+        :param labelnames: label names, empty for an unlabeled metric
+        :return: Gauge
+        """
+        return self._get_or_create(Gauge, name, documentation, labelnames=labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Get or create a histogram
+        :param name: str
+        :param documentation: str
+        :param labelnames: label names, empty for an unlabeled metric
+        :param buckets: upper bounds of the buckets
+        :return: Histogram
+        """
+        return self._get_or_create(Histogram, name, documentation, labelnames=labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """
+        Get a metric by name
+        :param name: str
+        :return: metric | None
+        """
+        return self._metrics.get(name)
+
+    def collect(self) -> list[_Metric]:
+        """
+        Snapshot of the registered metrics
+        :return: list of metrics
+        """
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4)
+        :return: str
+        """
+        lines = []
+        for metric in sorted(self.collect(), key=lambda m: m.name):
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for suffix, labels, value in metric.samples():
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -1,23 +1,93 @@
 """
 Database module to handle database connection and session
 """
+import os
+import threading
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.core.config import settings
+from app.core.instrumentation import instrument_queries
+from app.db.pool import engine_options, instrument_pool
 
 
 class Database:
     """
-    Database class to handle database connection and session
+    Database class to handle database connection and session.
+    The engines are created on first use, so every server worker builds its own pool
     """
 
     def __init__(self):
-        self.engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
-        self.session_local = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         self.base = declarative_base()
+        self._engine = None
+        self._session_local = None
+        self._async_engine = None
+        self._async_session_local = None
+        self._lock = threading.Lock()
 
+    @property
+    def engine(self) -> Engine:
+        """
+        Sync engine, created on first use
+        :return: Engine
+        """
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    engine = create_engine(
+                        settings.SQLALCHEMY_DATABASE_URI, **engine_options(settings.SQLALCHEMY_DATABASE_URI)
+                    )
+                    instrument_pool(engine)
+                    instrument_queries(engine)
+                    self._session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                    self._engine = engine
+        return self._engine
+
+    @property
+    def session_local(self) -> sessionmaker:
+        """
+        Sync session factory
+        :return: sessionmaker
+        """
+        if self._session_local is None:
+            self.engine
+        return self._session_local
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """
+        Async engine, created on first use. Only available when DB_ASYNC is enabled
+        :return: AsyncEngine
+        """
+        if not settings.DB_ASYNC:
+            raise RuntimeError("Async database mode is disabled, set DB_ASYNC=true to enable it")
+        if self._async_engine is None:
+            with self._lock:
+                if self._async_engine is None:
+                    engine = create_async_engine(
+                        settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+                        **engine_options(settings.SQLALCHEMY_ASYNC_DATABASE_URI, is_async=True)
+                    )
+                    instrument_pool(engine.sync_engine)
+                    instrument_queries(engine.sync_engine)
+                    self._async_session_local = async_sessionmaker(
+                        bind=engine, autoflush=False, expire_on_commit=False
+                    )
+                    self._async_engine = engine
+        return self._async_engine
+
+    @property
+    def async_session_local(self) -> async_sessionmaker:
+        """
+        Async session factory
+        :return: async_sessionmaker
+        """
+        if self._async_session_local is None:
+            self.async_engine
+        return self._async_session_local
 
     def get_db(self):
         """
@@ -30,7 +100,39 @@ class Database:
         finally:
             db.close()
 
+    async def get_async_db(self):
+        """
+        Get async database session
+        :return: async db session
+        """
+        async with self.async_session_local() as db:
+            yield db
+
+    async def dispose(self) -> None:
+        """
+        Close the pooled connections of the engines created so far, on application shutdown
+        """
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+        if self._engine is not None:
+            self._engine.dispose()
+
+    def reset_after_fork(self) -> None:
+        """
+        Forget the pools inherited from the parent process without closing their sockets,
+        which still belong to the parent; the child opens its own connections on demand
+        """
+        engines = (self._engine, self._async_engine.sync_engine if self._async_engine is not None else None)
+        for engine in engines:
+            if engine is not None:
+                engine.dispose(close=False)
+
 
 db = Database()
 Base = db.base
 get_db = db.get_db
+get_async_db = db.get_async_db
+
+# Un pool heredado por fork comparte sockets con el proceso padre
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=db.reset_after_fork)
@@ -1,22 +1,57 @@
-from .database import get_db
+"""
+One-shot initialization of the database: creates the superuser if there is none
+
+    python -m app.db.initialize_db
+"""
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from .database import db
 from app.models.user import User
+from app.utils.cache import response_cache
 from app.utils.hashing import Hasher
-import os
-
-def create_superuser():
-    db = next(get_db())
-    try:
-        existing_user = db.query(User).filter_by(is_superuser=True).first()
-        if not existing_user:
-            superuser = User(
-                username=os.getenv("SUPERUSER_USERNAME"),
-                email=os.getenv("SUPERUSER_EMAIL"),
-                password=Hasher.get_password_hash(os.getenv("SUPERUSER_PASS")),  # Hashea la contraseña
-                is_superuser=True
-            )
-            db.add(superuser)
-            db.commit()
-            print("Superusuario creado exitosamente.")
-    except Exception as e:
-        print(f"Error al crear superusuario: {e}")
-        db.rollback()
\ No newline at end of file
+from app.utils.username_filter import username_filter
+
+logger = logging.getLogger(__name__)
+
+
+def create_superuser(session_local: Optional[sessionmaker] = None) -> bool:
+    """
+    Create the superuser from SUPERUSER_USERNAME/SUPERUSER_EMAIL/SUPERUSER_PASS if none exists.
+    Idempotent: when a superuser already exists it costs a single query and no hashing
+    :param session_local: sessionmaker, the application one by default
+    :return: bool True if it was created
+    """
+    if not (settings.SUPERUSER_USERNAME and settings.SUPERUSER_EMAIL and settings.SUPERUSER_PASS):
+        logger.info("SUPERUSER_* no configurado, no se crea el superusuario")
+        return False
+    with (session_local or db.session_local)() as session:
+        exists = session.execute(select(User.id).where(User.is_superuser.is_(True)).limit(1)).first()
+        if exists is not None:
+            return False
+        username_filter.add(settings.SUPERUSER_USERNAME)
+        session.add(User(
+            username=settings.SUPERUSER_USERNAME,
+            email=settings.SUPERUSER_EMAIL,
+            password=Hasher.get_password_hash(settings.SUPERUSER_PASS),  # Hashea la contraseña
+            is_superuser=True
+        ))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Otro proceso lo creó al mismo tiempo
+            session.rollback()
+            return False
+    response_cache.invalidate()
+    logger.info("Superusuario creado exitosamente.")
+    return True
+
+
+if __name__ == "__main__":
+    created = create_superuser()
+    print("Superusuario creado exitosamente." if created else "No se creó el superusuario.")
@@ -0,0 +1,88 @@
+"""
+Connection pool configuration and instrumentation for the database engines
+"""
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+pool_in_use = metrics.gauge("db_pool_connections_in_use", "Connections checked out from the pool")
+pool_checkout_wait = metrics.gauge(
+    "db_pool_checkout_wait_seconds", "Time the last checkout waited for a pooled connection"
+)
+pool_checkout_wait_total = metrics.counter(
+    "db_pool_checkout_wait_seconds_total", "Total time spent waiting for pooled connections"
+)
+pool_checkouts = metrics.counter("db_pool_checkouts_total", "Connections checked out from the pool")
+pool_timeouts = metrics.counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT seconds"
+)
+
+
+def _timed_checkout(do_get):
+    start = time.perf_counter()
+    try:
+        return do_get()
+    except exc.TimeoutError:
+        pool_timeouts.inc()
+        raise
+    finally:
+        waited = time.perf_counter() - start
+        pool_checkout_wait.set(waited)
+        pool_checkout_wait_total.inc(waited)
+        pool_checkouts.inc()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waits for a connection
+    """
+    def _do_get(self):
+        return _timed_checkout(super()._do_get)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long each checkout waits for a connection
+    """
+    def _do_get(self):
+        return _timed_checkout(super()._do_get)
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    Keyword arguments for create_engine/create_async_engine built from the pool settings
+    :param url: str database url
+    :param is_async: bool
+    :return: dict
+    """
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    db_url = make_url(url)
+    if timeout_ms and db_url.get_backend_name() == "postgresql":
+        if db_url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return options
+
+
+def instrument_pool(engine: Engine) -> None:
+    """
+    Track the connections in use with the pool checkout/checkin events
+    :param engine: sync Engine (use AsyncEngine.sync_engine for async engines)
+    """
+    event.listen(engine, "checkout", lambda *args: pool_in_use.inc())
+    event.listen(engine, "checkin", lambda *args: pool_in_use.dec())
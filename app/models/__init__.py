@@ -1 +1 @@
-from . import user
+from . import user, refresh_token
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+
+from app.db.database import Base
+
+
+def utcnow() -> datetime:
+    # Las columnas DateTime no guardan zona horaria: se usa UTC naive
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RefreshToken(Base):
+    """
+    Issued refresh tokens. Each rotation revokes the presented token and records its replacement;
+    all the tokens descending from one login share a family_id, revoked at once on reuse
+    """
+    __tablename__ = 'refresh_tokens'
+
+    jti = Column(String(32), primary_key=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    created_at = Column(DateTime, default=utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by = Column(String(32), nullable=True)
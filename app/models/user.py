@@ -10,9 +10,11 @@ class User(Base):
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     email = Column(String(50), unique=True, nullable=False, index=True)
     username = Column(String(24), unique=True, nullable=False, index=True)
-    password = Column(String(64), nullable=False)
+    # scrypt y argon2 superan los 60 caracteres de bcrypt
+    password = Column(String(255), nullable=False)
     address = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.now())
-    updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())
+    # Callables: se evalúan en cada INSERT/UPDATE, no una sola vez al importar el módulo
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     is_superuser = Column(Boolean, default=False)
     active = Column(Boolean, default=True)
@@ -1,15 +1,118 @@
 """
 This module contains the repository class for the authentication feature.
 """
+import uuid
+from datetime import timedelta, timezone
+from typing import Optional
+
 from fastapi import HTTPException, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.exceptions import InvalidRefreshTokenError
+from app.core.metrics import metrics
 from app.schemas.auth import Login
+from app.models.refresh_token import RefreshToken, utcnow
 from app.models.user import User
-from app.utils.hashing import Hasher
+from app.utils.hashing import Hasher, hashing_pool, password_rehash
 from app.utils.token import Token
+from app.utils.username_filter import username_filter
 from app.schemas.token import TokenResponse
 
+refresh_token_reuse = metrics.counter(
+    "refresh_token_reuse_total", "Rotated refresh tokens presented again, their family was revoked"
+)
+
+# Columnas que necesita el access token al rotar un refresh token
+TOKEN_USER_COLUMNS = (User.id, User.username, User.is_superuser, User.active)
+# El login suma el hash: una sola consulta por el índice de username, sin cargar la entidad
+LOGIN_USER_COLUMNS = TOKEN_USER_COLUMNS + (User.password,)
+
+
+def _invalid_credentials() -> HTTPException:
+    """
+    Build the invalid credentials error, the same for an unknown username and a wrong password
+    :return: HTTPException
+    """
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid credentials",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+def _login_statement(username: str):
+    return select(*LOGIN_USER_COLUMNS).where(User.username == username)
+
+
+def _issue_token(user, refresh: Optional[dict] = None) -> TokenResponse:
+    """
+    Generate the access token for an authenticated user, and its refresh token when given
+    :param user: User or row with id, username, is_superuser and active
+    :param refresh: dict refresh token row values from _refresh_row
+    :return: TokenResponse
+    """
+    try:
+        token = Token.generate_token(
+            data = {"sub": user.username, "id": user.id, "is_superuser": user.is_superuser, "active": user.active}
+        )
+        refresh_token = None
+        if refresh is not None:
+            refresh_token = Token.generate_refresh_token(
+                {"sub": user.username, "id": user.id, "jti": refresh["jti"], "fam": refresh["family_id"]},
+                refresh["expires_at"].replace(tzinfo=timezone.utc),
+            )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate token: {e}"
+        )
+
+    return TokenResponse(access_token=token, token_type="bearer", refresh_token=refresh_token)
+
+
+def _refresh_row(user_id: int, family_id: Optional[str] = None) -> dict:
+    """
+    Values of a new refresh token row, a new family unless rotating
+    :param user_id: int
+    :param family_id: str family of the rotated token
+    :return: dict
+    """
+    return {
+        "jti": uuid.uuid4().hex,
+        "family_id": family_id or uuid.uuid4().hex,
+        "user_id": user_id,
+        "expires_at": utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    }
+
+
+def _decode_refresh(refresh_token: str) -> dict:
+    """
+    Check the signature, expiration and type of a refresh token
+    :param refresh_token: str
+    :return: dict claims
+    """
+    return Token.decode_refresh_token(refresh_token, InvalidRefreshTokenError("invalid or expired"))
+
+
+def _rotate_statement(claims: dict, replaced_by: str):
+    # Solo una rotación puede ganar: el UPDATE condicional es atómico
+    return (
+        update(RefreshToken)
+        .where(RefreshToken.jti == claims["jti"], RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow(), replaced_by=replaced_by)
+    )
+
+
+def _revoke_family_statement(family_id: str):
+    return (
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow())
+    )
+
 
 class AuthRepository:
     """
@@ -19,29 +122,131 @@ class AuthRepository:
         self.db = db
 
     def auth_user(self, login: Login) -> TokenResponse:
-        user = self.db.query(User).filter(User.username == login.username).first()
+        """
+        Check the credentials and issue an access and refresh token pair.
+        An unknown username costs the same password verification as a wrong password
+        :param login: Login
+        :return: TokenResponse
+        """
+        user = None
+        if username_filter.might_exist(login.username):
+            user = self.db.execute(_login_statement(login.username)).first()
 
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Invalid credentials"
-            )
+        if user is None:
+            hashing_pool.run_sync(Hasher.dummy_verify, login.password)
+            raise _invalid_credentials()
 
-        if not Hasher.verify_password(login.password, user.password):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid credentials"
-            )
+        valid, new_hash = hashing_pool.run_sync(Hasher.verify_and_update, login.password, user.password)
+        if not valid:
+            raise _invalid_credentials()
 
-        try:
-            token = Token.generate_token(
-                data = {"sub": user.username, "id": user.id, "is_superuser": user.is_superuser, "active": user.active}
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to generate token: {e}"
-            )
+        if new_hash is not None:
+            # El hash usa un esquema viejo o un costo menor: se reemplaza en la misma transacción
+            self.db.execute(update(User).where(User.id == user.id).values(password=new_hash))
+            password_rehash.inc()
+        refresh = _refresh_row(user.id)
+        self.db.execute(insert(RefreshToken).values(refresh))
+        self.db.commit()
+        return _issue_token(user, refresh)
+
+    def refresh(self, refresh_token: str) -> TokenResponse:
+        """
+        Rotate a refresh token: revoke it and issue a new access and refresh token pair.
+        A token that was already rotated is a reuse, the whole family is revoked
+        :param refresh_token: str
+        :return: TokenResponse
+        """
+        claims = _decode_refresh(refresh_token)
+        refresh = _refresh_row(claims["id"], claims["fam"])
+        if self.db.execute(_rotate_statement(claims, refresh["jti"])).rowcount != 1:
+            self.db.execute(_revoke_family_statement(claims["fam"]))
+            self.db.commit()
+            refresh_token_reuse.inc()
+            raise InvalidRefreshTokenError("revoked or reused")
+
+        user = self.db.execute(select(*TOKEN_USER_COLUMNS).where(User.id == claims["id"])).first()
+        if user is None or not user.active:
+            self.db.rollback()
+            raise InvalidRefreshTokenError("inactive user")
+
+        self.db.execute(insert(RefreshToken).values(refresh))
+        self.db.commit()
+        return _issue_token(user, refresh)
+
+    def revoke(self, refresh_token: str) -> None:
+        """
+        Revoke the refresh token and every token of its family (logout)
+        :param refresh_token: str
+        """
+        claims = _decode_refresh(refresh_token)
+        self.db.execute(_revoke_family_statement(claims["fam"]))
+        self.db.commit()
+
+
+class AsyncAuthRepository:
+    """
+    Async auth repository class
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def auth_user(self, login: Login) -> TokenResponse:
+        """
+        Check the credentials and issue an access and refresh token pair.
+        An unknown username costs the same password verification as a wrong password
+        :param login: Login
+        :return: TokenResponse
+        """
+        user = None
+        if username_filter.might_exist(login.username):
+            user = (await self.db.execute(_login_statement(login.username))).first()
+
+        if user is None:
+            await Hasher.dummy_verify_async(login.password)
+            raise _invalid_credentials()
+
+        valid, new_hash = await Hasher.verify_and_update_async(login.password, user.password)
+        if not valid:
+            raise _invalid_credentials()
+
+        if new_hash is not None:
+            # El hash usa un esquema viejo o un costo menor: se reemplaza en la misma transacción
+            await self.db.execute(update(User).where(User.id == user.id).values(password=new_hash))
+            password_rehash.inc()
+        refresh = _refresh_row(user.id)
+        await self.db.execute(insert(RefreshToken).values(refresh))
+        await self.db.commit()
+        return _issue_token(user, refresh)
+
+    async def refresh(self, refresh_token: str) -> TokenResponse:
+        """
+        Rotate a refresh token: revoke it and issue a new access and refresh token pair.
+        A token that was already rotated is a reuse, the whole family is revoked
+        :param refresh_token: str
+        :return: TokenResponse
+        """
+        claims = _decode_refresh(refresh_token)
+        refresh = _refresh_row(claims["id"], claims["fam"])
+        if (await self.db.execute(_rotate_statement(claims, refresh["jti"]))).rowcount != 1:
+            await self.db.execute(_revoke_family_statement(claims["fam"]))
+            await self.db.commit()
+            refresh_token_reuse.inc()
+            raise InvalidRefreshTokenError("revoked or reused")
+
+        user = (await self.db.execute(select(*TOKEN_USER_COLUMNS).where(User.id == claims["id"]))).first()
+        if user is None or not user.active:
+            await self.db.rollback()
+            raise InvalidRefreshTokenError("inactive user")
+
+        await self.db.execute(insert(RefreshToken).values(refresh))
+        await self.db.commit()
+        return _issue_token(user, refresh)
 
-        token = TokenResponse(access_token=token, token_type="bearer")
-        return token
+    async def revoke(self, refresh_token: str) -> None:
+        """
+        Revoke the refresh token and every token of its family (logout)
+        :param refresh_token: str
+        """
+        claims = _decode_refresh(refresh_token)
+        await self.db.execute(_revoke_family_statement(claims["fam"]))
+        await self.db.commit()
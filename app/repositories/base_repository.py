@@ -52,3 +52,53 @@ class IRepository(ABC):
         :return:
         """
         pass
+
+
+class IAsyncRepository(ABC):
+    """
+    Async Base Repository Interface, same CRUD contract as IRepository but awaitable
+    """
+    @abstractmethod
+    async def get(self, entity_id: int):
+        """
+        Method to get an entity by id
+        :param entity_id:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def get_all(self, limit: int, offset: int):
+        """
+        Method to get all entities
+        :return: List[Entity]
+        """
+        pass
+
+    @abstractmethod
+    async def add(self, entity):
+        """
+        Method to add a new entity
+        :param entity:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def update(self, entity_id: int, entity):
+        """
+        Method to update an entity
+        :param entity_id:
+        :param entity:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, entity_id: int):
+        """
+        Method to delete an entity
+        :param entity_id:
+        :return:
+        """
+        pass
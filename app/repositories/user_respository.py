@@ -4,14 +4,82 @@ This module contains the user repository class and interface
 
 from abc import abstractmethod
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional, Type
+from sqlalchemy import Row, or_, select, func, text, insert, update
+from sqlalchemy.exc import IntegrityError
+from typing import AsyncIterator, Iterator, Optional
 
-from app.core.exceptions import RepositoryError
-from app.schemas.user import UserCreate, UserUpdate
-from app.repositories.base_repository import IRepository
+from app.core.exceptions import ItemNotFoundError, RepositoryError, UserAlreadyExistsError
+from app.core.metrics import FAST_BUCKETS, metrics, timed_methods
+from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.repositories.base_repository import IRepository, IAsyncRepository
 from app.models.user import User
+from app.utils.cache import principal_cache, response_cache
+from app.utils.username_filter import username_filter
+
+
+def _total_count():
+    """
+    Scalar subquery with the total number of users, to fetch it along with a page
+    """
+    return select(func.count()).select_from(User).scalar_subquery().label("total_count")
+
+
+def _insert_values(users: list[UserCreate]) -> list[dict]:
+    """
+    Rows for a batch insert of users
+    """
+    return [
+        {"email": user.email, "username": user.username, "password": user.password, "address": user.address}
+        for user in users
+    ]
+
+
+repository_seconds = metrics.histogram(
+    "repository_call_duration_seconds", "Duration of repository method calls", ("repository", "method"),
+    buckets=FAST_BUCKETS,
+)
+
+# Cómo nombra cada motor la restricción única de email: SQLite la columna, Postgres la clave/índice
+_EMAIL_CONSTRAINT_MARKERS = ("users.email", "(email)", "users_email_key", "ix_users_email")
+
+
+def _integrity_error(error: IntegrityError, user, action: str) -> Exception:
+    """
+    Map a unique constraint violation on users to UserAlreadyExistsError for the field that collided,
+    any other integrity error to RepositoryError. Without `user` (batch insert) the error has no value
+    """
+    message = str(error.orig)
+    if "unique" not in message.lower():
+        return RepositoryError(f"Failed to {action} user: {error}")
+    field = 'username'
+    if getattr(user, "email", True) and any(marker in message for marker in _EMAIL_CONSTRAINT_MARKERS):
+        field = 'email'
+    return UserAlreadyExistsError(field, getattr(user, field) if user is not None else None)
+
+
+# Columnas expuestas por UserResponse: las lecturas proyectan solo estas, sin cargar la entidad
+RESPONSE_COLUMNS = tuple(UserResponse.model_fields)
+# Las lecturas de un usuario suman los flags que necesita el principal cache
+DETAIL_COLUMNS = RESPONSE_COLUMNS + ("is_superuser", "active")
+EXPORT_COLUMNS = tuple(name for name, field in UserResponse.model_fields.items() if not field.exclude)
+
+
+def _columns(names: tuple[str, ...]) -> list:
+    """
+    User columns for a projection select
+    """
+    return [getattr(User, name) for name in names]
+
+
+def _split_count(rows) -> tuple[list, Optional[int]]:
+    """
+    Split the rows of a page fetched with _total_count into the rows and the total
+    """
+    return list(rows), (rows[0].total_count if rows else None)
+
+ESTIMATED_COUNT_QUERY = text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table")
 
 
 class IUserRepository(IRepository):
@@ -20,11 +88,31 @@ class IUserRepository(IRepository):
     """
 
     @abstractmethod
-    def get_user_by_email(self, email: EmailStr) -> Optional[User]:
+    def get_user_by_email(self, email: EmailStr) -> Optional[Row]:
         """
         Method to get user by email
         :param email: EmailStr
-        :return: user | None
+        :return: Row of DETAIL_COLUMNS | None
+        """
+        pass
+
+    @abstractmethod
+    def get_existing_identities(self, usernames: list[str], emails: list[str]) -> tuple[set[str], set[str]]:
+        """
+        Method to find which usernames and emails are already taken, in a single query
+        :param usernames: list[str]
+        :param emails: list[str]
+        :return: (taken usernames, taken emails)
+        """
+        pass
+
+    @abstractmethod
+    def add_many(self, users: list[UserCreate]) -> list[int]:
+        """
+        Method to insert a batch of users in one statement
+        :param users: list[UserCreate] with the password already hashed
+        :return: list[int] new ids, in the same order
+        :raises UserAlreadyExistsError: a username or email was taken since it was checked, nothing inserted
         """
         pass
 
@@ -38,6 +126,45 @@ class IUserRepository(IRepository):
         """
         pass
 
+    @abstractmethod
+    def get_after(self, after_id: Optional[int], limit: int) -> list[Row]:
+        """
+        Method to get the users with id greater than after_id (keyset pagination)
+        :param after_id: int | None
+        :param limit: int
+        :return: List[Row] of RESPONSE_COLUMNS tuples
+        """
+        pass
+
+    @abstractmethod
+    def get_all_with_count(self, limit: int, offset: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a page of users and the total count in a single round-trip
+        :param limit: int
+        :param offset: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None if the page is empty)
+        """
+        pass
+
+    @abstractmethod
+    def get_after_with_count(self, after_id: Optional[int], limit: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a keyset page of users and the total count in a single round-trip
+        :param after_id: int | None
+        :param limit: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None if the page is empty)
+        """
+        pass
+
+    @abstractmethod
+    def iter_export(self, batch_size: int) -> Iterator[tuple]:
+        """
+        Method to stream every user as EXPORT_COLUMNS tuples with a server-side cursor
+        :param batch_size: int rows fetched per round-trip
+        :return: Iterator[tuple]
+        """
+        pass
+
     @abstractmethod
     def count(self) -> int:
         """
@@ -46,6 +173,15 @@ class IUserRepository(IRepository):
         """
         pass
 
+    @abstractmethod
+    def estimated_count(self) -> Optional[int]:
+        """
+        Method to get the planner estimate of the number of entities
+        :return: int | None if the database has no estimate
+        """
+        pass
+
+@timed_methods(repository_seconds)
 class UserRepository(IUserRepository):
     """
     User repository Implementation
@@ -53,25 +189,88 @@ class UserRepository(IUserRepository):
     def __init__(self, db: Session):
         self.db = db
 
-    def get(self, user_id: int) -> Optional[User]:
+    def get(self, user_id: int) -> Optional[Row]:
         """
-        Method to get a user by id
+        Method to get a user by id, projecting DETAIL_COLUMNS instead of loading the entity
         :param user_id: int
-        :return: User
+        :return: Row | None
         """
-        return self.db.query(User).filter(User.id == user_id).first()
+        return self.db.execute(select(*_columns(DETAIL_COLUMNS)).where(User.id == user_id)).first()
+
+    def get_all(self, limit: int, offset: int) -> list[Row]:
+        """
+        Method to get all users as RESPONSE_COLUMNS tuples
+        :return: List[Row]
+        """
+        try:
+            stmt = select(*_columns(RESPONSE_COLUMNS)).order_by(User.id).offset(offset).limit(limit)
+            # Tuplas y no mappings: leer una RowMapping cuesta más que validar la fila
+            users = self.db.execute(stmt).all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return users
 
-    def get_all(self, limit: int, offset: int) -> list[Type[User]]:
+    def get_after(self, after_id: Optional[int], limit: int) -> list[Row]:
         """
-        Method to get all users
-        :return: List[User]
+        Method to get the users with id greater than after_id, seeking on the id index
+        :param after_id: int | None
+        :param limit: int
+        :return: List[Row] of RESPONSE_COLUMNS tuples
         """
         try:
-            users = self.db.query(User).offset(offset).limit(limit).all()
+            stmt = select(*_columns(RESPONSE_COLUMNS))
+            if after_id is not None:
+                stmt = stmt.where(User.id > after_id)
+            users = self.db.execute(stmt.order_by(User.id).limit(limit)).all()
         except Exception as e:
             raise RepositoryError(f"Failed to get users: {e}")
         return users
 
+    def get_all_with_count(self, limit: int, offset: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a page of users and the total count in one query
+        :param limit: int
+        :param offset: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None)
+        """
+        try:
+            stmt = select(*_columns(RESPONSE_COLUMNS), _total_count()).order_by(User.id).offset(offset).limit(limit)
+            rows = self.db.execute(stmt).all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return _split_count(rows)
+
+    def get_after_with_count(self, after_id: Optional[int], limit: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a keyset page of users and the total count in one query
+        :param after_id: int | None
+        :param limit: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None)
+        """
+        try:
+            stmt = select(*_columns(RESPONSE_COLUMNS), _total_count())
+            if after_id is not None:
+                stmt = stmt.where(User.id > after_id)
+            rows = self.db.execute(stmt.order_by(User.id).limit(limit)).all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return _split_count(rows)
+
+    def iter_export(self, batch_size: int) -> Iterator[tuple]:
+        """
+        Method to stream every user as EXPORT_COLUMNS tuples, without building ORM objects.
+        yield_per keeps a server-side cursor so memory stays constant regardless of table size
+        :param batch_size: int rows fetched per round-trip
+        :return: Iterator[tuple]
+        """
+        stmt = (
+            select(*_columns(EXPORT_COLUMNS))
+            .order_by(User.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in self.db.execute(stmt):
+            yield tuple(row)
+
     def count(self) -> int:
         """
         Method to count users
@@ -79,44 +278,69 @@ class UserRepository(IUserRepository):
         """
         return self.db.query(User).count()
 
-    def add(self, user: UserCreate) -> User:
+    def estimated_count(self) -> Optional[int]:
+        """
+        Method to get the Postgres planner estimate (pg_class.reltuples) of the number of users
+        :return: int | None if not on Postgres or the table was never analyzed
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return None
+        estimate = self.db.execute(ESTIMATED_COUNT_QUERY, {"table": User.__tablename__}).scalar()
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    def add(self, user: UserCreate) -> Row:
         """
-        Method to add a new user
+        Method to add a new user in a single INSERT ... RETURNING.
+        Uniqueness is left to the constraints on email and username
         :param user: UserCreate
-        :return: User
+        :return: Row of RESPONSE_COLUMNS
         """
+        # Antes del commit: un login apenas creado el usuario no puede ser rechazado por el filtro
+        username_filter.add(user.username)
         try:
-            new_user = User(
-                email=user.email,
-                username=user.username,
-                password=user.password,
-                address= user.address,
-            )
-            self.db.add(new_user)
+            new_user = self.db.execute(
+                insert(User).values(_insert_values([user])[0]).returning(*_columns(RESPONSE_COLUMNS))
+            ).one()
             self.db.commit()
-            self.db.refresh(new_user)
+        except IntegrityError as e:
+            self.db.rollback()
+            raise _integrity_error(e, user, "create")
         except Exception as e:
             self.db.rollback()
             raise RepositoryError(f"Failed to create user: {e}")
+        response_cache.invalidate()
         return new_user
 
-    def update(self, user_id: int, user: UserUpdate) -> User:
+    def update(self, user_id: int, user: UserUpdate) -> Row:
         """
-        Method to update a user
+        Method to update a user in a single UPDATE ... RETURNING.
+        Uniqueness is left to the constraints on email and username
         :param user_id: int
         :param user: UserUpdate
-        :return: User
+        :return: Row of RESPONSE_COLUMNS
         """
-
-        user_to_update = self.db.query(User).filter(User.id == user_id).first()
-        try:
-            for key, value in user.model_dump(exclude_unset=True).items():
-                setattr(user_to_update, key, value)
-            self.db.commit()
-        except Exception as e:
-            self.db.rollback()
-            raise RepositoryError(f'Failed to update user: {e}')
-        return user_to_update
+        values = user.model_dump(exclude_unset=True)
+        if values.get("username"):
+            username_filter.add(values["username"])
+        if not values:
+            updated_user = self.get(user_id)
+        else:
+            try:
+                updated_user = self.db.execute(
+                    update(User).where(User.id == user_id).values(values).returning(*_columns(RESPONSE_COLUMNS))
+                ).first()
+                self.db.commit()
+            except IntegrityError as e:
+                self.db.rollback()
+                raise _integrity_error(e, user, "update")
+            except Exception as e:
+                self.db.rollback()
+                raise RepositoryError(f'Failed to update user: {e}')
+        if updated_user is None:
+            raise ItemNotFoundError('user', user_id)
+        principal_cache.invalidate(user_id)
+        response_cache.invalidate()
+        return updated_user
 
     def delete(self, user_id: int) -> bool:
         """
@@ -132,16 +356,18 @@ class UserRepository(IUserRepository):
         except Exception as e:
             self.db.rollback()
             raise RepositoryError(f"Failed to delete user: {e}")
+        principal_cache.invalidate(user_id)
+        response_cache.invalidate()
         return True
 
-    def get_user_by_email(self, email: EmailStr) -> Optional[User]:
+    def get_user_by_email(self, email: EmailStr) -> Optional[Row]:
         """
         Method to get user by email
         :param email: EmailStr
-        :return: user | None
+        :return: Row | None
         """
 
-        return self.db.query(User).filter(User.email == email).first()
+        return self.db.execute(select(*_columns(DETAIL_COLUMNS)).where(User.email == email)).first()
 
     def get_user_by_username_or_email(self, username: str, email: str) -> Optional[User]:
         """
@@ -152,3 +378,385 @@ class UserRepository(IUserRepository):
         """
 
         return self.db.query(User).filter(or_(User.username == username, User.email == email)).first()
+
+    def get_existing_identities(self, usernames: list[str], emails: list[str]) -> tuple[set[str], set[str]]:
+        """
+        Method to find which usernames and emails are already taken, in a single query
+        :param usernames: list[str]
+        :param emails: list[str]
+        :return: (taken usernames, taken emails)
+        """
+        rows = self.db.execute(
+            select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        ).all()
+        return {row.username for row in rows}, {row.email for row in rows}
+
+    def add_many(self, users: list[UserCreate]) -> list[int]:
+        """
+        Method to insert a batch of users in one statement
+        :param users: list[UserCreate] with the password already hashed
+        :return: list[int] new ids, in the same order
+        :raises UserAlreadyExistsError: a username or email was taken since it was checked, nothing inserted
+        """
+        if not users:
+            return []
+        username_filter.add(*(user.username for user in users))
+        try:
+            result = self.db.execute(
+                insert(User).returning(User.id, sort_by_parameter_order=True), _insert_values(users)
+            )
+            ids = list(result.scalars().all())
+            self.db.commit()
+        except IntegrityError as e:
+            self.db.rollback()
+            raise _integrity_error(e, None, "create")
+        except Exception as e:
+            self.db.rollback()
+            raise RepositoryError(f"Failed to create users: {e}")
+        response_cache.invalidate()
+        return ids
+
+
+class IAsyncUserRepository(IAsyncRepository):
+    """
+    Async user repository interface
+    """
+
+    @abstractmethod
+    async def get_user_by_email(self, email: EmailStr) -> Optional[Row]:
+        """
+        Method to get user by email
+        :param email: EmailStr
+        :return: Row of DETAIL_COLUMNS | None
+        """
+        pass
+
+    @abstractmethod
+    async def get_existing_identities(self, usernames: list[str], emails: list[str]) -> tuple[set[str], set[str]]:
+        """
+        Method to find which usernames and emails are already taken, in a single query
+        :param usernames: list[str]
+        :param emails: list[str]
+        :return: (taken usernames, taken emails)
+        """
+        pass
+
+    @abstractmethod
+    async def add_many(self, users: list[UserCreate]) -> list[int]:
+        """
+        Method to insert a batch of users in one statement
+        :param users: list[UserCreate] with the password already hashed
+        :return: list[int] new ids, in the same order
+        :raises UserAlreadyExistsError: a username or email was taken since it was checked, nothing inserted
+        """
+        pass
+
+    @abstractmethod
+    async def get_user_by_username_or_email(self, username: str, email: str) -> Optional[User]:
+        """
+        Method to get user by username or email
+        :param username: str
+        :param email: str
+        :return: user | None
+        """
+        pass
+
+    @abstractmethod
+    async def get_after(self, after_id: Optional[int], limit: int) -> list[Row]:
+        """
+        Method to get the users with id greater than after_id (keyset pagination)
+        :param after_id: int | None
+        :param limit: int
+        :return: List[Row] of RESPONSE_COLUMNS tuples
+        """
+        pass
+
+    @abstractmethod
+    async def get_all_with_count(self, limit: int, offset: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a page of users and the total count in a single round-trip
+        :param limit: int
+        :param offset: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None if the page is empty)
+        """
+        pass
+
+    @abstractmethod
+    async def get_after_with_count(self, after_id: Optional[int], limit: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a keyset page of users and the total count in a single round-trip
+        :param after_id: int | None
+        :param limit: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None if the page is empty)
+        """
+        pass
+
+    @abstractmethod
+    def iter_export(self, batch_size: int) -> AsyncIterator[tuple]:
+        """
+        Method to stream every user as EXPORT_COLUMNS tuples with a server-side cursor
+        :param batch_size: int rows fetched per round-trip
+        :return: AsyncIterator[tuple]
+        """
+        pass
+
+    @abstractmethod
+    async def count(self) -> int:
+        """
+        Method to count entities
+        :return: int
+        """
+        pass
+
+    @abstractmethod
+    async def estimated_count(self) -> Optional[int]:
+        """
+        Method to get the planner estimate of the number of entities
+        :return: int | None if the database has no estimate
+        """
+        pass
+
+@timed_methods(repository_seconds)
+class AsyncUserRepository(IAsyncUserRepository):
+    """
+    Async user repository Implementation
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, user_id: int) -> Optional[Row]:
+        """
+        Method to get a user by id, projecting DETAIL_COLUMNS instead of loading the entity
+        :param user_id: int
+        :return: Row | None
+        """
+        result = await self.db.execute(select(*_columns(DETAIL_COLUMNS)).where(User.id == user_id))
+        return result.first()
+
+    async def get_all(self, limit: int, offset: int) -> list[Row]:
+        """
+        Method to get all users as RESPONSE_COLUMNS tuples
+        :return: List[Row]
+        """
+        try:
+            stmt = select(*_columns(RESPONSE_COLUMNS)).order_by(User.id).offset(offset).limit(limit)
+            result = await self.db.execute(stmt)
+            users = result.all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return users
+
+    async def get_after(self, after_id: Optional[int], limit: int) -> list[Row]:
+        """
+        Method to get the users with id greater than after_id, seeking on the id index
+        :param after_id: int | None
+        :param limit: int
+        :return: List[Row] of RESPONSE_COLUMNS tuples
+        """
+        try:
+            stmt = select(*_columns(RESPONSE_COLUMNS))
+            if after_id is not None:
+                stmt = stmt.where(User.id > after_id)
+            result = await self.db.execute(stmt.order_by(User.id).limit(limit))
+            users = result.all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return users
+
+    async def get_all_with_count(self, limit: int, offset: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a page of users and the total count in one query
+        :param limit: int
+        :param offset: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None)
+        """
+        try:
+            result = await self.db.execute(
+                select(*_columns(RESPONSE_COLUMNS), _total_count()).order_by(User.id).offset(offset).limit(limit)
+            )
+            rows = result.all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return _split_count(rows)
+
+    async def get_after_with_count(self, after_id: Optional[int], limit: int) -> tuple[list[Row], Optional[int]]:
+        """
+        Method to get a keyset page of users and the total count in one query
+        :param after_id: int | None
+        :param limit: int
+        :return: (List[Row] of RESPONSE_COLUMNS tuples, total count | None)
+        """
+        try:
+            stmt = select(*_columns(RESPONSE_COLUMNS), _total_count())
+            if after_id is not None:
+                stmt = stmt.where(User.id > after_id)
+            result = await self.db.execute(stmt.order_by(User.id).limit(limit))
+            rows = result.all()
+        except Exception as e:
+            raise RepositoryError(f"Failed to get users: {e}")
+        return _split_count(rows)
+
+    async def iter_export(self, batch_size: int) -> AsyncIterator[tuple]:
+        """
+        Method to stream every user as EXPORT_COLUMNS tuples, without building ORM objects.
+        yield_per keeps a server-side cursor so memory stays constant regardless of table size
+        :param batch_size: int rows fetched per round-trip
+        :return: AsyncIterator[tuple]
+        """
+        stmt = (
+            select(*_columns(EXPORT_COLUMNS))
+            .order_by(User.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.db.stream(stmt)
+        async for row in result:
+            yield tuple(row)
+
+    async def count(self) -> int:
+        """
+        Method to count users
+        :return: int
+        """
+        return await self.db.scalar(select(func.count()).select_from(User))
+
+    async def estimated_count(self) -> Optional[int]:
+        """
+        Method to get the Postgres planner estimate (pg_class.reltuples) of the number of users
+        :return: int | None if not on Postgres or the table was never analyzed
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return None
+        estimate = await self.db.scalar(ESTIMATED_COUNT_QUERY, {"table": User.__tablename__})
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    async def add(self, user: UserCreate) -> Row:
+        """
+        Method to add a new user in a single INSERT ... RETURNING.
+        Uniqueness is left to the constraints on email and username
+        :param user: UserCreate
+        :return: Row of RESPONSE_COLUMNS
+        """
+        # Antes del commit: un login apenas creado el usuario no puede ser rechazado por el filtro
+        username_filter.add(user.username)
+        try:
+            result = await self.db.execute(
+                insert(User).values(_insert_values([user])[0]).returning(*_columns(RESPONSE_COLUMNS))
+            )
+            new_user = result.one()
+            await self.db.commit()
+        except IntegrityError as e:
+            await self.db.rollback()
+            raise _integrity_error(e, user, "create")
+        except Exception as e:
+            await self.db.rollback()
+            raise RepositoryError(f"Failed to create user: {e}")
+        response_cache.invalidate()
+        return new_user
+
+    async def update(self, user_id: int, user: UserUpdate) -> Row:
+        """
+        Method to update a user in a single UPDATE ... RETURNING.
+        Uniqueness is left to the constraints on email and username
+        :param user_id: int
+        :param user: UserUpdate
+        :return: Row of RESPONSE_COLUMNS
+        """
+        values = user.model_dump(exclude_unset=True)
+        if values.get("username"):
+            username_filter.add(values["username"])
+        if not values:
+            updated_user = await self.get(user_id)
+        else:
+            try:
+                result = await self.db.execute(
+                    update(User).where(User.id == user_id).values(values).returning(*_columns(RESPONSE_COLUMNS))
+                )
+                updated_user = result.first()
+                await self.db.commit()
+            except IntegrityError as e:
+                await self.db.rollback()
+                raise _integrity_error(e, user, "update")
+            except Exception as e:
+                await self.db.rollback()
+                raise RepositoryError(f'Failed to update user: {e}')
+        if updated_user is None:
+            raise ItemNotFoundError('user', user_id)
+        principal_cache.invalidate(user_id)
+        response_cache.invalidate()
+        return updated_user
+
+    async def delete(self, user_id: int) -> bool:
+        """
+        Method to delete a user
+        :param user_id:
+        :return: bool
+        """
+
+        user_to_delete = await self.db.get(User, user_id)
+        try:
+            await self.db.delete(user_to_delete)
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise RepositoryError(f"Failed to delete user: {e}")
+        principal_cache.invalidate(user_id)
+        response_cache.invalidate()
+        return True
+
+    async def get_user_by_email(self, email: EmailStr) -> Optional[Row]:
+        """
+        Method to get user by email
+        :param email: EmailStr
+        :return: Row | None
+        """
+
+        result = await self.db.execute(select(*_columns(DETAIL_COLUMNS)).where(User.email == email))
+        return result.first()
+
+    async def get_user_by_username_or_email(self, username: str, email: str) -> Optional[User]:
+        """
+        Method to get user by username or email
+        :param username: str
+        :param email: str
+        :return: user | None
+        """
+
+        return await self.db.scalar(select(User).where(or_(User.username == username, User.email == email)))
+
+    async def get_existing_identities(self, usernames: list[str], emails: list[str]) -> tuple[set[str], set[str]]:
+        """
+        Method to find which usernames and emails are already taken, in a single query
+        :param usernames: list[str]
+        :param emails: list[str]
+        :return: (taken usernames, taken emails)
+        """
+        result = await self.db.execute(
+            select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        )
+        rows = result.all()
+        return {row.username for row in rows}, {row.email for row in rows}
+
+    async def add_many(self, users: list[UserCreate]) -> list[int]:
+        """
+        Method to insert a batch of users in one statement
+        :param users: list[UserCreate] with the password already hashed
+        :return: list[int] new ids, in the same order
+        :raises UserAlreadyExistsError: a username or email was taken since it was checked, nothing inserted
+        """
+        if not users:
+            return []
+        username_filter.add(*(user.username for user in users))
+        try:
+            result = await self.db.execute(
+                insert(User).returning(User.id, sort_by_parameter_order=True), _insert_values(users)
+            )
+            ids = list(result.scalars().all())
+            await self.db.commit()
+        except IntegrityError as e:
+            await self.db.rollback()
+            raise _integrity_error(e, None, "create")
+        except Exception as e:
+            await self.db.rollback()
+            raise RepositoryError(f"Failed to create users: {e}")
+        response_cache.invalidate()
+        return ids
@@ -1,15 +1,23 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
 
+CountKind = Literal["exact", "cached", "estimated"]
+
 class Metadata(BaseModel):
-    total_count: int
+    total_count: Optional[int] = None
+    count_kind: Optional[CountKind] = Field(None, description="How total_count was obtained, null if skipped")
     limit: int
-    offset: int
-    current_page: int
-    total_pages: int
+    offset: Optional[int] = None
+    current_page: Optional[int] = None
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 class PaginationParams(BaseModel):
     limit: Optional[int] = Field(10, ge=1, description="Number of items to return")
-    offset: Optional[int] = Field(0, ge=0, description="Number of items to skip")
\ No newline at end of file
+    offset: Optional[int] = Field(0, ge=0, description="Number of items to skip")
+    mode: Literal["offset", "cursor"] = Field("offset", description="Pagination mode, cursor seeks on the id index")
+    cursor: Optional[str] = Field(None, description="Opaque cursor from metadata.next_cursor, implies cursor mode")
+    include_total: bool = Field(True, description="Whether to compute metadata.total_count")
+    count: CountKind = Field("exact", description="exact, cached (bounded staleness) or estimated (planner statistics)")
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 # TokenData schema
@@ -10,3 +12,7 @@ class TokenData(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
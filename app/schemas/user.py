@@ -1,6 +1,7 @@
 """
 This module contains the Pydantic models for the User model.
 """
+from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, EmailStr, ConfigDict, Field
 
@@ -19,6 +20,8 @@ class UserResponse(BaseModel):
     username: str
     email: str
     address: Optional[str] = None
+    # Versión del registro para el ETag, no forma parte del cuerpo
+    updated_at: Optional[datetime] = Field(None, exclude=True)
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -0,0 +1,64 @@
+"""
+Production entry point: runs the application under uvicorn with several worker processes
+
+    python -m app.server
+
+Workers default to one per CPU (WEB_CONCURRENCY). With loop/http set to "auto" uvicorn uses
+uvloop and httptools when they are installed (pip install uvicorn[standard]) and falls back
+to asyncio and h11 otherwise.
+"""
+import os
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def worker_count() -> int:
+    """
+    Number of worker processes to start
+    :return: int
+    """
+    return max(1, settings.WEB_CONCURRENCY)
+
+
+def hash_workers_per_process(workers: int) -> int:
+    """
+    bcrypt threads of each worker, so that all the workers together use at most one per CPU
+    :param workers: int worker processes
+    :return: int
+    """
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def server_options() -> dict:
+    """
+    Keyword arguments for uvicorn.run built from the server settings
+    :return: dict
+    """
+    workers = worker_count()
+    return {
+        "host": settings.HOST,
+        "port": settings.PORT,
+        "workers": workers,
+        "loop": settings.SERVER_LOOP,
+        "http": settings.SERVER_HTTP,
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout_keep_alive": settings.SERVER_KEEP_ALIVE,
+        # Tiempo para drenar los requests en curso antes de cerrar en SIGTERM
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT,
+        "log_level": settings.LOG_LEVEL,
+        "access_log": settings.ACCESS_LOG,
+        "proxy_headers": True,
+    }
+
+
+def main():
+    options = server_options()
+    # Los workers heredan el entorno: sin esto cada uno crearía un hilo de bcrypt por CPU
+    os.environ.setdefault("HASH_POOL_WORKERS", str(hash_workers_per_process(options["workers"])))
+    uvicorn.run("main:app", **options)
+
+
+if __name__ == "__main__":
+    main()
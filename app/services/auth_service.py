@@ -1,8 +1,9 @@
 """
     This module is responsible for handling the business logic of the authentication service.
 """
-from app.repositories.auth_repository import AuthRepository
+from app.repositories.auth_repository import AuthRepository, AsyncAuthRepository
 from app.schemas.auth import Login
+from app.schemas.token import TokenResponse
 
 
 class AuthService:
@@ -24,3 +25,54 @@ class AuthService:
         :return: dict[str, str]:
         """
         return self.repo.auth_user(login)
+
+    def refresh(self, refresh_token: str) -> TokenResponse:
+        """
+        Function to rotate a refresh token, no password hashing involved
+        :param refresh_token: str
+        :return: TokenResponse
+        """
+        return self.repo.refresh(refresh_token)
+
+    def revoke(self, refresh_token: str) -> None:
+        """
+        Function to revoke a refresh token and its family
+        :param refresh_token: str
+        """
+        self.repo.revoke(refresh_token)
+
+
+class AsyncAuthService:
+    """
+    AsyncAuthService class to handle authentication service on the async database stack
+    """
+
+    def __init__(self, repo: AsyncAuthRepository):
+        """
+        Constructor for AsyncAuthService class
+        :param repo:
+        """
+        self.repo = repo
+
+    async def auth_user(self, login: Login) -> dict[str, str]:
+        """
+        Function to authenticate user
+        :param login: Login
+        :return: dict[str, str]:
+        """
+        return await self.repo.auth_user(login)
+
+    async def refresh(self, refresh_token: str) -> TokenResponse:
+        """
+        Function to rotate a refresh token, no password hashing involved
+        :param refresh_token: str
+        :return: TokenResponse
+        """
+        return await self.repo.refresh(refresh_token)
+
+    async def revoke(self, refresh_token: str) -> None:
+        """
+        Function to revoke a refresh token and its family
+        :param refresh_token: str
+        """
+        await self.repo.revoke(refresh_token)
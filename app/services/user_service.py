@@ -1,14 +1,112 @@
 """
     This module contains the service class for user related operations
 """
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional, Union
 
-from pydantic import EmailStr
+from pydantic import EmailStr, TypeAdapter, ValidationError
 
-from app.core.exceptions import ItemNotFoundError, UserAlreadyExistsError
+from app.core.exceptions import ItemNotFoundError, RepositoryError, UserAlreadyExistsError
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
-from app.repositories.user_respository import IUserRepository
-from app.utils.hashing import Hasher
+from app.repositories.user_respository import RESPONSE_COLUMNS, IUserRepository, IAsyncUserRepository
+from app.utils.cache import user_count_cache
+from app.utils.hashing import Hasher, hashing_pool
+
+
+# Valida una página entera de filas proyectadas de una sola vez
+UserResponseList = TypeAdapter(list[UserResponse])
+
+
+def validate_rows(rows) -> list[UserResponse]:
+    """
+    Validate a page of RESPONSE_COLUMNS tuples in one batch. Extra trailing columns (total_count) are dropped
+    :param rows: list of Row
+    :return: List[UserResponse]
+    """
+    return UserResponseList.validate_python([dict(zip(RESPONSE_COLUMNS, row)) for row in rows])
+
+# Fila del import masivo: (número de fila, registro o mensaje de error de parseo)
+ImportRow = tuple[int, Union[dict, str]]
+
+
+def _import_created(row: int, user_id: int) -> dict:
+    return {"row": row, "status": "created", "id": user_id}
+
+
+def _import_error(row: int, detail: str) -> dict:
+    return {"row": row, "status": "error", "detail": detail}
+
+
+def _prepare_import(rows: list[ImportRow]) -> tuple[dict[int, dict], list[tuple[int, UserCreate]]]:
+    """
+    Validate a batch of import rows and drop duplicates inside the batch
+    :param rows: list[ImportRow]
+    :return: (results of the rejected rows by row number, candidate users)
+    """
+    results = {}
+    candidates = []
+    usernames, emails = set(), set()
+    for row, record in rows:
+        if isinstance(record, str):
+            results[row] = _import_error(row, record)
+            continue
+        try:
+            user = UserCreate.model_validate(record)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            results[row] = _import_error(row, detail)
+            continue
+        if user.username in usernames:
+            results[row] = _import_error(row, str(UserAlreadyExistsError('username', user.username)))
+        elif user.email in emails:
+            results[row] = _import_error(row, str(UserAlreadyExistsError('email', user.email)))
+        else:
+            usernames.add(user.username)
+            emails.add(user.email)
+            candidates.append((row, user))
+    return results, candidates
+
+
+def _drop_taken(candidates: list[tuple[int, UserCreate]], taken_usernames: set[str], taken_emails: set[str],
+                results: dict[int, dict]) -> list[tuple[int, UserCreate]]:
+    """
+    Reject the candidates whose username or email already exists
+    """
+    remaining = []
+    for row, user in candidates:
+        if user.email in taken_emails:
+            results[row] = _import_error(row, str(UserAlreadyExistsError('email', user.email)))
+        elif user.username in taken_usernames:
+            results[row] = _import_error(row, str(UserAlreadyExistsError('username', user.username)))
+        else:
+            remaining.append((row, user))
+    return remaining
+
+
+def _apply_hashes(candidates: list[tuple[int, UserCreate]], hashes: list,
+                  results: dict[int, dict]) -> list[tuple[int, UserCreate]]:
+    """
+    Replace the plain passwords with their hashes, rejecting the rows whose hashing failed
+    """
+    remaining = []
+    for (row, user), hashed in zip(candidates, hashes):
+        if isinstance(hashed, Exception):
+            results[row] = _import_error(row, str(hashed))
+        else:
+            user.password = hashed
+            remaining.append((row, user))
+    return remaining
+
+
+def _store_results(candidates: list[tuple[int, UserCreate]],
+                   ids: Union[list[int], RepositoryError, UserAlreadyExistsError], results: dict[int, dict]) -> None:
+    """
+    Record the outcome of the batch insert
+    """
+    for index, (row, _) in enumerate(candidates):
+        if isinstance(ids, Exception):
+            results[row] = _import_error(row, str(ids).splitlines()[0])
+        else:
+            results[row] = _import_created(row, ids[index])
 
 
 class UserService:
@@ -29,26 +127,120 @@ class UserService:
         :return: UserResponse
         """
 
-        existing_user = self.get_user_by_username_or_email(user.username, user.email)
-        if existing_user:
-            if existing_user.email == user.email:
-                raise UserAlreadyExistsError('email', user.email)
-            elif existing_user.username == user.username:
-                raise UserAlreadyExistsError('username', user.username)
-
-        user.password = Hasher.get_password_hash(user.password)
+        # Los duplicados los detectan las restricciones únicas al insertar (UserAlreadyExistsError)
+        user.password = hashing_pool.run_sync(Hasher.get_password_hash, user.password)
         created_user = self.user_repository.add(user)
         return UserResponse.model_validate(created_user)
 
-    def get_users(self, limit: int, offset: int) -> tuple[list[UserResponse], int]:
+    def import_users(self, rows: list[ImportRow]) -> list[dict]:
+        """
+        Method to create a batch of users for the bulk import
+        :param rows: list[ImportRow]
+        :return: list[dict] per-row result, in the same order
+        """
+        results, candidates = _prepare_import(rows)
+        if candidates:
+            candidates = self._reject_taken(candidates, results)
+            hashes = hashing_pool.map_sync(Hasher.get_password_hash, [(user.password,) for _, user in candidates])
+            candidates = _apply_hashes(candidates, hashes, results)
+            try:
+                ids = self.user_repository.add_many([user for _, user in candidates])
+            except UserAlreadyExistsError:
+                # Un alta concurrente tomó un username o email después de la consulta: se consulta y reintenta una vez
+                candidates = self._reject_taken(candidates, results)
+                try:
+                    ids = self.user_repository.add_many([user for _, user in candidates])
+                except (UserAlreadyExistsError, RepositoryError) as e:
+                    ids = e
+            except RepositoryError as e:
+                ids = e
+            _store_results(candidates, ids, results)
+        return [results[row] for row, _ in rows]
+
+    def _reject_taken(self, candidates: list[tuple[int, UserCreate]],
+                     results: dict[int, dict]) -> list[tuple[int, UserCreate]]:
+        """
+        Method to reject the import candidates whose username or email already exists, in one query
+        :param candidates: list of (row, UserCreate)
+        :param results: dict of row results, updated with the rejected rows
+        :return: the remaining candidates
+        """
+        taken_usernames, taken_emails = self.user_repository.get_existing_identities(
+            [user.username for _, user in candidates], [user.email for _, user in candidates]
+        )
+        return _drop_taken(candidates, taken_usernames, taken_emails, results)
+
+    def get_users(self, limit: int, offset: int,
+                  count_mode: Optional[str] = "exact") -> tuple[list[UserResponse], Optional[int], Optional[str]]:
         """
         Method to get all users
-        :return: list[UserResponse]
+        :param limit: int
+        :param offset: int
+        :param count_mode: exact | cached | estimated | None to skip the total
+        :return: (users, total count, count kind)
+        """
+        if count_mode == "exact":
+            # Página y total en un único round-trip
+            rows, count = self.user_repository.get_all_with_count(limit, offset)
+            if count is None:
+                count = self.user_repository.count()
+            return validate_rows(rows), count, "exact"
+
+        rows = self.user_repository.get_all(limit, offset)
+        count, count_kind = self._count(count_mode)
+        return validate_rows(rows), count, count_kind
+
+    def get_users_after(self, after_id: Optional[int], limit: int, count_mode: Optional[str] = "exact"
+                        ) -> tuple[list[UserResponse], Optional[int], Optional[int], Optional[str]]:
+        """
+        Method to get a page of users with keyset pagination
+        :param after_id: int | None last id of the previous page
+        :param limit: int
+        :param count_mode: exact | cached | estimated | None to skip the total
+        :return: (users, last id if there is a next page, total count, count kind)
+        """
+        # Se pide un registro extra para saber si hay una página siguiente
+        if count_mode == "exact":
+            rows, count = self.user_repository.get_after_with_count(after_id, limit + 1)
+            if count is None:
+                count = self.user_repository.count()
+            count_kind = "exact"
+        else:
+            rows = self.user_repository.get_after(after_id, limit + 1)
+            count, count_kind = self._count(count_mode)
+        users = validate_rows(rows)
+        next_after_id = users[limit - 1].id if len(users) > limit else None
+        return users[:limit], next_after_id, count, count_kind
+
+    def _count(self, count_mode: Optional[str]) -> tuple[Optional[int], Optional[str]]:
         """
-        # Check if exist users
-        users = self.user_repository.get_all(limit, offset)
+        Method to get the total of users for the non exact count modes
+        :param count_mode: cached | estimated | None
+        :return: (total count, count kind)
+        """
+        if count_mode is None:
+            return None, None
+        if count_mode == "estimated":
+            estimate = self.user_repository.estimated_count()
+            if estimate is not None:
+                return estimate, "estimated"
+        elif count_mode == "cached":
+            cached = user_count_cache.get("users")
+            if cached is not None:
+                return cached, "cached"
+
         count = self.user_repository.count()
-        return users, count
+        if count_mode == "cached":
+            user_count_cache.set("users", count)
+        return count, "exact"
+
+    def export_users(self, batch_size: int) -> Iterator[tuple]:
+        """
+        Method to stream every user for the export
+        :param batch_size: int
+        :return: Iterator[tuple] of EXPORT_COLUMNS
+        """
+        return self.user_repository.iter_export(batch_size)
 
     def get_user_by_id(self, user_id: int) -> UserResponse:
         """
@@ -79,17 +271,9 @@ class UserService:
         :return: UserResponse
         """
 
-        user_by_username = self.get_user_by_username_or_email(user.username, '')
-        user_by_mail = self.get_user_by_username_or_email('', user.email)
-
-        # Chequeamos si el usuario ya existe y no es el que esta actualizando
-        if user_by_username and user_by_username.id != user_id:
-            raise UserAlreadyExistsError('username', user.username)
-        elif user_by_mail and user_by_mail.id != user_id:
-            raise UserAlreadyExistsError('email', user.email)
-
+        # Un único UPDATE ... RETURNING: username/email repetidos los rechaza la base (UserAlreadyExistsError)
         if user.password:
-            user.password = Hasher.get_password_hash(user.password)
+            user.password = hashing_pool.run_sync(Hasher.get_password_hash, user.password)
 
         updated_user = self.user_repository.update(user_id, user)
 
@@ -116,3 +300,189 @@ class UserService:
         user = self.user_repository.get_user_by_username_or_email(username, email)
 
         return user
+
+
+class AsyncUserService:
+    """
+        Service class for user related operations on the async database stack
+    """
+    def __init__(self, user_repository: IAsyncUserRepository):
+        """
+        Constructor for AsyncUserService class
+        :param user_repository: IAsyncUserRepository
+        """
+        self.user_repository = user_repository
+
+    async def create_user(self, user: UserCreate) -> UserResponse:
+        """
+        Method to create a new user
+        :param user: UserCreate
+        :return: UserResponse
+        """
+
+        # Los duplicados los detectan las restricciones únicas al insertar (UserAlreadyExistsError)
+        user.password = await Hasher.get_password_hash_async(user.password)
+        created_user = await self.user_repository.add(user)
+        return UserResponse.model_validate(created_user)
+
+    async def import_users(self, rows: list[ImportRow]) -> list[dict]:
+        """
+        Method to create a batch of users for the bulk import
+        :param rows: list[ImportRow]
+        :return: list[dict] per-row result, in the same order
+        """
+        results, candidates = _prepare_import(rows)
+        if candidates:
+            candidates = await self._reject_taken(candidates, results)
+            hashes = await hashing_pool.map(Hasher.get_password_hash, [(user.password,) for _, user in candidates])
+            candidates = _apply_hashes(candidates, hashes, results)
+            try:
+                ids = await self.user_repository.add_many([user for _, user in candidates])
+            except UserAlreadyExistsError:
+                # Un alta concurrente tomó un username o email después de la consulta: se consulta y reintenta una vez
+                candidates = await self._reject_taken(candidates, results)
+                try:
+                    ids = await self.user_repository.add_many([user for _, user in candidates])
+                except (UserAlreadyExistsError, RepositoryError) as e:
+                    ids = e
+            except RepositoryError as e:
+                ids = e
+            _store_results(candidates, ids, results)
+        return [results[row] for row, _ in rows]
+
+    async def _reject_taken(self, candidates: list[tuple[int, UserCreate]],
+                           results: dict[int, dict]) -> list[tuple[int, UserCreate]]:
+        """
+        Method to reject the import candidates whose username or email already exists, in one query
+        :param candidates: list of (row, UserCreate)
+        :param results: dict of row results, updated with the rejected rows
+        :return: the remaining candidates
+        """
+        taken_usernames, taken_emails = await self.user_repository.get_existing_identities(
+            [user.username for _, user in candidates], [user.email for _, user in candidates]
+        )
+        return _drop_taken(candidates, taken_usernames, taken_emails, results)
+
+    async def get_users(self, limit: int, offset: int,
+                        count_mode: Optional[str] = "exact") -> tuple[list[UserResponse], Optional[int], Optional[str]]:
+        """
+        Method to get all users
+        :param limit: int
+        :param offset: int
+        :param count_mode: exact | cached | estimated | None to skip the total
+        :return: (users, total count, count kind)
+        """
+        if count_mode == "exact":
+            rows, count = await self.user_repository.get_all_with_count(limit, offset)
+            if count is None:
+                count = await self.user_repository.count()
+            return validate_rows(rows), count, "exact"
+
+        rows = await self.user_repository.get_all(limit, offset)
+        count, count_kind = await self._count(count_mode)
+        return validate_rows(rows), count, count_kind
+
+    async def get_users_after(self, after_id: Optional[int], limit: int, count_mode: Optional[str] = "exact"
+                              ) -> tuple[list[UserResponse], Optional[int], Optional[int], Optional[str]]:
+        """
+        Method to get a page of users with keyset pagination
+        :param after_id: int | None last id of the previous page
+        :param limit: int
+        :param count_mode: exact | cached | estimated | None to skip the total
+        :return: (users, last id if there is a next page, total count, count kind)
+        """
+        if count_mode == "exact":
+            rows, count = await self.user_repository.get_after_with_count(after_id, limit + 1)
+            if count is None:
+                count = await self.user_repository.count()
+            count_kind = "exact"
+        else:
+            rows = await self.user_repository.get_after(after_id, limit + 1)
+            count, count_kind = await self._count(count_mode)
+        users = validate_rows(rows)
+        next_after_id = users[limit - 1].id if len(users) > limit else None
+        return users[:limit], next_after_id, count, count_kind
+
+    async def _count(self, count_mode: Optional[str]) -> tuple[Optional[int], Optional[str]]:
+        """
+        Method to get the total of users for the non exact count modes
+        :param count_mode: cached | estimated | None
+        :return: (total count, count kind)
+        """
+        if count_mode is None:
+            return None, None
+        if count_mode == "estimated":
+            estimate = await self.user_repository.estimated_count()
+            if estimate is not None:
+                return estimate, "estimated"
+        elif count_mode == "cached":
+            cached = user_count_cache.get("users")
+            if cached is not None:
+                return cached, "cached"
+
+        count = await self.user_repository.count()
+        if count_mode == "cached":
+            user_count_cache.set("users", count)
+        return count, "exact"
+
+    def export_users(self, batch_size: int) -> AsyncIterator[tuple]:
+        """
+        Method to stream every user for the export
+        :param batch_size: int
+        :return: AsyncIterator[tuple] of EXPORT_COLUMNS
+        """
+        return self.user_repository.iter_export(batch_size)
+
+    async def get_user_by_id(self, user_id: int) -> UserResponse:
+        """
+        Method to get user by id
+        :param user_id: int
+        :return: UserResponse
+        """
+        user = await self.user_repository.get(user_id)
+        if user is None:
+            raise ItemNotFoundError('user', user_id)
+
+        return user
+
+    async def delete_user(self, user_id: int) -> bool:
+        """
+        Method to delete a user
+        :param user_id: int
+        :return: bool
+        """
+        return await self.user_repository.delete(user_id)
+
+    async def update_user(self, user_id: int, user: UserUpdate) -> UserResponse:
+        """
+        Method to update a user
+        :param user_id: int
+        :param user: UserUpdate
+        :return: UserResponse
+        """
+
+        # Un único UPDATE ... RETURNING: username/email repetidos los rechaza la base (UserAlreadyExistsError)
+        if user.password:
+            user.password = await Hasher.get_password_hash_async(user.password)
+
+        return await self.user_repository.update(user_id, user)
+
+    async def get_user_by_email(self, email: EmailStr) -> Optional[UserResponse]:
+        """
+        Method to get user by email
+        :param email: EmailStr
+        :return: UserResponse
+        """
+        user = await self.user_repository.get_user_by_email(email)
+        if not user:
+            raise ItemNotFoundError('user', email)
+        return user
+
+    async def get_user_by_username_or_email(self, username: str, email: str) -> Optional[UserResponse]:
+        """
+        Method to get user by username or email
+        :param username: str
+        :param email: str
+        :return: UserResponse
+        """
+        return await self.user_repository.get_user_by_username_or_email(username, email)
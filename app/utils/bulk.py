@@ -0,0 +1,246 @@
+"""
+Bulk import utility: incremental NDJSON/CSV parsing and batched processing of a request stream
+"""
+import codecs
+import csv
+import json
+import logging
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/jsonl", "application/json-lines"}
+CSV_CONTENT_TYPES = {"text/csv"}
+
+# Detalle de las filas de un lote que falló entero (el error se loguea, no se expone al cliente)
+BATCH_FAILED = "Batch not imported, retry these rows"
+
+logger = logging.getLogger(__name__)
+
+
+def import_format(content_type: Optional[str]) -> Optional[str]:
+    """
+    Map a Content-Type header to an import format
+    :param content_type: str | None
+    :return: ndjson | csv | None if unsupported
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    if media_type in CSV_CONTENT_TYPES:
+        return "csv"
+    return None
+
+
+def decode_line(line: bytes, first: bool) -> tuple[Optional[str], Optional[str]]:
+    """
+    Decode one line of the body. Lines are split at b"\\n", which never occurs inside a multi-byte
+    UTF-8 sequence, so a strict decode per line is what an incremental decoder would do, and an
+    invalid line does not affect the next one
+    :param line: bytes without the newline
+    :param first: bool, True for the first line of the body: the only one that may start with a BOM
+    :return: (line, None) or (None, error message)
+    """
+    if first and line.startswith(codecs.BOM_UTF8):
+        line = line[len(codecs.BOM_UTF8):]
+    try:
+        return line.decode("utf-8").rstrip("\r"), None
+    except UnicodeDecodeError:
+        return None, "Invalid UTF-8"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes],
+                     max_line_bytes: int) -> AsyncIterator[tuple[Optional[str], Optional[str]]]:
+    """
+    Split a byte stream into decoded lines, holding at most `max_line_bytes` of the current line in memory
+    :param chunks: AsyncIterator[bytes]
+    :param max_line_bytes: int, a longer line is dropped and reported as an error
+    :return: AsyncIterator of (line, None) or (None, error message)
+    """
+    too_long = f"Line longer than {max_line_bytes} bytes"
+    buffer = bytearray()
+    overflow = False
+    first = True
+    async for chunk in chunks:
+        # Solo se busca el salto de línea en los bytes nuevos: el resto del buffer no tiene ninguno
+        search = len(buffer)
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", search)) != -1:
+            if overflow or end - start > max_line_bytes:
+                yield None, too_long
+            else:
+                yield decode_line(bytes(buffer[start:end]), first)
+            overflow, first = False, False
+            start = search = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            overflow = True
+            buffer.clear()
+    if overflow:
+        yield None, too_long
+    elif buffer:
+        yield decode_line(bytes(buffer), first)
+
+
+class LineFeed:
+    """
+    Input of the single csv.reader of an import. Lines are queued here and the reader is only asked for
+    a record once all its lines are queued, so it never runs out of input in the middle of a record
+    """
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+def in_quoted_field(line: str, quoted: bool) -> bool:
+    """
+    Whether a CSV record is still inside a quoted field at the end of `line`, following the csv module
+    rules for the default dialect: a quote opens a quoted field only at the start of a field and ""
+    inside it is an escaped quote
+    :param line: str
+    :param quoted: bool, inside a quoted field at the start of the line
+    :return: bool
+    """
+    if not quoted and '"' not in line:
+        return False
+    field_start = not quoted
+    i, size = 0, len(line)
+    while i < size:
+        char = line[i]
+        if quoted:
+            if char == '"':
+                if line.startswith('"', i + 1):
+                    i += 1
+                else:
+                    quoted = False
+        elif char == '"' and field_start:
+            quoted = True
+        field_start = not quoted and char == ","
+        i += 1
+    return quoted
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes],
+                           max_line_bytes: int) -> AsyncIterator[tuple[Optional[list[str]], Optional[str]]]:
+    """
+    Parse CSV records with one csv.reader over the body, so a quoted field may span several lines
+    :param chunks: AsyncIterator[bytes]
+    :param max_line_bytes: int, maximum size of a line and of a record
+    :return: AsyncIterator of (field values, None) or (None, error message)
+    """
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    quoted = False
+    size = 0
+    async for line, error in iter_lines(chunks, max_line_bytes):
+        if error is not None:
+            # Una línea inválida descarta el registro que estaba en curso
+            feed.lines.clear()
+            quoted, size = False, 0
+            yield None, error
+            continue
+        if not feed.lines and not line.strip():
+            continue
+        feed.lines.append(line + "\n")
+        quoted = in_quoted_field(line, quoted)
+        if quoted:
+            # Registro que sigue en la próxima línea: se limita su tamaño total
+            size += len(line.encode()) + 1
+            if size > max_line_bytes:
+                feed.lines.clear()
+                quoted, size = False, 0
+                yield None, f"Record longer than {max_line_bytes} bytes"
+            continue
+        size = 0
+        try:
+            yield next(reader), None
+        except csv.Error as e:
+            yield None, f"Invalid CSV: {e}"
+    if feed.lines:
+        yield None, "Unterminated quoted field"
+
+
+async def iter_rows(chunks: AsyncIterator[bytes], fmt: str,
+                    max_line_bytes: int) -> AsyncIterator[tuple[int, Union[dict, str]]]:
+    """
+    Parse NDJSON or CSV (header on the first record) records from a byte stream
+    :param chunks: AsyncIterator[bytes]
+    :param fmt: ndjson | csv
+    :param max_line_bytes: int, see iter_lines
+    :return: AsyncIterator of (row number, record dict or parse error message)
+    """
+    row = 0
+    if fmt == "csv":
+        header = None
+        async for values, error in iter_csv_records(chunks, max_line_bytes):
+            if error is None and header is None:
+                header = [value.strip() for value in values]
+                continue
+            row += 1
+            if error is not None:
+                yield row, error
+            elif len(values) != len(header):
+                yield row, f"Expected {len(header)} columns, got {len(values)}"
+            else:
+                yield row, {key: value for key, value in zip(header, values) if value != ""}
+        return
+
+    async for line, error in iter_lines(chunks, max_line_bytes):
+        if error is None and not line.strip():
+            continue
+        row += 1
+        if error is not None:
+            yield row, error
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, f"Invalid JSON: {e.msg}"
+            continue
+        yield row, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+async def import_report(rows: AsyncIterator[tuple[int, Union[dict, str]]],
+                        import_batch: Callable[[list], Awaitable[list[dict]]],
+                        batch_size: int) -> AsyncIterator[bytes]:
+    """
+    Feed the rows to `import_batch` in batches, yielding the per-row results as NDJSON once per batch
+    and a final summary line, so the client gets the report of a batch as soon as it is committed.
+    A batch whose `import_batch` raises is reported with an error per row and the import goes on
+    :param rows: AsyncIterator of import rows
+    :param import_batch: coroutine taking a batch of rows and returning their results
+    :param batch_size: int
+    :return: AsyncIterator[bytes] of NDJSON report chunks
+    """
+    summary = {"created": 0, "failed": 0}
+
+    async def flush(batch) -> bytes:
+        try:
+            results = await import_batch(batch)
+        except Exception:
+            # El 200 y los lotes anteriores ya se enviaron: el lote se reporta fallido y el import sigue
+            logger.exception("Bulk import of rows %s to %s failed", batch[0][0], batch[-1][0])
+            results = [{"row": row, "status": "error", "detail": BATCH_FAILED} for row, _ in batch]
+        lines = []
+        for result in results:
+            summary["created" if result["status"] == "created" else "failed"] += 1
+            lines.append(json.dumps(result))
+        return ("\n".join(lines) + "\n").encode()
+
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield await flush(batch)
+            batch = []
+    if batch:
+        yield await flush(batch)
+
+    yield json.dumps({"summary": summary}).encode() + b"\n"
@@ -0,0 +1,345 @@
+"""
+Cache utility: TTL/LRU backends (in-process or shared store), the authenticated principal cache
+and the response cache of the user reads
+"""
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.schemas.token import TokenData
+
+
+class CacheBackend(ABC):
+    """
+    Cache backend interface
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Method to get a value, None if missing or expired
+        :param key: str
+        :return: value | None
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        Method to store a value for `ttl` seconds
+        :param key: str
+        :param value: Any
+        :param ttl: float seconds
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Method to remove a value
+        :param key: str
+        """
+        pass
+
+
+class InMemoryCache(CacheBackend):
+    """
+    In-process cache with a per-entry TTL and an LRU size bound
+    """
+    def __init__(self, max_size: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Method to drop every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedStoreCache(CacheBackend):
+    """
+    Cache stored in a shared key-value store shared by every worker.
+    The client only needs redis-style `get`, `set(name, value, px=)` and `delete`,
+    so tests can pass an in-memory fake. Values must be str or bytes.
+    """
+    def __init__(self, client, prefix: str = ""):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+
+def redis_client(url: str):
+    """
+    Build a redis client, redis is an optional dependency
+    :param url: str
+    :return: redis.Redis
+    """
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("The shared cache backend requires the 'redis' package") from e
+    return redis.Redis.from_url(url)
+
+
+class Cache:
+    """
+    Cache facade over a backend with a default TTL and hit/miss counters
+    """
+    def __init__(self, name: str, backend: CacheBackend, ttl: float):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = metrics.counter(f"{name}_cache_hits_total", f"{name} cache hits")
+        self.misses = metrics.counter(f"{name}_cache_misses_total", f"{name} cache misses")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Method to get a cached value
+        :param key: str
+        :return: value | None
+        """
+        value = self.backend.get(key)
+        if value is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Method to cache a value, with the default TTL if none is given
+        :param key: str
+        :param value: Any
+        :param ttl: float seconds | None
+        """
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key: str) -> None:
+        """
+        Method to invalidate a cached value
+        :param key: str
+        """
+        self.backend.delete(key)
+
+
+class PrincipalCache:
+    """
+    Cache of authenticated principals (id, username, is_superuser, active) keyed by user id,
+    so authenticated requests don't need a SELECT on users to confirm the user still exists.
+    Entries are stored under a per-user version that the user repository replaces on update and delete:
+    a principal read from the database before an invalidation is stored under the old version,
+    where nobody looks for it
+    """
+    def __init__(self, cache: Optional[Cache]):
+        self.cache = cache
+
+    @property
+    def _version_ttl(self) -> float:
+        # La versión vive más que las entradas que la usan
+        return self.cache.ttl * 10
+
+    def version(self, user_id: int) -> Optional[str]:
+        """
+        Method to get the current version of a user's entry, creating it if missing.
+        Read it before the database read whose result is cached
+        :param user_id: int
+        :return: str | None if the cache is disabled
+        """
+        if self.cache is None:
+            return None
+        version = self.cache.backend.get(f"version:{user_id}")
+        if version is None:
+            version = uuid.uuid4().hex
+            self.cache.backend.set(f"version:{user_id}", version, self._version_ttl)
+        return version
+
+    def get(self, user_id: int, version: Optional[str] = None) -> Optional[TokenData]:
+        """
+        Method to get a cached principal
+        :param user_id: int
+        :param version: str from version(), the current one by default
+        :return: TokenData | None
+        """
+        if self.cache is None:
+            return None
+        value = self.cache.get(f"{user_id}:{version or self.version(user_id)}")
+        return None if value is None else TokenData.model_validate_json(value)
+
+    def set(self, user, version: Optional[str] = None) -> TokenData:
+        """
+        Method to cache the principal of a user
+        :param user: User | UserResponse
+        :param version: str from version(), read before `user` was loaded; the current one by default
+        :return: TokenData
+        """
+        principal = TokenData(
+            id=user.id,
+            username=user.username,
+            is_superuser=bool(getattr(user, "is_superuser", False)),
+            active=bool(getattr(user, "active", True)),
+        )
+        if self.cache is not None:
+            self.cache.set(f"{user.id}:{version or self.version(user.id)}", principal.model_dump_json())
+        return principal
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Method to drop a cached principal, after the write is committed
+        :param user_id: int
+        """
+        if self.cache is not None:
+            self.cache.backend.set(f"version:{user_id}", uuid.uuid4().hex, self._version_ttl)
+
+
+def build_principal_cache() -> PrincipalCache:
+    """
+    Build the principal cache from settings
+    :return: PrincipalCache
+    """
+    backend_name = settings.PRINCIPAL_CACHE_BACKEND
+    if backend_name == "none":
+        return PrincipalCache(None)
+    if backend_name == "memory":
+        # Dos claves por usuario: la versión y el principal
+        backend = InMemoryCache(max_size=2 * settings.PRINCIPAL_CACHE_MAX_SIZE)
+    elif backend_name == "redis":
+        backend = SharedStoreCache(redis_client(settings.CACHE_REDIS_URL), prefix="principal:")
+    else:
+        raise ValueError(f"Invalid principal cache backend: {backend_name}")
+    return PrincipalCache(Cache("principal", backend, settings.PRINCIPAL_CACHE_TTL))
+
+
+principal_cache = build_principal_cache()
+
+
+class ResponseCache:
+    """
+    Cache of rendered user read responses as (ETag, JSON body), so a repeated read needs neither
+    a query nor serialization. Keys include a generation that every write to users replaces:
+    a write invalidates every cached read at once, and a read that started before the write
+    stores its result under the old generation, where nobody looks for it
+    """
+    def __init__(self, cache: Optional[Cache]):
+        self.cache = cache
+
+    def _generation(self) -> str:
+        generation = self.cache.backend.get("generation")
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self.cache.backend.set("generation", generation, self._generation_ttl)
+        return generation
+
+    @property
+    def _generation_ttl(self) -> float:
+        # Las entradas viven menos que la generación que las agrupa
+        return self.cache.ttl * 10
+
+    def key(self, *parts) -> Optional[str]:
+        """
+        Method to build the key of a response in the current generation
+        :param parts: resource name and identifiers
+        :return: str | None if the cache is disabled
+        """
+        if self.cache is None:
+            return None
+        return ":".join((self._generation(), *map(str, parts)))
+
+    def get(self, key: Optional[str]) -> Optional[tuple[str, str]]:
+        """
+        Method to get a cached response
+        :param key: str | None from key()
+        :return: (etag, body) | None
+        """
+        if key is None:
+            return None
+        value = self.cache.get(key)
+        if value is None:
+            return None
+        etag, _, body = value.partition("\n")
+        return etag, body
+
+    def set(self, key: Optional[str], etag: str, body: str) -> None:
+        """
+        Method to cache a response
+        :param key: str | None from key()
+        :param etag: str
+        :param body: str JSON
+        """
+        if key is not None:
+            self.cache.set(key, f"{etag}\n{body}")
+
+    def invalidate(self) -> None:
+        """
+        Method to drop every cached response, after a write to users
+        """
+        if self.cache is not None:
+            self.cache.backend.set("generation", uuid.uuid4().hex, self._generation_ttl)
+
+
+def build_response_cache() -> ResponseCache:
+    """
+    Build the response cache from settings
+    :return: ResponseCache
+    """
+    backend_name = settings.RESPONSE_CACHE_BACKEND
+    if backend_name == "none":
+        return ResponseCache(None)
+    if backend_name == "memory":
+        backend = InMemoryCache(max_size=settings.RESPONSE_CACHE_MAX_SIZE)
+    elif backend_name == "redis":
+        backend = SharedStoreCache(redis_client(settings.CACHE_REDIS_URL), prefix="response:")
+    else:
+        raise ValueError(f"Invalid response cache backend: {backend_name}")
+    return ResponseCache(Cache("response", backend, settings.RESPONSE_CACHE_TTL))
+
+
+response_cache = build_response_cache()
+
+# Total de usuarios para count=cached, su TTL es la máxima antigüedad tolerada
+user_count_cache = Cache("user_count", InMemoryCache(max_size=1), settings.USER_COUNT_CACHE_TTL)
@@ -0,0 +1,19 @@
+"""
+Concurrency helpers shared by the endpoints
+"""
+import inspect
+
+from fastapi.concurrency import run_in_threadpool
+
+
+async def run_service(func, *args, **kwargs):
+    """
+    Call a service method from an async endpoint.
+    Coroutine functions (async stack) are awaited directly, sync ones are run on the
+    threadpool so a blocking query never stalls the event loop.
+    :param func: service method
+    :return: the service method result
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_in_threadpool(func, *args, **kwargs)
@@ -0,0 +1,111 @@
+"""
+Conditional GET: weak ETags from the id and updated_at of the users in a response, and
+304 Not Modified answers that skip serialization
+"""
+import hashlib
+from typing import Callable, Iterable, Optional
+
+from fastapi import Request, Response, status
+
+from app.utils.cache import response_cache
+
+# Respuestas autenticadas: solo el cliente puede guardarlas, y debe revalidarlas con el ETag
+CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(*parts) -> str:
+    """
+    Weak ETag of the given values. Weak because the body may be re-encoded (compressed) on the way
+    :param parts: values that change whenever the representation changes
+    :return: str
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def user_etag(user) -> str:
+    """
+    ETag of one user
+    :param user: row or UserResponse with id and updated_at
+    :return: str
+    """
+    return compute_etag(user.id, user.updated_at)
+
+
+def page_etag(users: Iterable, metadata: dict) -> str:
+    """
+    ETag of a page of users: its rows' ids and versions plus the pagination metadata
+    :param users: rows or UserResponse with id and updated_at
+    :param metadata: dict
+    :return: str
+    """
+    return compute_etag(tuple((user.id, user.updated_at) for user in users), sorted(metadata.items()))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of If-None-Match against the current ETag (RFC 9110 13.1.2)
+    :param if_none_match: str header value | None
+    :param etag: str
+    :return: bool
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build a 304 response, without body
+    :param etag: str
+    :return: Response
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_response(body: str, etag: str) -> Response:
+    """
+    Build a 200 response from an already serialized JSON body
+    :param body: str
+    :param etag: str
+    :return: Response
+    """
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def cached_response(request: Request, cache_key: Optional[str]) -> Optional[Response]:
+    """
+    Answer from the response cache, without a query: 304 if the client has the cached version
+    :param request: Request
+    :param cache_key: str | None from response_cache.key()
+    :return: Response | None on a miss
+    """
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        return None
+    etag, body = cached
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return json_response(body, etag)
+
+
+def conditional_response(request: Request, etag: str, render: Callable[[], str],
+                         cache_key: Optional[str] = None) -> Response:
+    """
+    Answer 304 if the client has this version, otherwise serialize the body, cache it and send it
+    :param request: Request
+    :param etag: str of the current version
+    :param render: callable returning the JSON body, only called when it has to be sent
+    :param cache_key: str | None from response_cache.key()
+    :return: Response
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    body = render()
+    response_cache.set(cache_key, etag, body)
+    return json_response(body, etag)
@@ -0,0 +1,86 @@
+"""
+Export utility: encode row streams as NDJSON or CSV chunks for StreamingResponse
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, Iterator, Sequence, Union
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class _RowEncoder:
+    """
+    Encode rows (tuples in `columns` order) into byte chunks of `chunk_rows` rows
+    """
+    def __init__(self, columns: Sequence[str], fmt: str):
+        self.columns = list(columns)
+        self.fmt = fmt
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def header(self) -> bytes:
+        if self.fmt != "csv":
+            return b""
+        self._writer.writerow(self.columns)
+        return self.drain()
+
+    def add(self, row) -> None:
+        if self.fmt == "csv":
+            self._writer.writerow(row)
+        else:
+            self._buffer.write(json.dumps(dict(zip(self.columns, row)), default=str))
+            self._buffer.write("\n")
+
+    def drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def _encode(rows: Iterator, encoder: _RowEncoder, chunk_rows: int) -> Iterator[bytes]:
+    header = encoder.header()
+    if header:
+        yield header
+    pending = 0
+    for row in rows:
+        encoder.add(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield encoder.drain()
+            pending = 0
+    if pending:
+        yield encoder.drain()
+
+
+async def _aencode(rows: AsyncIterator, encoder: _RowEncoder, chunk_rows: int) -> AsyncIterator[bytes]:
+    header = encoder.header()
+    if header:
+        yield header
+    pending = 0
+    async for row in rows:
+        encoder.add(row)
+        pending += 1
+        if pending >= chunk_rows:
+            # StreamingResponse espera cada send, así el cursor avanza al ritmo del cliente
+            yield encoder.drain()
+            pending = 0
+    if pending:
+        yield encoder.drain()
+
+
+def encode_rows(rows: Union[Iterator, AsyncIterator], columns: Sequence[str], fmt: str,
+                chunk_rows: int = 1000) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+    """
+    Encode a sync or async row stream as NDJSON or CSV byte chunks
+    :param rows: Iterator | AsyncIterator of tuples in `columns` order
+    :param columns: column names
+    :param fmt: ndjson | csv
+    :param chunk_rows: rows per chunk
+    :return: Iterator | AsyncIterator of bytes, matching the input
+    """
+    encoder = _RowEncoder(columns, fmt)
+    if hasattr(rows, "__aiter__"):
+        return _aencode(rows, encoder, chunk_rows)
+    return _encode(rows, encoder, chunk_rows)
@@ -1,9 +1,341 @@
 """
 This file contains the hashing utility functions.
 """
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
 from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedError
+from app.core.metrics import metrics, timed
+
+logger = logging.getLogger(__name__)
+
+# Esquemas soportados: (costo mínimo de la calibración, costo máximo, el tiempo se duplica por unidad de costo)
+HASH_SCHEMES = {
+    "bcrypt": (10, 31, True),
+    "scrypt": (14, 24, True),
+    "argon2": (2, 64, False),
+}
+
+# Cada cuánto reintenta un job de lote (HashingPool.map) que espera un worker libre
+BATCH_WAIT_SECONDS = 0.005
+
+password_hash_rounds = metrics.gauge(
+    "password_hash_rounds", "Cost of the new password hashes", ("scheme",)
+)
+password_rehash = metrics.counter(
+    "password_rehash_total", "Stored password hashes upgraded on login to the current scheme and cost"
+)
+
+
+def available_schemes() -> list[str]:
+    """
+    Supported schemes whose backend is installed (argon2 needs argon2-cffi)
+    :return: list of scheme names
+    """
+    return [name for name in HASH_SCHEMES if get_crypt_handler(name).has_backend()]
+
+
+def scheme_rounds(scheme: str) -> int:
+    """
+    Configured cost of a scheme (BCRYPT_ROUNDS, SCRYPT_ROUNDS or ARGON2_ROUNDS)
+    :param scheme: str
+    :return: int
+    """
+    return getattr(settings, f"{scheme.upper()}_ROUNDS")
+
+
+def context_config(scheme: str, rounds: int) -> dict:
+    """
+    CryptContext configuration of a policy: new hashes use `scheme` at `rounds`, hashes of
+    the other available schemes or of a lower cost still verify but need an update
+    :param scheme: str
+    :param rounds: int
+    :return: dict
+    """
+    schemes = available_schemes()
+    if scheme not in schemes:
+        raise ValueError(f"Password hash scheme {scheme} is not available, expected one of {schemes}")
+    config = {
+        "schemes": [scheme] + [name for name in schemes if name != scheme],
+        "deprecated": "auto",
+        f"{scheme}__rounds": rounds,
+        # Un hash con menos costo que el configurado se re-hashea; uno con más no se degrada
+        f"{scheme}__min_rounds": rounds,
+    }
+    if scheme == "argon2":
+        config["argon2__memory_cost"] = settings.ARGON2_MEMORY_COST
+    return config
+
+
+pwd_context = CryptContext(**context_config(settings.PASSWORD_SCHEME, scheme_rounds(settings.PASSWORD_SCHEME)))
+password_hash_rounds.labels(settings.PASSWORD_SCHEME).set(scheme_rounds(settings.PASSWORD_SCHEME))
+
+
+def current_policy() -> tuple[str, int]:
+    """
+    Scheme and cost of new hashes, as loaded in pwd_context
+    :return: (scheme, rounds)
+    """
+    scheme = pwd_context.default_scheme()
+    return scheme, pwd_context.to_dict()[f"{scheme}__rounds"]
+
+
+def configure_policy(scheme: str, rounds: int) -> None:
+    """
+    Switch the scheme and cost of new hashes. The context is reloaded in place; a process pool
+    gets the policy through its initializer, so it must be created afterwards to see it (it is,
+    the pool starts on first use)
+    :param scheme: str
+    :param rounds: int
+    """
+    pwd_context.load(context_config(scheme, rounds))
+    password_hash_rounds.labels(scheme).set(rounds)
+
+
+def measure_hash(scheme: str, rounds: int, password: str = "calibration-password") -> float:
+    """
+    Seconds taken by one hash of `scheme` at `rounds` on this host
+    :param scheme: str
+    :param rounds: int
+    :param password: str
+    :return: float
+    """
+    config = {"rounds": rounds}
+    if scheme == "argon2":
+        config["memory_cost"] = settings.ARGON2_MEMORY_COST
+    handler = get_crypt_handler(scheme).using(**config)
+    start = time.perf_counter()
+    handler.hash(password)
+    return time.perf_counter() - start
+
+
+def calibrate(scheme: str, target_seconds: float, measure: Callable[[str, int], float] = measure_hash) -> int:
+    """
+    Highest cost of `scheme` whose hash takes at most `target_seconds` on this host, never below the
+    scheme floor. A single hash is measured at the floor and extrapolated: bcrypt and scrypt double
+    their time per unit of cost, argon2 grows linearly with its passes
+    :param scheme: str
+    :param target_seconds: float
+    :param measure: callable (scheme, rounds) -> seconds
+    :return: int rounds
+    """
+    floor, ceiling, exponential = HASH_SCHEMES[scheme]
+    elapsed = max(measure(scheme, floor), 1e-6)
+    if target_seconds <= elapsed:
+        return floor
+    if exponential:
+        rounds = floor + int(math.log2(target_seconds / elapsed))
+    else:
+        rounds = int(floor * target_seconds / elapsed)
+    return min(ceiling, rounds)
+
+
+def apply_calibration() -> int:
+    """
+    Calibrate the configured scheme against PASSWORD_HASH_TARGET_MS and use the result for new hashes.
+    The configured cost is a floor: a slow host never lowers it
+    :return: int rounds
+    """
+    scheme = settings.PASSWORD_SCHEME
+    configured = scheme_rounds(scheme)
+    calibrated = calibrate(scheme, settings.PASSWORD_HASH_TARGET_MS / 1000)
+    if calibrated < configured:
+        logger.warning("Password hash calibration gave %s rounds=%s under the target of %sms, "
+                       "below the configured %s; keeping the configured cost",
+                       scheme, calibrated, settings.PASSWORD_HASH_TARGET_MS, configured)
+    rounds = max(configured, calibrated)
+    configure_policy(scheme, rounds)
+    logger.info("Password hash cost calibrated: %s rounds=%s (target %sms)",
+                scheme, rounds, settings.PASSWORD_HASH_TARGET_MS)
+    return rounds
+
+# Con HASH_POOL_KIND=process estas observaciones quedan en los procesos del pool
+password_hash_seconds = metrics.histogram(
+    "password_hash_duration_seconds", "Time spent computing password hashes", ("operation",)
+)
+
+
+class HashingPool:
+    """
+    Bounded worker pool for password hashing.
+    At most `max_workers` hashes run at once and at most `queue_size` more wait for a
+    worker; anything beyond that is rejected with ServiceOverloadedError instead of queueing.
+    Batch work (map, map_sync) is never rejected: each job waits for a free worker, so it never
+    takes the queue slots that interactive requests (run, run_sync) rely on.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 1, queue_size: int = 0):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Invalid hashing pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self.queue_depth = metrics.gauge(
+            "password_hash_queue_depth", "Password hashing jobs waiting for a worker"
+        )
+        self.in_flight = metrics.gauge(
+            "password_hash_in_flight", "Password hashing jobs submitted and not finished"
+        )
+        self.rejected = metrics.counter(
+            "password_hash_rejected_total", "Password hashing jobs rejected because the pool was full"
+        )
+
+    @property
+    def executor(self) -> Executor:
+        """
+        Executor, created on first use so it is never inherited across fork
+        :return: Executor
+        """
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # Con spawn los procesos importan de nuevo este módulo: la política calibrada se pasa explícita
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, initializer=configure_policy, initargs=current_policy()
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="hasher"
+                    )
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_workers + self.queue_size:
+                self.rejected.inc()
+                raise ServiceOverloadedError("password hashing")
+            self._pending += 1
+            self._publish()
+
+    def _worker_free(self) -> bool:
+        return self._pending < max(1, self.max_workers)
+
+    def _take_worker(self) -> None:
+        self._pending += 1
+        self._publish()
+
+    def _acquire_waiting(self) -> None:
+        with self._released:
+            self._released.wait_for(self._worker_free)
+            self._take_worker()
+
+    async def _acquire_waiting_async(self) -> None:
+        # Sondeo en lugar de esperar en un thread: cancelar la espera no deja un lugar tomado
+        while True:
+            with self._lock:
+                if self._worker_free():
+                    self._take_worker()
+                    return
+            await asyncio.sleep(BATCH_WAIT_SECONDS)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._publish()
+            self._released.notify()
+
+    def _publish(self) -> None:
+        self.in_flight.set(self._pending)
+        self.queue_depth.set(max(0, self._pending - self.max_workers))
+
+    async def run(self, func: Callable, *args):
+        """
+        Run a hashing function on the pool without blocking the event loop
+        :param func: picklable callable
+        :return: func result
+        """
+        self._acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._release()
+
+    def run_sync(self, func: Callable, *args):
+        """
+        Run a hashing function on the pool and wait for it, for sync callers
+        :param func: picklable callable
+        :return: func result
+        """
+        self._acquire()
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self._release()
+
+    async def map(self, func: Callable, items: list[tuple]) -> list:
+        """
+        Run func(*args) for every args tuple, each job waiting for a free worker instead of being rejected.
+        Exceptions raised by func come back as exception instances instead of raising.
+        :param func: picklable callable
+        :param items: list of args tuples
+        :return: list of results or exceptions, in order
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for args in items:
+            await self._acquire_waiting_async()
+            try:
+                future = loop.run_in_executor(self.executor, func, *args)
+            except BaseException:
+                self._release()
+                raise
+            future.add_done_callback(lambda _: self._release())
+            futures.append(future)
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    def map_sync(self, func: Callable, items: list[tuple]) -> list:
+        """
+        Sync version of map, for sync callers
+        :param func: picklable callable
+        :param items: list of args tuples
+        :return: list of results or exceptions, in order
+        """
+        futures = []
+        for args in items:
+            self._acquire_waiting()
+            try:
+                future = self.executor.submit(func, *args)
+            except BaseException:
+                self._release()
+                raise
+            future.add_done_callback(lambda _: self._release())
+            futures.append(future)
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def shutdown(self) -> None:
+        """
+        Shutdown the executor, waiting for running jobs
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+hashing_pool = HashingPool(
+    kind=settings.HASH_POOL_KIND,
+    max_workers=settings.HASH_POOL_WORKERS,
+    queue_size=settings.HASH_POOL_QUEUE_SIZE,
+)
 
 
 class Hasher:
@@ -12,6 +344,7 @@ class Hasher:
     """
 
     @staticmethod
+    @timed(password_hash_seconds.labels("hash"))
     def get_password_hash(password: str) -> str:
         """
         Function to get password hash
@@ -21,6 +354,7 @@ class Hasher:
         return pwd_context.hash(password)
 
     @staticmethod
+    @timed(password_hash_seconds.labels("verify"))
     def verify_password(plain_password, hashed_password) -> bool:
         """
         Function to verify password
@@ -29,3 +363,64 @@ class Hasher:
         :return: bool
         """
         return pwd_context.verify(plain_password, hashed_password)
+
+    @staticmethod
+    @timed(password_hash_seconds.labels("verify"))
+    def verify_and_update(plain_password, hashed_password) -> tuple[bool, Optional[str]]:
+        """
+        Function to verify a password and, if its hash uses an old scheme or a lower cost,
+        hash it again with the current policy
+        :param plain_password: str
+        :param hashed_password: str hashed password
+        :return: tuple (bool valid, str new hash or None)
+        """
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+
+    @staticmethod
+    @timed(password_hash_seconds.labels("verify"))
+    def dummy_verify(plain_password) -> bool:
+        """
+        Function to spend the time of a verification when there is no hash to check against,
+        so an unknown user answers as slowly as a wrong password
+        :param plain_password: str
+        :return: bool always False
+        """
+        return pwd_context.dummy_verify()
+
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """
+        Function to get password hash on the hashing pool
+        :param password: str
+        :return: str hashed password
+        """
+        return await hashing_pool.run(Hasher.get_password_hash, password)
+
+    @staticmethod
+    async def verify_password_async(plain_password, hashed_password) -> bool:
+        """
+        Function to verify password on the hashing pool
+        :param plain_password: str
+        :param hashed_password: str hashed password
+        :return: bool
+        """
+        return await hashing_pool.run(Hasher.verify_password, plain_password, hashed_password)
+
+    @staticmethod
+    async def verify_and_update_async(plain_password, hashed_password) -> tuple[bool, Optional[str]]:
+        """
+        Function to verify and upgrade a password hash on the hashing pool
+        :param plain_password: str
+        :param hashed_password: str hashed password
+        :return: tuple (bool valid, str new hash or None)
+        """
+        return await hashing_pool.run(Hasher.verify_and_update, plain_password, hashed_password)
+
+    @staticmethod
+    async def dummy_verify_async(plain_password) -> bool:
+        """
+        Function to run a dummy verification on the hashing pool
+        :param plain_password: str
+        :return: bool always False
+        """
+        return await hashing_pool.run(Hasher.dummy_verify, plain_password)
@@ -0,0 +1,161 @@
+"""
+Key ring of the JWT signing and verification keys.
+
+Keys are parsed once into jose key objects, so signing and verifying a token never re-parses a
+PEM or a secret. With JWT_KEYS_DIR every `<kid>.pem` file of the directory is a key: a private
+key can sign and verify, a public key only verifies (a retired key kept until its tokens expire).
+Without it the ring holds the symmetric SECRET_KEY/ALGORITHM key, as before.
+"""
+import os
+from functools import lru_cache
+from typing import Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk, jwt
+from jose.backends.base import Key
+
+from app.core.config import settings
+
+KEY_SUFFIX = ".pem"
+# python-jose no implementa EdDSA: las claves asimétricas soportadas son RSA y ECDSA
+EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+class SigningKey:
+    """
+    A parsed key with its key id and algorithm: `key` signs (None for a public key),
+    `verifier` verifies (the public half of an asymmetric key)
+    """
+    __slots__ = ("kid", "algorithm", "key", "verifier")
+
+    def __init__(self, kid: Optional[str], algorithm: str, key: Optional[Key], verifier: Key):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.key = key
+        self.verifier = verifier
+
+    @property
+    def can_sign(self) -> bool:
+        return self.key is not None
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm.startswith("HS")
+
+    def public_jwk(self) -> dict:
+        """
+        Public JWK of an asymmetric key, for the JWKS document
+        :return: dict
+        """
+        return {**self.verifier.to_dict(), "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+def key_algorithm(pem: bytes) -> tuple[str, bool]:
+    """
+    JWS algorithm of a PEM key and whether it is private
+    :param pem: bytes
+    :return: (algorithm, is private)
+    """
+    try:
+        parsed = serialization.load_pem_private_key(pem, password=None)
+        private = True
+    except ValueError:
+        parsed = serialization.load_pem_public_key(pem)
+        private = False
+    if isinstance(parsed, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256", private
+    if isinstance(parsed, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and parsed.curve.name in EC_ALGORITHMS:
+        return EC_ALGORITHMS[parsed.curve.name], private
+    raise ValueError(f"Unsupported JWT key type {type(parsed).__name__}, use RSA or ECDSA (P-256/384/521)")
+
+
+class KeyRing:
+    """
+    Signing key plus every key accepted for verification, by kid
+    """
+    def __init__(self, keys: list[SigningKey], active_kid: Optional[str] = None):
+        if not keys:
+            raise ValueError("The JWT key ring is empty")
+        self.keys = {key.kid: key for key in keys}
+        signers = [key for key in keys if key.can_sign]
+        if active_kid is None:
+            if len(signers) != 1:
+                raise ValueError("Set JWT_ACTIVE_KID to choose the signing key among several private keys")
+            self.active = signers[0]
+        else:
+            self.active = self.keys.get(active_kid)
+            if self.active is None or not self.active.can_sign:
+                raise ValueError(f"JWT_ACTIVE_KID {active_kid} is not a private key of the ring")
+
+    @classmethod
+    def symmetric(cls, secret: str, algorithm: str) -> "KeyRing":
+        """
+        Ring with a single shared secret, tokens carry no kid
+        :param secret: str
+        :param algorithm: str HS256 | HS384 | HS512
+        :return: KeyRing
+        """
+        key = jwk.construct(secret, algorithm)
+        return cls([SigningKey(None, algorithm, key, key)])
+
+    @classmethod
+    def from_directory(cls, path: str, active_kid: Optional[str] = None) -> "KeyRing":
+        """
+        Load every <kid>.pem of a directory
+        :param path: str
+        :param active_kid: str kid of the signing key, optional with a single private key
+        :return: KeyRing
+        """
+        keys = []
+        for name in sorted(os.listdir(path)):
+            if not name.endswith(KEY_SUFFIX):
+                continue
+            with open(os.path.join(path, name), "rb") as f:
+                pem = f.read()
+            algorithm, private = key_algorithm(pem)
+            key = jwk.construct(pem, algorithm)
+            kid = name[:-len(KEY_SUFFIX)]
+            if private:
+                keys.append(SigningKey(kid, algorithm, key, key.public_key()))
+            else:
+                keys.append(SigningKey(kid, algorithm, None, key))
+        return cls(keys, active_kid)
+
+    def verification_key(self, kid: Optional[str]) -> Optional[SigningKey]:
+        """
+        Key that verifies a token with the given kid header; tokens without kid use the active key
+        :param kid: str | None
+        :return: SigningKey | None if the kid is unknown
+        """
+        if kid is None:
+            return self.active
+        return self.keys.get(kid)
+
+    def key_for_token(self, token: str) -> Optional[SigningKey]:
+        """
+        Key that verifies a token, by its kid header. A ring with a single key skips the header parsing
+        :param token: str
+        :return: SigningKey | None if the kid is unknown
+        """
+        if len(self.keys) == 1:
+            return self.active
+        return self.verification_key(jwt.get_unverified_header(token).get("kid"))
+
+    def jwks(self) -> dict:
+        """
+        JSON Web Key Set with the public keys. Symmetric keys are never published
+        :return: dict
+        """
+        return {"keys": [key.public_jwk() for key in self.keys.values() if not key.is_symmetric]}
+
+
+@lru_cache
+def get_key_ring() -> KeyRing:
+    """
+    Key ring built from the settings on first use
+    :return: KeyRing
+    """
+    if settings.JWT_KEYS_DIR:
+        return KeyRing.from_directory(settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID)
+    return KeyRing.symmetric(settings.SECRET_KEY, settings.ALGORITHM)
@@ -1,18 +1,30 @@
 """
 Oauth module
 """
+from typing import Optional
+
 from app.schemas.token import TokenData
+from app.utils.token import VerifiedTokenCache
 
 
 class OAuth:
-    def __init__(self, token):
+    def __init__(self, token, token_cache: Optional[VerifiedTokenCache] = None):
         self.token = token
+        self.token_cache = token_cache
 
     def get_current_user(self, token: str) -> TokenData:
         """
-        Get current user
+        Get current user, skipping the signature check for tokens already verified
         :param token: str
         :return: dict
         """
         credentials_exception = Exception("Could not validate credentials")
-        return self.token.verify_token(token, credentials_exception)
+        if self.token_cache is None:
+            return self.token.verify_token(token, credentials_exception)
+
+        token_data = self.token_cache.get(token)
+        if token_data is None:
+            # verify_claims observa jwt_verify_duration_seconds: solo se mide el camino sin cache
+            payload, token_data = self.token.verify_claims(token, credentials_exception)
+            self.token_cache.set(token, token_data, payload.get("exp"))
+        return token_data
@@ -0,0 +1,35 @@
+"""
+Pagination utility: opaque cursors for keyset pagination
+"""
+import base64
+import json
+from typing import Optional
+
+
+def encode_cursor(last_id: Optional[int]) -> Optional[str]:
+    """
+    Encode the last seen id as an opaque cursor
+    :param last_id: int | None
+    :return: str | None
+    """
+    if last_id is None:
+        return None
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor into the last seen id
+    :param cursor: str
+    :return: int
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(raw)["id"]
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError("Invalid pagination cursor")
+    return last_id
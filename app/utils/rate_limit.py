@@ -0,0 +1,160 @@
+"""
+Rate limiting: sliding window counters in process memory or in a shared store
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.exceptions import RateLimitExceededError
+from app.core.metrics import metrics
+from app.utils.cache import redis_client
+
+rate_limit_throttled = metrics.counter(
+    "rate_limit_throttled_total", "Requests rejected by a rate limiter", ("limiter", "scope")
+)
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage of the per-window hit counters
+    """
+
+    @abstractmethod
+    def increment(self, key: str, window: int, ttl: float) -> tuple[int, int]:
+        """
+        Method to count a hit in a window
+        :param key: str
+        :param window: int index of the current window
+        :param ttl: float seconds the counter must be kept
+        :return: (hits in the current window, hits in the previous window)
+        """
+        pass
+
+    @abstractmethod
+    def reset(self, key: str, window: int) -> None:
+        """
+        Method to forget the hits of the current and previous windows
+        :param key: str
+        :param window: int index of the current window
+        """
+        pass
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Counters of this process, one entry per key bounded with LRU eviction
+    """
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [ventana, hits actuales, hits de la ventana anterior]
+        self._counters: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def increment(self, key: str, window: int, ttl: float) -> tuple[int, int]:
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < window - 1:
+                counter = [window, 0, 0]
+            elif counter[0] == window - 1:
+                counter = [window, 0, counter[1]]
+            counter[1] += 1
+            self._counters[key] = counter
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return counter[1], counter[2]
+
+    def reset(self, key: str, window: int) -> None:
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Method to drop every counter
+        """
+        with self._lock:
+            self._counters.clear()
+
+
+class SharedStoreRateLimitBackend(RateLimitBackend):
+    """
+    Counters in a shared key-value store, so every worker enforces the same limit.
+    The client needs redis-style `pipeline`, `incr`, `pexpire`, `get` and `delete`
+    """
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str, window: int) -> str:
+        return f"{self.prefix}{key}:{window}"
+
+    def increment(self, key: str, window: int, ttl: float) -> tuple[int, int]:
+        current_key = self._key(key, window)
+        # Un solo round-trip: INCR + PEXPIRE de la ventana actual y GET de la anterior
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incr(current_key)
+        pipe.pexpire(current_key, max(1, int(ttl * 1000)))
+        pipe.get(self._key(key, window - 1))
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def reset(self, key: str, window: int) -> None:
+        self.client.delete(self._key(key, window), self._key(key, window - 1))
+
+
+class RateLimiter:
+    """
+    Sliding window rate limiter: the hits of the previous window are weighted by how much of it
+    still overlaps the last `window` seconds, which smooths the bursts allowed at window edges.
+    Every checked request counts as a hit, rejected ones included.
+    """
+    def __init__(self, name: str, backend: RateLimitBackend, window: float,
+                 clock: Callable[[], float] = time.time):
+        self.name = name
+        self.backend = backend
+        self.window = window
+        self._clock = clock
+
+    def check(self, scope: str, value: str, limit: int) -> None:
+        """
+        Count a hit of `value` and reject it when the last window exceeds the limit
+        :param scope: str kind of key, e.g. ip or username
+        :param value: str
+        :param limit: int hits allowed per window
+        """
+        now = self._clock()
+        window, elapsed = divmod(now, self.window)
+        current, previous = self.backend.increment(f"{self.name}:{scope}:{value}", int(window), 2 * self.window)
+        if previous * (1 - elapsed / self.window) + current > limit:
+            rate_limit_throttled.labels(self.name, scope).inc()
+            raise RateLimitExceededError(self.name, math.ceil(self.window - elapsed))
+
+    def reset(self, scope: str, value: str) -> None:
+        """
+        Forget the hits of `value`
+        :param scope: str
+        :param value: str
+        """
+        self.backend.reset(f"{self.name}:{scope}:{value}", int(self._clock() // self.window))
+
+
+def build_login_limiter() -> Optional[RateLimiter]:
+    """
+    Build the login rate limiter from settings
+    :return: RateLimiter | None if disabled
+    """
+    backend_name = settings.LOGIN_RATE_LIMIT_BACKEND
+    if backend_name == "none":
+        return None
+    if backend_name == "memory":
+        backend = InMemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    else:
+        backend = SharedStoreRateLimitBackend(redis_client(settings.CACHE_REDIS_URL))
+    return RateLimiter("login", backend, settings.LOGIN_RATE_LIMIT_WINDOW)
+
+
+login_limiter = build_login_limiter()
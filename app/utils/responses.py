@@ -0,0 +1,35 @@
+"""
+Response classes for bodies that are already validated pydantic models or produced while the request is read
+"""
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.requests import ClientDisconnect
+
+
+class ModelResponse(Response):
+    """
+    JSON response rendered by pydantic-core straight from a validated model.
+    Returning it skips FastAPI's response_model pass, which validates the model again and
+    encodes it through jsonable_encoder and the stdlib json module
+    """
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.model_dump_json().encode()
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body iterator reads the request body as it goes (request.stream()).
+    StreamingResponse listens on receive() for a disconnect while it streams, under ASGI spec versions
+    before 2.4, and would take the request body messages away from the iterator. Here only the iterator
+    receives: a disconnect reaches it as ClientDisconnect on its next read and ends the response
+    """
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except (ClientDisconnect, OSError):
+            return
+        if self.background is not None:
+            await self.background()
@@ -1,13 +1,24 @@
 """
 Token utility
 """
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
+from typing import Optional
+
 from jose import jwt, JWTError
 
 from app.core.config import settings
+from app.core.metrics import FAST_BUCKETS, metrics, timed
 from app.schemas.token import TokenData
+from app.utils.keyring import get_key_ring
+from app.utils.cache import Cache, InMemoryCache
+
+REFRESH_TOKEN_TYPE = "refresh"
 
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+token_verify_seconds = metrics.histogram(
+    "jwt_verify_duration_seconds", "Time to decode and validate an access token", buckets=FAST_BUCKETS
+)
 
 class Token:
     """
@@ -21,29 +32,138 @@ class Token:
         :return: str: token
         """
         to_encode = data.copy()
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        return Token.encode(to_encode)
 
-        return encoded_jwt
+    @staticmethod
+    def encode(claims: dict) -> str:
+        """
+        Sign claims with the active key of the key ring, naming it in the kid header
+        :param claims: {dict} claims to encode
+        :return: str: token
+        """
+        signing = get_key_ring().active
+        headers = {"kid": signing.kid} if signing.kid else None
+        return jwt.encode(claims, signing.key, algorithm=signing.algorithm, headers=headers)
 
     @staticmethod
-    def verify_token(token: str, credentials_exception) -> TokenData:
+    def generate_refresh_token(data: dict, expire: datetime) -> str:
         """
-        Verify token
-        :param token: {str} token to verify
+        Generate a refresh token. Its `typ` claim keeps it from being accepted as an access token
+        :param data: {dict} data to encode, with the jti and fam (family) claims
+        :param expire: {datetime} expiration
+        :return: str: token
+        """
+        return Token.encode({**data, "typ": REFRESH_TOKEN_TYPE, "exp": expire})
+
+    @staticmethod
+    def decode_refresh_token(token: str, credentials_exception) -> dict:
+        """
+        Decode a refresh token verifying its signature, expiration and type
+        :param token: {str} token to decode
         :param credentials_exception: {Exception} exception to raise
-        :return: dict: token data
+        :return: dict: token claims
+        """
+        payload = Token.decode_token(token, credentials_exception)
+        if payload.get("typ") != REFRESH_TOKEN_TYPE or not payload.get("jti") or not payload.get("fam"):
+            raise credentials_exception
+        return payload
+
+    @staticmethod
+    def decode_token(token: str, credentials_exception) -> dict:
+        """
+        Decode a token verifying its signature and expiration
+        :param token: {str} token to decode
+        :param credentials_exception: {Exception} exception to raise
+        :return: dict: token claims
         """
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username = payload.get("sub")
-            user_id = payload.get("id")
-            is_superuser = payload.get("is_superuser")
-            active = payload.get("active")
-            if username is None:
+            key = get_key_ring().key_for_token(token)
+            if key is None:
                 raise credentials_exception
-            token_data = TokenData(username=username, id=user_id, is_superuser=is_superuser, active=active)
+            # Solo el algoritmo de la clave: evita la confusión de algoritmos
+            return jwt.decode(token, key.verifier, algorithms=[key.algorithm])
         except JWTError:
             raise credentials_exception
-        return token_data
+
+    @staticmethod
+    def token_data(payload: dict, credentials_exception) -> TokenData:
+        """
+        Build the token data from decoded claims
+        :param payload: {dict} token claims
+        :param credentials_exception: {Exception} exception to raise
+        :return: TokenData
+        """
+        username = payload.get("sub")
+        user_id = payload.get("id")
+        is_superuser = payload.get("is_superuser")
+        active = payload.get("active")
+        if username is None or payload.get("typ") == REFRESH_TOKEN_TYPE:
+            raise credentials_exception
+        return TokenData(username=username, id=user_id, is_superuser=is_superuser, active=active)
+
+    @staticmethod
+    @timed(token_verify_seconds)
+    def verify_claims(token: str, credentials_exception) -> tuple[dict, TokenData]:
+        """
+        Verify token, keeping its claims (the token cache needs `exp`)
+        :param token: {str} token to verify
+        :param credentials_exception: {Exception} exception to raise
+        :return: tuple: token claims and token data
+        """
+        payload = Token.decode_token(token, credentials_exception)
+        return payload, Token.token_data(payload, credentials_exception)
+
+    @staticmethod
+    def verify_token(token: str, credentials_exception) -> TokenData:
+        """
+        Verify token
+        :param token: {str} token to verify
+        :param credentials_exception: {Exception} exception to raise
+        :return: dict: token data
+        """
+        return Token.verify_claims(token, credentials_exception)[1]
+
+
+class VerifiedTokenCache:
+    """
+    Bounded cache of already verified tokens, keyed by a SHA-256 of the token.
+    Each entry expires at the token `exp`, so a cached token is never accepted past its expiration.
+    Hits and misses are counted in verified_token_cache_hits_total / verified_token_cache_misses_total
+    """
+    def __init__(self, max_size: int):
+        self.cache = Cache("verified_token", InMemoryCache(max_size=max_size), ttl=0)
+
+    @staticmethod
+    def key(token: str) -> str:
+        """
+        Cache key of a token
+        :param token: str
+        :return: str
+        """
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[TokenData]:
+        """
+        Get the cached token data
+        :param token: str
+        :return: TokenData | None
+        """
+        return self.cache.get(self.key(token))
+
+    def set(self, token: str, token_data: TokenData, expires_at: Optional[float]) -> None:
+        """
+        Cache the token data until the token expires
+        :param token: str
+        :param token_data: TokenData
+        :param expires_at: float unix timestamp (token exp)
+        """
+        if expires_at is None:
+            return
+        ttl = expires_at - time.time()
+        if ttl > 0:
+            self.cache.set(self.key(token), token_data, ttl)
+
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_SIZE) if settings.TOKEN_CACHE_MAX_SIZE > 0 else None
@@ -0,0 +1,254 @@
+"""
+Negative lookup cache for login: a Bloom filter of the existing usernames.
+A username the filter has never seen is rejected without a database query; the filter has no false
+negatives, so an existing user is never rejected, and a false positive only costs the usual lookup
+"""
+import hashlib
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import db
+from app.models.user import User
+from app.utils.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+username_filter_rejected = metrics.counter(
+    "username_filter_rejected_total", "Logins rejected by the username filter without a database query"
+)
+
+
+class BloomFilter:
+    """
+    Size and bit positions of a Bloom filter for `capacity` items at `error_rate` false positives.
+    Bits are numbered as redis SETBIT does: bit 0 is the most significant bit of the first byte
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = max(8, (bits + 7) // 8 * 8)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+
+    def positions(self, item: str) -> list[int]:
+        """
+        Bit positions of an item, by double hashing one blake2b digest
+        :param item: str
+        :return: list[int]
+        """
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def bits_of(self, items: Iterable[str]) -> tuple[bytearray, int]:
+        """
+        Bit array with every item added
+        :param items: iterable of str
+        :return: (bytearray, number of items)
+        """
+        bits = bytearray(self.size // 8)
+        count = 0
+        for item in items:
+            for position in self.positions(item):
+                bits[position >> 3] |= 0x80 >> (position & 7)
+            count += 1
+        return bits, count
+
+
+class BitStore(ABC):
+    """
+    Storage of the filter bits
+    """
+
+    @abstractmethod
+    def set_bits(self, positions: list[int]) -> None:
+        """
+        Method to set bits
+        :param positions: list[int]
+        """
+        pass
+
+    @abstractmethod
+    def all_set(self, positions: list[int]) -> bool:
+        """
+        Method to check that every bit is set
+        :param positions: list[int]
+        :return: bool
+        """
+        pass
+
+    @abstractmethod
+    def merge(self, bits: bytes) -> None:
+        """
+        Method to OR a full bit array into the stored one, so bits set meanwhile are kept
+        :param bits: bytes
+        """
+        pass
+
+
+class InMemoryBitStore(BitStore):
+    """
+    Bits in the process memory: only for a single worker (the settings refuse it with WEB_CONCURRENCY > 1),
+    users created by other workers would be missing until the next rebuild
+    """
+    def __init__(self, size: int):
+        self._bits = bytearray(size // 8)
+        self._lock = threading.Lock()
+
+    def set_bits(self, positions: list[int]) -> None:
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 0x80 >> (position & 7)
+
+    def all_set(self, positions: list[int]) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (0x80 >> (position & 7)) for position in positions)
+
+    def merge(self, bits: bytes) -> None:
+        with self._lock:
+            merged = int.from_bytes(self._bits, "big") | int.from_bytes(bits, "big")
+            self._bits = bytearray(merged.to_bytes(len(self._bits), "big"))
+
+    def clear(self) -> None:
+        """
+        Method to unset every bit
+        """
+        with self._lock:
+            self._bits = bytearray(len(self._bits))
+
+
+class SharedStoreBitStore(BitStore):
+    """
+    Bits in a redis bitmap shared by every worker.
+    The client only needs redis-style `setbit`, `getbit`, `set`, `bitop`, `delete` and `pipeline`
+    """
+    def __init__(self, client, key: str):
+        self.client = client
+        self.key = key
+
+    def set_bits(self, positions: list[int]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for position in positions:
+            pipe.setbit(self.key, position, 1)
+        pipe.execute()
+
+    def all_set(self, positions: list[int]) -> bool:
+        pipe = self.client.pipeline(transaction=False)
+        for position in positions:
+            pipe.getbit(self.key, position)
+        return all(pipe.execute())
+
+    def merge(self, bits: bytes) -> None:
+        staging = f"{self.key}:rebuild"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(staging, bytes(bits))
+        pipe.bitop("OR", self.key, self.key, staging)
+        pipe.delete(staging)
+        pipe.execute()
+
+
+class UsernameFilter:
+    """
+    Bloom filter of usernames over a bit store. Until it has been built once it lets every username
+    through, and an error of the store lets the username through too: the filter must never lock out
+    an existing user. Usernames are added before they are written, deleted ones stay as false positives
+    """
+    def __init__(self, bloom: Optional[BloomFilter], store: Optional[BitStore]):
+        self.bloom = bloom
+        self.store = store
+        self.ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def might_exist(self, username: str) -> bool:
+        """
+        Method to check if a username may exist
+        :param username: str
+        :return: bool, False only if it surely does not exist
+        """
+        if not self.enabled or not self.ready:
+            return True
+        try:
+            found = self.store.all_set(self.bloom.positions(username))
+        except Exception as e:
+            logger.warning("Username filter lookup failed: %s", e)
+            return True
+        if not found:
+            username_filter_rejected.inc()
+        return found
+
+    def add(self, *usernames: str) -> None:
+        """
+        Method to add usernames, before the rows that use them are committed
+        :param usernames: str
+        """
+        if not self.enabled:
+            return
+        positions = [position for username in usernames for position in self.bloom.positions(username)]
+        try:
+            self.store.set_bits(positions)
+        except Exception as e:
+            # Sin el username en el filtro ese usuario no podría loguearse: se deja pasar a todos
+            logger.error("Username filter update failed, disabling it until the next rebuild: %s", e)
+            self.ready = False
+
+    def rebuild(self, usernames: Iterable[str]) -> int:
+        """
+        Method to add every existing username and start rejecting unknown ones
+        :param usernames: iterable of str
+        :return: int number of usernames
+        """
+        if not self.enabled:
+            return 0
+        bits, count = self.bloom.bits_of(usernames)
+        self.store.merge(bits)
+        self.ready = True
+        if count > settings.USERNAME_FILTER_CAPACITY:
+            logger.warning("Username filter holds %s usernames, above its capacity of %s: raise "
+                           "USERNAME_FILTER_CAPACITY to keep the false positive rate", count,
+                           settings.USERNAME_FILTER_CAPACITY)
+        return count
+
+    def rebuild_from_db(self, session_local=None) -> int:
+        """
+        Method to rebuild the filter from the username index, streaming the rows
+        :param session_local: sessionmaker, the application's one by default
+        :return: int number of usernames
+        """
+        if not self.enabled:
+            return 0
+        with (session_local or db.session_local)() as session:
+            rows = session.execute(select(User.username).execution_options(yield_per=10000)).scalars()
+            return self.rebuild(rows)
+
+
+def build_username_filter() -> UsernameFilter:
+    """
+    Build the username filter from settings
+    :return: UsernameFilter
+    """
+    backend_name = settings.USERNAME_FILTER_BACKEND
+    if backend_name == "none":
+        return UsernameFilter(None, None)
+    bloom = BloomFilter(settings.USERNAME_FILTER_CAPACITY, settings.USERNAME_FILTER_ERROR_RATE)
+    if backend_name == "memory":
+        store = InMemoryBitStore(bloom.size)
+    elif backend_name == "redis":
+        # La clave incluye la geometría: workers con otra capacidad no comparten bits incompatibles
+        store = SharedStoreBitStore(
+            redis_client(settings.CACHE_REDIS_URL), key=f"username_filter:{bloom.size}:{bloom.hash_count}"
+        )
+    else:
+        raise ValueError(f"Invalid username filter backend: {backend_name}")
+    return UsernameFilter(bloom, store)
+
+
+username_filter = build_username_filter()
@@ -0,0 +1,137 @@
+"""
+CPU cost against bytes saved of response compression, per encoding and level.
+
+Seeds a users table (SQLite file by default, any SQLAlchemy url with --db-url) and builds the bodies the
+API sends: GET /users/ pages of each --sizes value (one complete body) and the NDJSON export
+(--export-rows rows streamed in chunks of EXPORT_BATCH_SIZE, each chunk flushed as the middleware does).
+For every available encoding (gzip always; br and zstd when brotli / zstandard are installed) and level
+it reports the compressed bytes, the ratio, the bytes saved, the CPU time per body and the throughput.
+
+    python -m benchmarks.bench_compression --sizes 10,100,1000 --levels gzip=1,6,9 --levels br=1,4,11
+"""
+import argparse
+import time
+
+from sqlalchemy import select
+
+from app.core.compression import ENCODINGS, codec
+from app.core.config import settings
+from app.models.user import User
+from app.repositories.user_respository import EXPORT_COLUMNS, RESPONSE_COLUMNS
+from app.schemas.user import UserPaginatedResponse
+from app.services.user_service import validate_rows
+from app.utils.export import encode_rows
+from benchmarks.common import emit, seeded_sessionmaker
+
+DEFAULT_LEVELS = {"gzip": (1, 3, 6, 9), "br": (0, 1, 4, 6, 9, 11), "zstd": (1, 3, 6, 12, 19)}
+
+
+def bodies(session_local, sizes: list[int], export_rows: int) -> dict[str, list[bytes]]:
+    """
+    The bodies to compress: one chunk per page, the export as its stream of chunks
+    :return: dict of name -> list of chunks
+    """
+    columns = [getattr(User, name) for name in RESPONSE_COLUMNS]
+    result = {}
+    with session_local() as db:
+        for size in sizes:
+            rows = db.execute(select(*columns).order_by(User.id).limit(size)).all()
+            metadata = {"total_count": size, "count_kind": "exact", "limit": size, "offset": 0,
+                        "current_page": 1, "total_pages": 1}
+            result[f"page_{size}"] = [
+                UserPaginatedResponse(metadata=metadata, data=validate_rows(rows)).model_dump_json().encode()
+            ]
+        export = db.execute(
+            select(*(getattr(User, name) for name in EXPORT_COLUMNS)).order_by(User.id).limit(export_rows)
+        ).all()
+        result[f"export_{export_rows}"] = list(
+            encode_rows(iter(export), EXPORT_COLUMNS, "ndjson", settings.EXPORT_BATCH_SIZE)
+        )
+    return result
+
+
+def measure(new_stream, chunks: list[bytes], min_seconds: float) -> dict:
+    """
+    Compress the chunks as one response, repeatedly for at least min_seconds of CPU
+    :return: dict
+    """
+    def compress() -> int:
+        stream = new_stream()
+        last = len(chunks) - 1
+        return sum(len(stream.compress(chunk, final=i == last)) for i, chunk in enumerate(chunks))
+
+    output_bytes = compress()
+    runs, start = 0, time.process_time()
+    while (elapsed := time.process_time() - start) < min_seconds:
+        compress()
+        runs += 1
+    input_bytes = sum(len(chunk) for chunk in chunks)
+    cpu_s = elapsed / runs
+    return {
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "ratio": round(input_bytes / output_bytes, 2),
+        "saved_pct": round((1 - output_bytes / input_bytes) * 100, 1),
+        "cpu_us": round(cpu_s * 1e6, 1),
+        "cpu_us_per_kb_saved": round(cpu_s * 1e6 / max(1, (input_bytes - output_bytes) / 1024), 2),
+        "throughput_mb_per_s": round(input_bytes / cpu_s / 1e6, 1),
+    }
+
+
+def run(db_url: str, rows: int, sizes: list[int], export_rows: int, levels: dict, min_seconds: float) -> dict:
+    """
+    Measure every body with every available encoding and level
+    :return: dict report
+    """
+    session_local = seeded_sessionmaker(db_url, max(rows, export_rows, *sizes))
+    payloads = bodies(session_local, sizes, export_rows)
+    result = {"skipped": {}}
+    for encoding in ENCODINGS:
+        for level in levels.get(encoding, ()):
+            try:
+                new_stream = codec(encoding, level)
+            except RuntimeError as e:
+                result["skipped"][encoding] = str(e)
+                break
+            for name, chunks in payloads.items():
+                result.setdefault(name, {}).setdefault(encoding, {})[str(level)] = measure(
+                    new_stream, chunks, min_seconds
+                )
+    return result
+
+
+def parse_levels(values: list[str]) -> dict:
+    """
+    Parse encoding=level,level options over the defaults
+    :param values: list of str like "gzip=1,6,9"
+    :return: dict
+    """
+    levels = dict(DEFAULT_LEVELS)
+    for value in values:
+        encoding, _, numbers = value.partition("=")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding {encoding}, expected one of {ENCODINGS}")
+        levels[encoding] = tuple(int(number) for number in numbers.split(",") if number)
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///bench_compression.db")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma separated page sizes")
+    parser.add_argument("--export-rows", type=int, default=10000, help="Rows of the streamed NDJSON export")
+    parser.add_argument("--levels", action="append", default=[], help="encoding=level,level (repeatable)")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="CPU seconds per measurement")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    levels = parse_levels(args.levels)
+    result = run(args.db_url, args.rows, sizes, args.export_rows, levels, args.min_seconds)
+    result["config"] = {"rows": args.rows, "sizes": sizes, "export_rows": args.export_rows,
+                        "levels": {name: list(values) for name, values in levels.items()}, "db_url": args.db_url}
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Bytes and CPU saved on repeat reads by ETags and the response cache.
+
+Seeds a users table (SQLite file by default, any SQLAlchemy url with --db-url) and calls, in process
+through httpx's ASGI transport, GET /users/{id}, GET /users/email/{email} and GET /users/?limit=--limit
+--requests times in four modes:
+
+  - full: plain GET, the database read and the serialization every time
+  - revalidate: If-None-Match with the current ETag, 304 after the database read, no serialization
+  - cached: plain GET with the in-memory response cache, no query and no serialization
+  - cached_revalidate: If-None-Match with the response cache, 304 without touching the database
+
+For each it reports the body bytes, the wall time and the process CPU time per request.
+
+    python -m benchmarks.bench_conditional --rows 10000 --limit 100 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.common import emit, seeded_sessionmaker
+
+MODES = ("full", "revalidate", "cached", "cached_revalidate")
+USER = {"email": "conditional@bench.com", "username": "conditional", "password": "conditionalpass"}
+
+
+def _app(db_url: str, rows: int):
+    """
+    The app with get_db bound to the seeded database
+    """
+    from app.db.database import get_db
+    from main import app
+
+    session_local = seeded_sessionmaker(db_url, rows)
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+async def _measure(client: httpx.AsyncClient, url: str, headers: dict, requests: int) -> dict:
+    response = await client.get(url, headers=headers)
+    body_bytes = len(response.content)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(requests):
+        await client.get(url, headers=headers)
+    return {
+        "status": response.status_code,
+        "body_bytes": body_bytes,
+        "wall_us": round((time.perf_counter() - wall) / requests * 1e6, 1),
+        "cpu_us": round((time.process_time() - cpu) / requests * 1e6, 1),
+    }
+
+
+async def run(db_url: str, rows: int, limit: int, requests: int) -> dict:
+    """
+    Measure every endpoint in every mode
+    :return: dict report
+    """
+    from app.utils.cache import Cache, InMemoryCache, response_cache
+
+    app = _app(db_url, rows)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        created = await client.post("/users/", json=USER)
+        if created.status_code == 409:
+            created = await client.get(f"/users/email/{USER['email']}")
+        login = await client.post("/auth/login", data={"username": USER['username'], "password": USER['password']})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        user_id = (await client.get("/users/?limit=1", headers=headers)).json()['data'][0]['id']
+        urls = {
+            "user": f"/users/{user_id}",
+            "email": f"/users/email/bench{rows // 2}@bench.com",
+            "page": f"/users/?limit={limit}&offset={rows // 2}",
+        }
+
+        result = {}
+        for name, url in urls.items():
+            result[name] = {}
+            for mode in MODES:
+                response_cache.cache = Cache("response", InMemoryCache(), 3600) if mode.startswith("cached") else None
+                etag = (await client.get(url, headers=headers)).headers["etag"]
+                mode_headers = {**headers, "If-None-Match": etag} if mode.endswith("revalidate") else headers
+                result[name][mode] = await _measure(client, url, mode_headers, requests)
+            full = result[name]["full"]
+            for mode in MODES[1:]:
+                saved = result[name][mode]
+                saved["cpu_saved_pct"] = round((1 - saved["cpu_us"] / full["cpu_us"]) * 100, 1)
+                saved["bytes_saved_pct"] = round((1 - saved["body_bytes"] / max(1, full["body_bytes"])) * 100, 1)
+        response_cache.cache = None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///bench_conditional.db")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100, help="Page size of GET /users/")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and mode")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    # Antes de importar la app: un solo login no debe toparse con el limitador
+    os.environ.setdefault("LOGIN_RATE_LIMIT_BACKEND", "none")
+    result = asyncio.run(run(args.db_url, args.rows, args.limit, args.requests))
+    result["config"] = {"rows": args.rows, "limit": args.limit, "requests": args.requests, "db_url": args.db_url}
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Password hashing throughput of every available scheme at several costs.
+
+For each scheme and cost it reports the median time of one hash and one verify (--samples runs)
+and the hashes per second a single core sustains, which bounds the login rate per worker:
+
+    bcrypt  rounds 10..13 (2^rounds iterations)
+    scrypt  rounds 14..17 (N = 2^rounds)
+    argon2  rounds 2..4 (passes, ARGON2_MEMORY_COST KiB), only with argon2-cffi installed
+
+With --target-ms it also reports the cost that the startup calibration (PASSWORD_HASH_TARGET_MS)
+would choose on this host for every scheme.
+
+    python -m benchmarks.bench_hashing --samples 5 --target-ms 250 --output hashing.json
+"""
+import argparse
+import statistics
+import time
+
+from passlib.registry import get_crypt_handler
+
+from app.core.config import settings
+from app.utils.hashing import available_schemes, calibrate
+from benchmarks.common import emit
+
+COSTS = {
+    "bcrypt": (10, 11, 12, 13),
+    "scrypt": (14, 15, 16, 17),
+    "argon2": (2, 3, 4),
+}
+PASSWORD = "benchpassword"
+
+
+def _median_s(func, samples: int) -> float:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench_scheme(scheme: str, costs: tuple, samples: int) -> dict:
+    """
+    Hash and verify time of a scheme at each cost
+    :return: dict by cost
+    """
+    result = {}
+    for rounds in costs:
+        config = {"rounds": rounds}
+        if scheme == "argon2":
+            config["memory_cost"] = settings.ARGON2_MEMORY_COST
+        handler = get_crypt_handler(scheme).using(**config)
+        hashed = handler.hash(PASSWORD)
+        hash_s = _median_s(lambda: handler.hash(PASSWORD), samples)
+        result[f"rounds_{rounds}"] = {
+            "hash_ms": round(hash_s * 1000, 2),
+            "verify_ms": round(_median_s(lambda: handler.verify(PASSWORD, hashed), samples) * 1000, 2),
+            "per_core_rps": round(1 / hash_s, 2),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schemes", default="", help="Comma separated schemes, all the available ones by default")
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--target-ms", type=float, default=None, help="Report the calibrated cost for this target")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    available = available_schemes()
+    schemes = [name.strip() for name in args.schemes.split(",") if name.strip()] or available
+    missing = set(schemes) - set(available)
+    if missing:
+        parser.error(f"Schemes {sorted(missing)} are not available, expected {available}")
+
+    result = {"config": {"samples": args.samples}}
+    for scheme in schemes:
+        result[scheme] = bench_scheme(scheme, COSTS[scheme], args.samples)
+    if args.target_ms:
+        result["calibration"] = {
+            scheme: {"target_ms": args.target_ms, "rounds": calibrate(scheme, args.target_ms / 1000)}
+            for scheme in schemes
+        }
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
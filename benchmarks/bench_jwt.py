@@ -0,0 +1,99 @@
+"""
+JWT signing and verification cost per algorithm.
+
+For HS256 (shared secret), RS256 (RSA 2048) and ES256 (ECDSA P-256) measures, in microseconds per
+token (best of --repeat): signing, verifying with the pre-parsed key of the KeyRing and verifying
+with the raw secret/PEM as `Token` did before (parsing it on every call), plus the verify throughput
+of one core. EdDSA is not listed: python-jose does not implement it.
+
+    python -m benchmarks.bench_jwt --tokens 2000
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwt
+
+from app.utils.keyring import KeyRing
+from benchmarks.common import emit
+
+CLAIMS = {"sub": "bench", "id": 1, "is_superuser": False, "active": True}
+SECRET = "bench-secret-key-with-enough-entropy"
+
+
+def _write_key(directory: Path, kid: str, key) -> str:
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    (directory / f"{kid}.pem").write_bytes(pem)
+    public = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                           serialization.PublicFormat.SubjectPublicKeyInfo)
+    return public.decode()
+
+
+def _best_us(func, tokens: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(tokens):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / tokens * 1e6
+
+
+def bench_algorithm(ring: KeyRing, raw_key: str, tokens: int, repeat: int) -> dict:
+    """
+    Sign and verify cost of the active key of a ring
+    :param ring: KeyRing
+    :param raw_key: str secret or public PEM, parsed on every call by the baseline
+    :return: dict
+    """
+    signing = ring.active
+    headers = {"kid": signing.kid} if signing.kid else None
+    claims = {**CLAIMS, "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+    token = jwt.encode(claims, signing.key, algorithm=signing.algorithm, headers=headers)
+    algorithms = [signing.algorithm]
+
+    def verify_parsed():
+        key = ring.key_for_token(token)
+        jwt.decode(token, key.verifier, algorithms=[key.algorithm])
+
+    verify_us = _best_us(verify_parsed, tokens, repeat)
+    return {
+        "sign_us": round(_best_us(
+            lambda: jwt.encode(claims, signing.key, algorithm=signing.algorithm, headers=headers), tokens, repeat
+        ), 3),
+        "verify_us": round(verify_us, 3),
+        "verify_unparsed_us": round(_best_us(lambda: jwt.decode(token, raw_key, algorithms=algorithms), tokens, repeat), 3),
+        "verify_rps": round(1e6 / verify_us, 1),
+        "token_bytes": len(token),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=2000, help="Tokens per sample")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = {"config": {"tokens": args.tokens, "repeat": args.repeat}}
+    result["HS256"] = bench_algorithm(KeyRing.symmetric(SECRET, "HS256"), SECRET, args.tokens, args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        for algorithm, key in (
+            ("RS256", rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+            ("ES256", ec.generate_private_key(ec.SECP256R1())),
+        ):
+            keys_dir = Path(directory) / algorithm
+            keys_dir.mkdir()
+            public_pem = _write_key(keys_dir, algorithm.lower(), key)
+            ring = KeyRing.from_directory(str(keys_dir))
+            result[algorithm] = bench_algorithm(ring, public_pem, args.tokens, args.repeat)
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
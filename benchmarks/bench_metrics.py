@@ -0,0 +1,163 @@
+"""
+Overhead of the metrics subsystem.
+
+Measures, in microseconds (best of --repeat interleaved runs):
+  - middleware: per-request cost of MetricsMiddleware around a bare ASGI app, and a minimal
+    FastAPI app called directly through ASGI (no HTTP client or server) with and without it
+  - primitives: Histogram.observe, labeled Counter.inc and a `timed` function call vs a plain call
+  - queries: per-statement cost of the instrument_queries engine hooks on in-memory SQLite
+
+The middleware overhead should stay below a few microseconds per request.
+
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.core.instrumentation import MetricsMiddleware, instrument_queries
+from app.core.metrics import MetricsRegistry, timed
+from benchmarks.common import emit
+
+
+def _app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def _bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _drive(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/items/1", "raw_path": b"/items/1", "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": None,
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Calentamiento: construye el stack de middlewares y las series de métricas
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+def _best_of(pairs: dict, repeat: int, run) -> dict:
+    """
+    Interleave the runs of every variant so machine noise hits them alike, keep the best of each
+    """
+    best = {name: float("inf") for name in pairs}
+    for _ in range(repeat):
+        for name, variant in pairs.items():
+            best[name] = min(best[name], run(variant))
+    return best
+
+
+def _per_call_us(func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench_middleware(requests: int, repeat: int) -> dict:
+    """
+    Per-request cost of the middleware, isolated and inside a FastAPI app
+    :return: dict
+    """
+    apps = {
+        "bare": _bare_app, "bare_instrumented": MetricsMiddleware(_bare_app),
+        "fastapi": _app(False), "fastapi_instrumented": _app(True),
+    }
+    best = _best_of(apps, repeat, lambda app: asyncio.run(_drive(app, requests)) / requests * 1e6)
+    return {
+        "overhead_us_per_request": round(best["bare_instrumented"] - best["bare"], 3),
+        "fastapi_us_per_request": round(best["fastapi"], 3),
+        "fastapi_instrumented_us_per_request": round(best["fastapi_instrumented"], 3),
+    }
+
+
+def bench_primitives(calls: int) -> dict:
+    """
+    Cost of the metric primitives used on the hot path
+    :return: dict
+    """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Bench")
+    counter = registry.counter("bench_total", "Bench", ("method", "route", "status"))
+
+    def plain():
+        return None
+
+    timed_plain = timed(histogram)(plain)
+    plain_us = _per_call_us(plain, calls)
+    return {
+        "histogram_observe_us": round(_per_call_us(lambda: histogram.observe(0.01), calls), 3),
+        "labeled_counter_inc_us": round(_per_call_us(lambda: counter.labels("GET", "/x", "200").inc(), calls), 3),
+        "timed_call_overhead_us": round(_per_call_us(timed_plain, calls) - plain_us, 3),
+    }
+
+
+def bench_queries(queries: int, repeat: int) -> dict:
+    """
+    Per-statement cost of the engine hooks
+    :return: dict
+    """
+    connections = {}
+    for name, instrument in (("plain", False), ("instrumented", True)):
+        engine = create_engine("sqlite://")
+        if instrument:
+            instrument_queries(engine)
+        connections[name] = engine.connect()
+    statement = text("SELECT 1")
+    try:
+        best = _best_of(
+            connections, repeat, lambda conn: _per_call_us(lambda: conn.execute(statement), queries)
+        )
+    finally:
+        for conn in connections.values():
+            conn.close()
+    return {
+        "plain_us_per_query": round(best["plain"], 3),
+        "instrumented_us_per_query": round(best["instrumented"], 3),
+        "overhead_us_per_query": round(best["instrumented"] - best["plain"], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    emit({
+        "middleware": bench_middleware(args.requests, args.repeat),
+        "primitives": bench_primitives(args.calls),
+        "queries": bench_queries(args.queries, args.repeat),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
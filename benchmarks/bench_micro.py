@@ -0,0 +1,109 @@
+"""
+Micro-benchmarks of the building blocks of a request, in microseconds per call (median of --repeat):
+
+  - hasher: Hasher.get_password_hash / verify_password at the configured bcrypt cost
+  - token: Token.generate_token / decode_token / verify_token
+  - repository: every read and write method of UserRepository on a seeded database
+    (SQLite file by default, any SQLAlchemy url with --db-url)
+
+    python -m benchmarks.bench_micro --only token,repository --output micro.json
+"""
+import argparse
+import statistics
+import timeit
+
+from fastapi import HTTPException
+
+from app.repositories.user_respository import UserRepository
+from app.schemas.user import UserUpdate
+from app.utils.hashing import Hasher
+from app.utils.token import Token
+from benchmarks.common import emit, seeded_sessionmaker
+
+GROUPS = ("hasher", "token", "repository")
+
+
+def _us_per_call(func, number: int, repeat: int) -> float:
+    samples = timeit.repeat(func, number=number, repeat=repeat)
+    return round(statistics.median(samples) / number * 1e6, 3)
+
+
+def bench_hasher(number: int, repeat: int) -> dict:
+    """
+    bcrypt hash and verify
+    :return: dict
+    """
+    hashed = Hasher.get_password_hash("benchpassword")
+    return {
+        "get_password_hash_us": _us_per_call(lambda: Hasher.get_password_hash("benchpassword"), number, repeat),
+        "verify_password_us": _us_per_call(lambda: Hasher.verify_password("benchpassword", hashed), number, repeat),
+    }
+
+
+def bench_token(number: int, repeat: int) -> dict:
+    """
+    JWT issue and verification
+    :return: dict
+    """
+    claims = {"sub": "bench", "id": 1, "is_superuser": False, "active": True}
+    token = Token.generate_token(claims)
+    error = HTTPException(status_code=401)
+    return {
+        "generate_token_us": _us_per_call(lambda: Token.generate_token(claims), number, repeat),
+        "decode_token_us": _us_per_call(lambda: Token.decode_token(token, error), number, repeat),
+        "verify_token_us": _us_per_call(lambda: Token.verify_token(token, error), number, repeat),
+    }
+
+
+def bench_repository(db_url: str, rows: int, number: int, repeat: int) -> dict:
+    """
+    UserRepository methods on a seeded table
+    :return: dict
+    """
+    session_local = seeded_sessionmaker(db_url, rows)
+    middle = rows // 2
+    with session_local() as db:
+        repo = UserRepository(db)
+        user_id = repo.get_after(middle, 1)[0].id
+        calls = {
+            "get": lambda: repo.get(user_id),
+            "get_user_by_email": lambda: repo.get_user_by_email(f"bench{middle}@bench.com"),
+            "get_all_20": lambda: repo.get_all(20, middle),
+            "get_after_20": lambda: repo.get_after(middle, 20),
+            "get_all_with_count_20": lambda: repo.get_all_with_count(20, middle),
+            "count": lambda: repo.count(),
+            "get_existing_identities_10": lambda: repo.get_existing_identities(
+                [f"bench{i}" for i in range(10)], [f"bench{i}@bench.com" for i in range(10)]
+            ),
+            "update": lambda: repo.update(user_id, UserUpdate(address="Micro Street")),
+        }
+        return {f"{name}_us": _us_per_call(call, number, repeat) for name, call in calls.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(GROUPS), help="Comma separated groups to run")
+    parser.add_argument("--db-url", default="sqlite:///bench_users.db")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--number", type=int, default=200, help="Calls per sample (hasher uses 1/20 of it)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    groups = [group.strip() for group in args.only.split(",") if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"Unknown groups {sorted(unknown)}, expected {GROUPS}")
+
+    result = {"config": {"rows": args.rows, "number": args.number, "repeat": args.repeat, "db_url": args.db_url}}
+    if "hasher" in groups:
+        result["hasher"] = bench_hasher(max(1, args.number // 20), args.repeat)
+    if "token" in groups:
+        result["token"] = bench_token(args.number, args.repeat)
+    if "repository" in groups:
+        result["repository"] = bench_repository(args.db_url, args.rows, args.number, args.repeat)
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Offset vs keyset pagination latency as page depth grows.
+
+Seeds a users table (SQLite file by default, any SQLAlchemy url with --db-url) and times
+`UserRepository.get_all` (OFFSET/LIMIT) against `UserRepository.get_after` (seek on id)
+for pages at increasing depth. Keyset latency should stay flat while offset grows linearly.
+
+    python -m benchmarks.bench_pagination --rows 500000 --limit 10
+"""
+import argparse
+import statistics
+import time
+
+from app.repositories.user_respository import UserRepository
+from benchmarks.common import emit, seeded_sessionmaker
+
+
+def _time(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def run(db_url: str, rows: int, limit: int, repeat: int) -> dict:
+    """
+    Time both pagination modes at several page depths
+    :return: dict report
+    """
+    session_local = seeded_sessionmaker(db_url, rows)
+    pages = rows // limit
+    depths = sorted({1, *[d for d in (10, 100, 1000, 10000, 100000) if d < pages], pages})
+    results = []
+    with session_local() as db:
+        repo = UserRepository(db)
+        for page in depths:
+            offset = (page - 1) * limit
+            # Los ids se insertan secuencialmente, el último id de la página anterior es el offset
+            offset_s = _time(lambda: repo.get_all(limit, offset), repeat)
+            keyset_s = _time(lambda: repo.get_after(offset, limit), repeat)
+            results.append({
+                "page": page,
+                "offset_ms": round(offset_s * 1000, 3),
+                "keyset_ms": round(keyset_s * 1000, 3),
+            })
+            db.expunge_all()
+    return {"db_url": db_url, "rows": rows, "limit": limit, "repeat": repeat, "pages": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///bench_users.db")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    emit(run(args.db_url, args.rows, args.limit, args.repeat), args.output)
+
+
+if __name__ == "__main__":
+    main()
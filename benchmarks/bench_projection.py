@@ -0,0 +1,85 @@
+"""
+Per-row cost of building a page of UserResponse: ORM entities vs column projection.
+
+Seeds a users table (SQLite file by default, any SQLAlchemy url with --db-url) and times, for
+pages of --limit rows:
+  - orm: `select(User)` entities through the identity map, then
+    `UserResponse.model_validate` per row (the read path before projection)
+  - projection: `UserRepository.get_all` (RESPONSE_COLUMNS tuples), validated in one batch
+    with `validate_rows`
+
+    python -m benchmarks.bench_projection --rows 100000 --limit 10000
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import select
+
+from app.models.user import User
+from app.repositories.user_respository import UserRepository
+from app.schemas.user import UserResponse
+from app.services.user_service import validate_rows
+from benchmarks.common import emit, seeded_sessionmaker
+
+
+def _time(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def run(db_url: str, rows: int, limit: int, repeat: int) -> dict:
+    """
+    Time both read paths over the same page
+    :return: dict report
+    """
+    session_local = seeded_sessionmaker(db_url, rows)
+    with session_local() as db:
+        repo = UserRepository(db)
+
+        def orm_page():
+            users = db.scalars(select(User).order_by(User.id).limit(limit)).all()
+            page = [UserResponse.model_validate(user) for user in users]
+            # Cada repetición arranca con el identity map vacío, como un request nuevo
+            db.expunge_all()
+            return page
+
+        def projection_page():
+            return validate_rows(repo.get_all(limit, 0))
+
+        page_rows = len(projection_page())
+        orm_s = _time(orm_page, repeat)
+        projection_s = _time(projection_page, repeat)
+
+    per_row = lambda seconds: round(seconds / max(1, page_rows) * 1e6, 3)
+    return {
+        "db_url": db_url,
+        "rows": rows,
+        "limit": limit,
+        "page_rows": page_rows,
+        "repeat": repeat,
+        "orm_ms": round(orm_s * 1000, 3),
+        "projection_ms": round(projection_s * 1000, 3),
+        "orm_us_per_row": per_row(orm_s),
+        "projection_us_per_row": per_row(projection_s),
+        "speedup": round(orm_s / projection_s, 2) if projection_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///bench_users.db")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    emit(run(args.db_url, args.rows, args.limit, args.repeat), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Cost of turning a page of user rows into a JSON response, across page sizes.
+
+Seeds a users table (SQLite file by default, any SQLAlchemy url with --db-url), fetches one page per
+--sizes value and times, per page:
+
+  - validate: `UserResponseList` over RowMapping rows (the former read path) vs `validate_rows`
+    over the tuple rows the repository returns now
+  - encode: a validated page through FastAPI's default encoder (jsonable_encoder and stdlib json) vs
+    `model_dump_json`, and, if orjson is installed, orjson over plain dicts as a floor
+  - endpoint: both full paths behind a FastAPI route, driven in process through ASGI without a database:
+    RowMapping rows returned through `response_model` (validated again before encoding) vs tuple rows
+    returned as a `ModelResponse`
+
+    python -m benchmarks.bench_serialization --sizes 10,100,1000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.models.user import User
+from app.repositories.user_respository import EXPORT_COLUMNS, RESPONSE_COLUMNS
+from app.schemas.user import UserPaginatedResponse
+from app.services.user_service import UserResponseList, validate_rows
+from app.utils.responses import ModelResponse
+from benchmarks.common import emit, seeded_sessionmaker
+
+
+def _per_call_us(func, number: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return round(best / number * 1e6, 1)
+
+
+def _app(mappings: list, rows: list, metadata: dict) -> FastAPI:
+    """
+    One route per read path, serving the same pre-fetched page
+    """
+    app = FastAPI()
+
+    @app.get("/response_model", response_model=UserPaginatedResponse)
+    async def response_model():
+        return UserPaginatedResponse(metadata=metadata, data=UserResponseList.validate_python(mappings))
+
+    @app.get("/model_dump")
+    async def model_dump():
+        return ModelResponse(UserPaginatedResponse(metadata=metadata, data=validate_rows(rows)))
+
+    return app
+
+
+async def _drive(app: FastAPI, path: str, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": None,
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(20):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def bench_page(session_local, size: int, number: int, repeat: int) -> dict:
+    """
+    Time every stage for a page of `size` rows
+    :return: dict
+    """
+    stmt = select(*(getattr(User, name) for name in RESPONSE_COLUMNS)).order_by(User.id).limit(size)
+    with session_local() as db:
+        mappings = db.execute(stmt).mappings().all()
+        rows = db.execute(stmt).all()
+    metadata = {"total_count": size, "count_kind": "exact", "limit": size, "offset": 0, "current_page": 1,
+                "total_pages": 1}
+    page = UserPaginatedResponse(metadata=metadata, data=validate_rows(rows))
+    app = _app(mappings, rows, metadata)
+    result = {
+        "rows": len(rows),
+        "body_bytes": len(page.model_dump_json()),
+        "validate_mappings_us": _per_call_us(lambda: UserResponseList.validate_python(mappings), number, repeat),
+        "validate_tuples_us": _per_call_us(lambda: validate_rows(rows), number, repeat),
+        "encode_jsonable_us": _per_call_us(lambda: JSONResponse(jsonable_encoder(page)).body, number, repeat),
+        "encode_model_dump_us": _per_call_us(lambda: ModelResponse(page).body, number, repeat),
+    }
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        dicts = [dict(zip(EXPORT_COLUMNS, row)) for row in rows]
+        result["encode_orjson_dicts_us"] = _per_call_us(
+            lambda: orjson.dumps({"metadata": metadata, "data": dicts}), number, repeat
+        )
+    result["endpoint_response_model_us"] = round(asyncio.run(_drive(app, "/response_model", number)), 1)
+    result["endpoint_model_dump_us"] = round(asyncio.run(_drive(app, "/model_dump", number)), 1)
+    result["endpoint_speedup"] = round(result["endpoint_response_model_us"] / result["endpoint_model_dump_us"], 2)
+    return result
+
+
+def run(db_url: str, rows: int, sizes: list[int], number: int, repeat: int) -> dict:
+    """
+    Time every page size
+    :return: dict report
+    """
+    session_local = seeded_sessionmaker(db_url, rows)
+    return {str(size): bench_page(session_local, size, max(1, number // size), repeat) for size in sizes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite:///bench_serialization.db")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma separated page sizes")
+    parser.add_argument("--number", type=int, default=20000, help="Rows serialized per timing, split in pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    result = run(args.db_url, args.rows, sizes, args.number, args.repeat)
+    result["config"] = {"rows": args.rows, "sizes": sizes, "number": args.number, "repeat": args.repeat,
+                        "db_url": args.db_url}
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cold start of the application.
+
+  - import: wall time of `import main` in a fresh interpreter (best of --repeat) and the
+    slowest modules reported by `python -X importtime`, by self and cumulative time
+  - serve (--serve): seconds from spawning `python -m app.server` with one worker until it
+    answers its first request
+
+    python -m benchmarks.bench_startup --top 15 --serve --output startup.json
+"""
+import argparse
+import asyncio
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.common import emit
+from benchmarks.load import serve
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+TIMED_IMPORT = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def import_profile() -> tuple[float, list[dict]]:
+    """
+    Import main in a fresh interpreter
+    :return: (wall seconds, one dict per imported module with self_us, cumulative_us and depth)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TIMED_IMPORT], capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules.append({
+                "module": match.group(4), "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)), "depth": len(match.group(3)) // 2,
+            })
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def bench_import(repeat: int, top: int) -> dict:
+    """
+    Import time of main and its slowest modules
+    :return: dict
+    """
+    # -X importtime infla el tiempo total, el wall time se mide aparte
+    best = min(
+        float(subprocess.run([sys.executable, "-c", TIMED_IMPORT], capture_output=True, text=True,
+                             check=True).stdout.strip().splitlines()[-1])
+        for _ in range(repeat)
+    )
+    _, modules = import_profile()
+    by_self = sorted(modules, key=lambda m: m["self_us"], reverse=True)[:top]
+    app_modules = [m for m in modules if m["module"] == "main" or m["module"].startswith("app.")]
+    return {
+        "import_main_ms": round(best * 1000, 3),
+        "slowest_self_us": {m["module"]: m["self_us"] for m in by_self},
+        "app_cumulative_us": {
+            m["module"]: m["cumulative_us"] for m in sorted(app_modules, key=lambda m: -m["cumulative_us"])[:top]
+        },
+    }
+
+
+async def bench_serve() -> dict:
+    """
+    Time until a freshly spawned server answers
+    :return: dict
+    """
+    start = time.perf_counter()
+    async with serve(1):
+        ready = time.perf_counter() - start
+    return {"first_response_ms": round(ready * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Modules listed in each ranking")
+    parser.add_argument("--serve", action="store_true", help="Also measure a full server start")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    result = {"import": bench_import(args.repeat, args.top)}
+    if args.serve:
+        result["serve"] = asyncio.run(bench_serve())
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Micro-benchmark of bearer token verification with and without the verified-token cache.
+
+    python -m benchmarks.bench_token --iterations 20000
+"""
+import argparse
+import timeit
+
+from app.utils.oauth import OAuth
+from app.utils.token import Token, VerifiedTokenCache
+from benchmarks.common import emit
+
+
+def run(iterations: int) -> dict:
+    """
+    Time OAuth.get_current_user for the same token, uncached and cached
+    :param iterations: int
+    :return: dict report
+    """
+    token = Token.generate_token({"sub": "bench", "id": 1, "is_superuser": False, "active": True})
+    uncached = OAuth(Token())
+    cached = OAuth(Token(), VerifiedTokenCache(max_size=1024))
+    cached.get_current_user(token)
+
+    uncached_s = timeit.timeit(lambda: uncached.get_current_user(token), number=iterations)
+    cached_s = timeit.timeit(lambda: cached.get_current_user(token), number=iterations)
+    return {
+        "iterations": iterations,
+        "uncached_us_per_op": round(uncached_s / iterations * 1e6, 3),
+        "cached_us_per_op": round(cached_s / iterations * 1e6, 3),
+        "speedup": round(uncached_s / cached_s, 2) if cached_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    emit(run(args.iterations), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Shared helpers for the benchmark scripts: timing summaries and JSON reporting
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile
+    :param samples: list[float]
+    :param pct: float between 0 and 100
+    :return: float
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """
+    Summarize request latencies (seconds) as RPS and percentiles in milliseconds
+    :param latencies: list[float]
+    :param elapsed: float wall time in seconds
+    :return: dict
+    """
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata() -> dict:
+    """
+    Where and when a report was produced, so reports can be compared across commits
+    :return: dict
+    """
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "command": " ".join(sys.argv),
+    }
+
+
+def emit(result: dict, output: Optional[str] = None) -> None:
+    """
+    Print the result as JSON, with the run metadata, and optionally write it to a file
+    :param result: dict
+    :param output: str | None path
+    """
+    result = {"meta": metadata(), **result}
+    payload = json.dumps(result, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as f:
+            f.write(payload + '\n')
+    sys.stdout.write(payload + '\n')
+
+
+def seeded_sessionmaker(url: str, rows: int, batch_size: int = 10000):
+    """
+    Create the schema on `url` and seed it with `rows` users (skipped if already seeded)
+    :param url: str SQLAlchemy database url
+    :param rows: int
+    :param batch_size: int rows per insert
+    :return: sessionmaker bound to the seeded database
+    """
+    from sqlalchemy import create_engine, func, insert, select
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db.database import Base
+    from app.models.user import User
+
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(User))
+        for start in range(existing, rows, batch_size):
+            conn.execute(insert(User), [
+                {
+                    "email": f"bench{i}@bench.com",
+                    "username": f"bench{i}",
+                    "password": "x" * 60,
+                    "address": f"{i} Bench Street",
+                }
+                for i in range(start, min(rows, start + batch_size))
+            ])
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
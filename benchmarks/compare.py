@@ -0,0 +1,91 @@
+"""
+Compare two benchmark JSON reports (e.g. from two commits) metric by metric.
+
+Every numeric leaf present in both reports is listed with its relative change. Latency metrics
+(keys ending in _ms or _us) are regressions when they grow, throughput metrics (rps, speedup)
+when they shrink. With --fail-over the exit code is 1 if any of them regressed by more than
+that percentage, so it can gate a CI job.
+
+    python -m benchmarks.compare base.json head.json --fail-over 10
+"""
+import argparse
+import json
+import sys
+from typing import Iterator, Optional
+
+LOWER_IS_BETTER = ("_ms", "_us")
+HIGHER_IS_BETTER = ("rps", "speedup")
+
+
+def _leaves(report: dict, prefix: str = "") -> Iterator[tuple[str, float]]:
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _leaves(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def _direction(path: str) -> int:
+    """
+    1 if lower is better, -1 if higher is better, 0 if the metric is informational
+    """
+    name = path.rsplit(".", 1)[-1]
+    if name.endswith(LOWER_IS_BETTER):
+        return 1
+    if name.endswith(HIGHER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(base: dict, head: dict) -> list[dict]:
+    """
+    Relative change of every metric present in both reports, skipping the run metadata
+    :param base: dict report
+    :param head: dict report
+    :return: list of rows (metric, base, head, change_pct, regression_pct)
+    """
+    base_values = dict(_leaves({k: v for k, v in base.items() if k != "meta"}))
+    rows = []
+    for path, head_value in _leaves({k: v for k, v in head.items() if k != "meta"}):
+        if path not in base_values:
+            continue
+        base_value = base_values[path]
+        change: Optional[float] = None if base_value == 0 else (head_value - base_value) / abs(base_value) * 100
+        direction = _direction(path)
+        rows.append({
+            "metric": path,
+            "base": base_value,
+            "head": head_value,
+            "change_pct": None if change is None else round(change, 2),
+            "regression_pct": None if change is None or not direction else round(change * direction, 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--fail-over", type=float, default=None,
+                        help="Exit with 1 if a latency/throughput metric regressed more than this percentage")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    rows = compare(base, head)
+    width = max((len(row["metric"]) for row in rows), default=10)
+    sys.stdout.write(f"base {base.get('meta', {}).get('commit')} -> head {head.get('meta', {}).get('commit')}\n")
+    for row in rows:
+        change = "n/a" if row["change_pct"] is None else f"{row['change_pct']:+.2f}%"
+        flag = " !" if args.fail_over is not None and (row["regression_pct"] or 0) > args.fail_over else ""
+        sys.stdout.write(f"{row['metric']:<{width}}  {row['base']:>14}  {row['head']:>14}  {change:>9}{flag}\n")
+
+    if args.fail_over is not None and any((row["regression_pct"] or 0) > args.fail_over for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
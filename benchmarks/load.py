@@ -0,0 +1,320 @@
+"""
+Concurrent load test for the user and auth request paths.
+
+Drives a weighted mix of operations from N concurrent clients for a fixed duration and
+reports RPS and latency percentiles, overall and per operation, as JSON:
+
+    login    POST /auth/login
+    refresh  POST /auth/refresh, rotating the client's refresh token (no bcrypt)
+    read     GET /users/{id} (authenticated)
+    list     GET /users/ paginated, alternating offset pages and cursor walks
+    create   POST /users/
+    update   PUT /users/{id} on the client's own user
+
+Scenarios: login-storm, refresh-storm, reads, listing, writes and mixed (the default); --mix overrides the
+weights, e.g. --mix read=8,list=2. The app can be driven:
+
+  - in-process through httpx's ASGI transport, against --db-url (SQLite file by default)
+  - under `python -m app.server` started by the harness (--serve, uses the DB_* environment of the app)
+  - at an already running API (--url)
+
+    python -m benchmarks.load --scenario mixed --concurrency 50 --output mixed.json
+    python -m benchmarks.load --serve --workers 4 --scenario login-storm
+    python -m benchmarks.load --url http://localhost:8000 --scenario reads
+
+The login rate limiter is disabled (LOGIN_RATE_LIMIT_BACKEND=none) unless --rate-limit is given,
+since every client shares one IP and login-storm would measure 429s instead of bcrypt.
+
+To compare the sync and async database stacks, run the same scenario with DB_ASYNC=false and
+DB_ASYNC=true against the same Postgres; compare runs with `python -m benchmarks.compare`.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+
+import httpx
+
+from benchmarks.common import emit, summarize
+
+SCENARIOS = {
+    "login-storm": {"login": 1},
+    "refresh-storm": {"refresh": 1},
+    "reads": {"read": 1},
+    "listing": {"list": 1},
+    "writes": {"create": 1, "update": 1},
+    "mixed": {"read": 6, "list": 2, "login": 1, "create": 0.5, "update": 0.5},
+}
+PASSWORD = "loadpassword"
+
+
+class Session:
+    """
+    A benchmark user: credentials, tokens and the cursor of its listing walk
+    """
+    def __init__(self, user_id: int, username: str, token: str, refresh_token: str):
+        self.user_id = user_id
+        self.username = username
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.cursor = None
+        self.refresh_token = refresh_token
+        # Un refresh token usado dos veces revoca la familia: las rotaciones de un usuario se serializan
+        self.refresh_lock = asyncio.Lock()
+
+
+def _new_user() -> dict:
+    suffix = uuid.uuid4().hex[:12]
+    return {"email": f"load{suffix}@bench.com", "username": f"load{suffix}", "password": PASSWORD}
+
+
+async def _setup_session(client: httpx.AsyncClient) -> Session:
+    """
+    Create a throwaway user and log in with it
+    :return: Session
+    """
+    user = _new_user()
+    created = await client.post("/users/", json=user)
+    created.raise_for_status()
+    login = await client.post("/auth/login", data={"username": user['username'], "password": PASSWORD})
+    login.raise_for_status()
+    tokens = login.json()
+    return Session(created.json()['id'], user['username'], tokens['access_token'], tokens['refresh_token'])
+
+
+async def _login(client, session, rng):
+    return await client.post("/auth/login", data={"username": session.username, "password": PASSWORD})
+
+
+async def _refresh(client, session, rng):
+    async with session.refresh_lock:
+        response = await client.post("/auth/refresh", json={"refresh_token": session.refresh_token})
+        if response.status_code == 200:
+            session.refresh_token = response.json()['refresh_token']
+        return response
+
+
+async def _read(client, session, rng):
+    return await client.get(f"/users/{session.user_id}", headers=session.headers)
+
+
+async def _list(client, session, rng):
+    if rng.random() < 0.5:
+        return await client.get(
+            "/users/", params={"limit": 20, "offset": rng.randrange(0, 200, 20)}, headers=session.headers
+        )
+    params = {"limit": 20, "cursor": session.cursor} if session.cursor else {"limit": 20, "mode": "cursor"}
+    response = await client.get("/users/", params=params, headers=session.headers)
+    if response.status_code == 200:
+        session.cursor = response.json()['metadata'].get('next_cursor')
+    return response
+
+
+async def _create(client, session, rng):
+    return await client.post("/users/", json=_new_user())
+
+
+async def _update(client, session, rng):
+    return await client.put(
+        f"/users/{session.user_id}", json={"address": f"{rng.randrange(10000)} Load Street"},
+        headers=session.headers,
+    )
+
+
+OPERATIONS = {"login": _login, "refresh": _refresh, "read": _read, "list": _list, "create": _create, "update": _update}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+    Parse op=weight pairs
+    :param mix: str like "read=8,list=2"
+    :return: dict
+    """
+    weights = {}
+    for pair in filter(None, (part.strip() for part in mix.split(","))):
+        name, _, weight = pair.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name}, expected one of {sorted(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def _worker(client, sessions: list[Session], weights: dict[str, float], rng: random.Random,
+                  warmup_until: float, deadline: float, latencies: dict, statuses: dict) -> None:
+    names, cumulative = list(weights), list(weights.values())
+    while (now := time.perf_counter()) < deadline:
+        name = rng.choices(names, cumulative)[0]
+        session = rng.choice(sessions)
+        start = time.perf_counter()
+        try:
+            response = await OPERATIONS[name](client, session, rng)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if now >= warmup_until:
+            latencies[name].append(time.perf_counter() - start)
+            statuses[name][status] += 1
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve(workers: int):
+    """
+    Start the production entry point (`python -m app.server`) on a free port and wait until it answers
+    :param workers: int uvicorn worker processes
+    :return: base url
+    """
+    port = _free_port()
+    env = {**os.environ, "HOST": "127.0.0.1", "PORT": str(port), "WEB_CONCURRENCY": str(workers),
+           "LOG_LEVEL": "warning"}
+    process = subprocess.Popen([sys.executable, "-m", "app.server"], env=env)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=url) as probe:
+            for _ in range(300):
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+                try:
+                    await probe.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start in 30 seconds")
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def _in_process_client(db_url: str) -> httpx.AsyncClient:
+    """
+    ASGI client for the app with get_db bound to db_url, as the tests do
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db.database import Base, get_db
+    from main import app
+
+    connect_args = {"check_same_thread": False} if db_url.startswith("sqlite") else {}
+    engine = create_engine(db_url, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+
+async def run(url: str, weights: dict[str, float], concurrency: int, duration: float, warmup: float,
+              users: int, seed: int, db_url: str = "sqlite:///bench_load.db", serve: bool = False,
+              workers: int = 1) -> dict:
+    """
+    Run the load test
+    :param url: str base url of a running API, empty for in-process or --serve
+    :param weights: operation weights
+    :param concurrency: int concurrent clients
+    :param duration: float measured seconds
+    :param warmup: float seconds before measuring
+    :param users: int benchmark users shared by the clients
+    :param seed: int random seed of the operation sequence
+    :param db_url: str database of the in-process mode
+    :param serve: bool start uvicorn
+    :param workers: int uvicorn workers with serve
+    :return: dict report
+    """
+    async with _target(url, db_url, serve, workers) as (client, target):
+        sessions = [await _setup_session(client) for _ in range(users)]
+        latencies: dict = defaultdict(list)
+        statuses: dict = defaultdict(Counter)
+        start = time.perf_counter()
+        warmup_until = start + warmup
+        deadline = warmup_until + duration
+        await asyncio.gather(*(
+            _worker(client, sessions, weights, random.Random(seed + i), warmup_until, deadline, latencies, statuses)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - warmup_until
+
+    operations = {}
+    for name in weights:
+        operations[name] = summarize(latencies[name], elapsed)
+        operations[name]["statuses"] = dict(statuses[name])
+    overall = summarize([latency for values in latencies.values() for latency in values], elapsed)
+    overall["errors"] = sum(
+        count for counter in statuses.values() for status, count in counter.items() if not status.startswith("2")
+    )
+    return {
+        "target": target,
+        "config": {
+            "weights": weights, "concurrency": concurrency, "duration_s": duration,
+            "warmup_s": warmup, "users": users, "seed": seed,
+        },
+        "overall": overall,
+        "operations": operations,
+    }
+
+
+@asynccontextmanager
+async def _target(url: str, db_url: str, serve: bool, workers: int):
+    if serve:
+        async with serve(workers) as served_url:
+            async with httpx.AsyncClient(base_url=served_url, timeout=60) as client:
+                yield client, f"uvicorn x{workers}"
+    elif url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            yield client, url
+    else:
+        async with _in_process_client(db_url) as client:
+            yield client, f"in-process ({db_url})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="", help="Base url of a running API")
+    parser.add_argument("--serve", action="store_true", help="Start the app under uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --serve")
+    parser.add_argument("--db-url", default="sqlite:///bench_load.db", help="Database of the in-process mode")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--mix", default="", help="Operation weights, overrides the scenario (read=8,list=2)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds run before measuring")
+    parser.add_argument("--users", type=int, default=10, help="Benchmark users shared by the clients")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the login rate limiter enabled")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if not args.rate_limit:
+        # Antes de importar la app: la configuración se lee una sola vez
+        os.environ["LOGIN_RATE_LIMIT_BACKEND"] = "none"
+    weights = parse_mix(args.mix) if args.mix else SCENARIOS[args.scenario]
+    result = asyncio.run(run(
+        args.url, weights, args.concurrency, args.duration, args.warmup, args.users, args.seed,
+        db_url=args.db_url, serve=args.serve, workers=args.workers,
+    ))
+    result["config"]["scenario"] = "custom" if args.mix else args.scenario
+    emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
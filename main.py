@@ -1,14 +1,67 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.api.v1.endpoints.user import user_router
 from app.api.v1.endpoints.auth import auth_router
+from app.api.v1.endpoints.jwks import jwks_router
+from app.api.v1.endpoints.metrics import metrics_router
+from app.core.compression import CompressionMiddleware, compression_options
+from app.core.config import settings
+from app.core.instrumentation import MetricsMiddleware, sql_trace
+from app.db.database import db
 from app.db.initialize_db import create_superuser
+from app.utils.hashing import apply_calibration, hashing_pool
+from app.utils.username_filter import username_filter
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_username_filter() -> None:
+    """
+    Rebuild the username filter from the users table now and every USERNAME_FILTER_REBUILD_SECONDS.
+    Until the first rebuild ends the filter lets every username through
+    """
+    while True:
+        try:
+            count = await run_in_threadpool(username_filter.rebuild_from_db)
+            logger.info("Filtro de usernames reconstruido con %s usernames", count)
+        except Exception as e:
+            logger.error("Error al reconstruir el filtro de usernames: %s", e)
+        if not settings.USERNAME_FILTER_REBUILD_SECONDS:
+            return
+        await asyncio.sleep(settings.USERNAME_FILTER_REBUILD_SECONDS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_superuser()
+    # El superusuario se crea con `python -m app.db.initialize_db`; al arrancar solo si se pide
+    if settings.SUPERUSER_ON_STARTUP:
+        try:
+            await run_in_threadpool(create_superuser)
+        except Exception as e:
+            logger.error("Error al crear superusuario: %s", e)
+    # Calibra el costo del hash en este host; antes de que el pool de hashing arranque
+    if settings.PASSWORD_HASH_TARGET_MS:
+        await run_in_threadpool(apply_calibration)
+    # En segundo plano: no demora el arranque
+    rebuild_task = asyncio.create_task(rebuild_username_filter()) if username_filter.enabled else None
     yield
+    if rebuild_task is not None:
+        rebuild_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await rebuild_task
+    # Los requests en curso ya terminaron: cierra el pool de hashing y las conexiones
+    hashing_pool.shutdown()
+    await db.dispose()
 app = FastAPI(lifespan=lifespan)
 app.include_router(user_router)
 app.include_router(auth_router)
-
+app.include_router(jwks_router)
+# Antes que el de métricas: queda por dentro y la latencia medida incluye la compresión
+if settings.COMPRESSION_ENCODINGS:
+    app.add_middleware(CompressionMiddleware, **compression_options())
+if settings.METRICS_ENABLED or sql_trace.enabled:
+    app.add_middleware(MetricsMiddleware)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
@@ -7,13 +7,24 @@ from fastapi.testclient import TestClient
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Antes de importar la app: la configuración se construye en el primer import de app.core.config
+os.environ.setdefault("ENV_FILE", ".env.test")
+os.environ.setdefault("SECRET_KEY", "testsecret")
+os.environ.setdefault("ALGORITHM", "HS256")
+# Un solo proceso: las caches en memoria son válidas (con varios workers la configuración las rechaza)
+os.environ.setdefault("WEB_CONCURRENCY", "1")
+
 from main import app
+from app.core.instrumentation import instrument_queries, sql_trace
 from app.db.database import Base, get_db
+from app.utils.cache import principal_cache, response_cache, user_count_cache
+from app.utils.rate_limit import login_limiter
 
 # Configuración global para la base de datos de pruebas
 DB_PATH = os.path.join(os.path.dirname(__file__), 'test.db')
 SQL_ALCHEMY_DATABASE_URL = f'sqlite:///{DB_PATH}'
 ENGINE_TEST = create_engine(SQL_ALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+instrument_queries(ENGINE_TEST)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=ENGINE_TEST)
 
 # Sobrescribir la dependencia de la base de datos
@@ -27,6 +38,98 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
 
+class FakeRedis:
+    """Store en memoria con la interfaz mínima de redis que usan los backends compartidos"""
+
+    def __init__(self):
+        self.data = {}
+        self.now = 0.0
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.now:
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        entry = self._alive(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key, value, ex=None, px=None):
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        self.data[key] = (value.encode() if isinstance(value, str) else value,
+                          None if ttl is None else self.now + ttl)
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def incr(self, key):
+        entry = self._alive(key)
+        value = int(entry[0]) + 1 if entry else 1
+        self.data[key] = (str(value).encode(), entry[1] if entry else None)
+        return value
+
+    def pexpire(self, key, ms):
+        entry = self._alive(key)
+        if entry is None:
+            return False
+        self.data[key] = (entry[0], self.now + ms / 1000)
+        return True
+
+    def setbit(self, key, offset, value):
+        entry = self._alive(key)
+        data = bytearray(entry[0] if entry else b"")
+        if len(data) <= offset >> 3:
+            data.extend(bytes((offset >> 3) + 1 - len(data)))
+        previous = data[offset >> 3] >> (7 - (offset & 7)) & 1
+        if value:
+            data[offset >> 3] |= 0x80 >> (offset & 7)
+        else:
+            data[offset >> 3] &= ~(0x80 >> (offset & 7)) & 0xFF
+        self.data[key] = (bytes(data), entry[1] if entry else None)
+        return previous
+
+    def getbit(self, key, offset):
+        value = self.get(key) or b""
+        return value[offset >> 3] >> (7 - (offset & 7)) & 1 if offset >> 3 < len(value) else 0
+
+    def bitop(self, operation, dest, *keys):
+        assert operation == "OR"
+        values = [self.get(key) or b"" for key in keys]
+        size = max(map(len, values), default=0)
+        result = bytearray(size)
+        for value in values:
+            for index, byte in enumerate(value):
+                result[index] |= byte
+        self.data[dest] = (bytes(result), None)
+        return size
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakePipeline:
+    """Pipeline de FakeRedis: encola los comandos y los ejecuta en orden en execute()"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((getattr(self.client, name), args, kwargs))
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
 # Usuario de prueba
 TEST_USER = {
     "email": "auth@prueba.com",
@@ -50,6 +153,31 @@ def setup():
     Base.metadata.create_all(bind=ENGINE_TEST)
     yield
     Base.metadata.drop_all(bind=ENGINE_TEST)
+    for cache in (principal_cache.cache, response_cache.cache, user_count_cache):
+        if cache is not None:
+            clear_backend(cache.backend)
+    if login_limiter is not None:
+        clear_backend(login_limiter.backend)
+
+
+def clear_backend(backend):
+    """Vacía un backend en memoria; los compartidos se reemplazan por FakeRedis en cada test que los usa"""
+    if hasattr(backend, "clear"):
+        backend.clear()
+
+
+@pytest.fixture(autouse=True)
+def sql_budget():
+    """Traza el SQL de cada request y falla el test si un endpoint supera su presupuesto o repite statements (N+1)"""
+    violations = []
+    listener = lambda report: violations.extend(report.violations())
+    enabled = sql_trace.enabled
+    sql_trace.enabled = True
+    sql_trace.subscribe(listener)
+    yield violations
+    sql_trace.unsubscribe(listener)
+    sql_trace.enabled = enabled
+    assert not violations, "SQL budget exceeded:\n" + "\n".join(violations)
 
 
 @pytest.fixture
@@ -66,3 +194,23 @@ def auth_token(test_client):
         "/auth/login", data={"username": TEST_USER['username'], "password": TEST_USER['password']}
     )
     return response.json()['access_token']
+
+
+@pytest.fixture
+def fake_redis():
+    """Devuelve un store compartido falso (reemplaza a redis en las pruebas)"""
+    return FakeRedis()
+
+
+@pytest.fixture
+def superuser_token(test_client):
+    """Devuelve un token de autenticación de un superusuario"""
+    from app.models.user import User
+    test_client.post("/users/", json=TEST_USER)
+    with TestingSessionLocal() as db:
+        db.query(User).filter(User.username == TEST_USER['username']).update({"is_superuser": True})
+        db.commit()
+    response = test_client.post(
+        "/auth/login", data={"username": TEST_USER['username'], "password": TEST_USER['password']}
+    )
+    return response.json()['access_token']
@@ -0,0 +1,231 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api import dependencies
+from app.core.config import settings
+from app.core.instrumentation import instrument_queries
+from app.db.database import Base, get_async_db
+from app.models.user import User
+from app.core.exceptions import InvalidRefreshTokenError, ItemNotFoundError, UserAlreadyExistsError
+from app.repositories.user_respository import AsyncUserRepository
+from app.repositories.auth_repository import AsyncAuthRepository
+from app.schemas.auth import Login
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.user_service import AsyncUserService
+from app.services.auth_service import AsyncAuthService
+from test.conftest import TestingSessionLocal
+
+DB_PATH = os.path.join(os.path.dirname(__file__), 'test_async.db')
+HTTP_DB_PATH = os.path.join(os.path.dirname(__file__), 'test_async_http.db')
+
+USER = {
+    "email": "async@prueba.com",
+    "username": "asyncusername",
+    "password": "asyncpassword",
+    "address": "async address"
+}
+
+
+def run_with_session(scenario):
+    """Ejecuta un escenario async con una AsyncSession sobre SQLite (aiosqlite)"""
+    async def main():
+        engine = create_async_engine(f'sqlite+aiosqlite:///{DB_PATH}')
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_local = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        try:
+            async with session_local() as db:
+                return await scenario(db)
+        finally:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+            await engine.dispose()
+            if os.path.exists(DB_PATH):
+                os.remove(DB_PATH)
+
+    return asyncio.run(main())
+
+
+class TestAsyncStack:
+
+    def test_create_and_get_user(self):
+        async def scenario(db):
+            service = AsyncUserService(AsyncUserRepository(db))
+            created = await service.create_user(UserCreate(**USER))
+            fetched = await service.get_user_by_id(created.id)
+            users, count, _ = await service.get_users(10, 0)
+            return created, fetched, users, count
+
+        created, fetched, users, count = run_with_session(scenario)
+        assert fetched.username == USER['username']
+        assert created.id == fetched.id
+        assert count == 1 and len(users) == 1
+
+
+    def test_duplicated_user(self):
+        async def scenario(db):
+            service = AsyncUserService(AsyncUserRepository(db))
+            await service.create_user(UserCreate(**USER))
+            try:
+                await service.create_user(UserCreate(**USER))
+            except UserAlreadyExistsError:
+                return True
+            return False
+
+        assert run_with_session(scenario)
+
+
+    def test_update_to_taken_email(self):
+        async def scenario(db):
+            service = AsyncUserService(AsyncUserRepository(db))
+            created = await service.create_user(UserCreate(**USER))
+            await service.create_user(UserCreate(**{**USER, "email": "other@prueba.com", "username": "otheruser"}))
+            try:
+                await service.update_user(created.id, UserUpdate(email="other@prueba.com"))
+            except UserAlreadyExistsError as e:
+                return e.field
+            return None
+
+        assert run_with_session(scenario) == "email"
+
+
+    def test_update_and_delete_user(self):
+        async def scenario(db):
+            service = AsyncUserService(AsyncUserRepository(db))
+            created = await service.create_user(UserCreate(**USER))
+            updated = await service.update_user(created.id, UserUpdate(username="asyncnew"))
+            await service.delete_user(created.id)
+            try:
+                await service.get_user_by_id(created.id)
+            except ItemNotFoundError:
+                return updated, True
+            return updated, False
+
+        updated, deleted = run_with_session(scenario)
+        assert updated.username == "asyncnew"
+        assert deleted
+
+
+    def test_login(self):
+        async def scenario(db):
+            await AsyncUserService(AsyncUserRepository(db)).create_user(UserCreate(**USER))
+            auth_service = AsyncAuthService(AsyncAuthRepository(db))
+            return await auth_service.auth_user(Login(username=USER['username'], password=USER['password']))
+
+        token = run_with_session(scenario)
+        assert token.token_type == "bearer"
+        assert token.access_token
+
+
+    def test_refresh_rotation(self):
+        async def scenario(db):
+            await AsyncUserService(AsyncUserRepository(db)).create_user(UserCreate(**USER))
+            auth_service = AsyncAuthService(AsyncAuthRepository(db))
+            token = await auth_service.auth_user(Login(username=USER['username'], password=USER['password']))
+            rotated = await auth_service.refresh(token.refresh_token)
+            try:
+                await auth_service.refresh(token.refresh_token)
+            except InvalidRefreshTokenError:
+                return rotated, True
+            return rotated, False
+
+        rotated, reuse_detected = run_with_session(scenario)
+        assert rotated.access_token and rotated.refresh_token
+        assert reuse_detected
+
+
+    def test_import_users(self):
+        async def scenario(db):
+            service = AsyncUserService(AsyncUserRepository(db))
+            await service.create_user(UserCreate(**USER))
+            return await service.import_users([
+                (1, {"email": "asyncbulk@prueba.com", "username": "asyncbulk", "password": "asyncpassword"}),
+                (2, {"email": USER['email'], "username": "asyncbulk2", "password": "asyncpassword"}),
+                (3, "Invalid JSON"),
+            ])
+
+        results = run_with_session(scenario)
+        assert [result['status'] for result in results] == ["created", "error", "error"]
+
+
+    def test_export_users(self):
+        async def scenario(db):
+            service = AsyncUserService(AsyncUserRepository(db))
+            await service.create_user(UserCreate(**USER))
+            return [row async for row in service.export_users(batch_size=10)]
+
+        rows = run_with_session(scenario)
+        assert rows == [(1, USER['username'], USER['email'], USER['address'])]
+
+
+@pytest.fixture
+def async_client(test_client, monkeypatch):
+    """Cliente con DB_ASYNC: los endpoints usan los servicios async sobre una AsyncSession (aiosqlite)"""
+    sync_engine = create_engine(f'sqlite:///{HTTP_DB_PATH}')
+    Base.metadata.create_all(bind=sync_engine)
+    # NullPool: cada request del TestClient corre en su propio event loop
+    engine = create_async_engine(f'sqlite+aiosqlite:///{HTTP_DB_PATH}', poolclass=NullPool)
+    instrument_queries(engine.sync_engine)
+    session_local = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_local() as db:
+            yield db
+
+    # get_user_service / get_auth_service se eligen al importar con DB_ASYNC; aquí se elige el stack async
+    monkeypatch.setattr(settings, "DB_ASYNC", True)
+    overrides = {
+        get_async_db: override_get_async_db,
+        dependencies.get_user_service: dependencies.get_async_user_service,
+        dependencies.get_auth_service: dependencies.get_async_auth_service,
+    }
+    test_client.app.dependency_overrides.update(overrides)
+    try:
+        yield test_client
+    finally:
+        for dependency in overrides:
+            test_client.app.dependency_overrides.pop(dependency, None)
+        Base.metadata.drop_all(bind=sync_engine)
+        sync_engine.dispose()
+        if os.path.exists(HTTP_DB_PATH):
+            os.remove(HTTP_DB_PATH)
+
+
+class TestAsyncStackHttp:
+
+    def test_user_lifecycle(self, async_client):
+        created = async_client.post("/users/", json=USER)
+        assert created.status_code == 201, f"Error: {created.text}"
+        user_id = created.json()['id']
+        assert async_client.post("/users/", json=USER).status_code == 409
+        other = {**USER, "email": "asyncother@prueba.com", "username": "asyncother"}
+        assert async_client.post("/users/", json=other).status_code == 201
+        # Escritos por el stack async en su base, no por el sync
+        with TestingSessionLocal() as db:
+            assert db.scalar(select(func.count()).select_from(User)) == 0
+
+        login = async_client.post("/auth/login", data={"username": USER['username'], "password": USER['password']})
+        assert login.status_code == 200, f"Error: {login.text}"
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        page = async_client.get("/users/?limit=10", headers=headers).json()
+        assert page['metadata']['total_count'] == 2 and len(page['data']) == 2
+        first = async_client.get("/users/?mode=cursor&limit=1", headers=headers).json()
+        assert [user['id'] for user in first['data']] == [user_id]
+        second = async_client.get(f"/users/?cursor={first['metadata']['next_cursor']}&limit=1", headers=headers)
+        assert [user['username'] for user in second.json()['data']] == [other['username']]
+
+        updated = async_client.put(f"/users/{user_id}", json={"address": "nueva dirección"}, headers=headers)
+        assert updated.status_code == 200 and updated.json()['address'] == "nueva dirección"
+
+        refreshed = async_client.post("/auth/refresh", json={"refresh_token": login.json()['refresh_token']})
+        assert refreshed.status_code == 200, f"Error: {refreshed.text}"
+        headers = {"Authorization": f"Bearer {refreshed.json()['access_token']}"}
+
+        assert async_client.delete(f"/users/{user_id}", headers=headers).status_code == 204
+        assert async_client.get(f"/users/{user_id}", headers=headers).status_code == 401
@@ -0,0 +1,205 @@
+import asyncio
+import json
+
+from app.core.config import settings
+from app.repositories.user_respository import UserRepository
+from app.services.user_service import UserService
+from app.utils.bulk import BATCH_FAILED, import_report, iter_csv_records, iter_lines
+from test.conftest import TEST_USER, TestingSessionLocal
+
+
+def post_bulk(test_client, token, body, content_type):
+    return test_client.post(
+        "/users/bulk",
+        content=body,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": content_type},
+    )
+
+
+def read_report(response):
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]['summary']
+
+
+class TestBulkImport:
+
+    def test_ndjson_import(self, superuser_token, test_client):
+        rows = [
+            {"email": "bulk1@prueba.com", "username": "bulkuser1", "password": "bulkpassword"},
+            {"email": TEST_USER['email'], "username": "bulkuser2", "password": "bulkpassword"},
+            {"email": "bulk3@prueba.com", "username": "bulkuser3", "password": "short"},
+            {"email": "bulk4@prueba.com", "username": "bulkuser1", "password": "bulkpassword"},
+        ]
+        body = "\n".join(json.dumps(row) for row in rows) + "\n{not json\n"
+        response = post_bulk(test_client, superuser_token, body, "application/x-ndjson")
+        assert response.status_code == 200, f"Error: {response.text}"
+        results, summary = read_report(response)
+
+        assert [result['status'] for result in results] == ["created", "error", "error", "error", "error"]
+        assert "email" in results[1]['detail']
+        assert "password" in results[2]['detail']
+        assert "username" in results[3]['detail']
+        assert summary == {"created": 1, "failed": 4}
+
+        login = test_client.post("/auth/login", data={"username": "bulkuser1", "password": "bulkpassword"})
+        assert login.status_code == 200
+
+
+    def test_csv_import(self, superuser_token, test_client):
+        body = (
+            "username,email,password,address\n"
+            "csvuser1,csv1@prueba.com,csvpassword,Calle 1\n"
+            "csvuser2,csv2@prueba.com,csvpassword,\n"
+            "csvuser3,csv3@prueba.com\n"
+        )
+        response = post_bulk(test_client, superuser_token, body, "text/csv")
+        results, summary = read_report(response)
+        assert [result['status'] for result in results] == ["created", "created", "error"]
+        assert summary == {"created": 2, "failed": 1}
+
+
+    def test_bad_lines_are_row_errors(self, superuser_token, test_client, monkeypatch):
+        monkeypatch.setattr(settings, "BULK_IMPORT_MAX_LINE_BYTES", 200)
+        good = {"email": "bom@prueba.com", "username": "bomuser", "password": "bompassword"}
+        body = (
+            b"\xef\xbb\xbf" + json.dumps(good).encode() + b"\n"
+            + b'{"username": "\xff"}\n'
+            + b'{"padding": "' + b"x" * 300 + b'"}\n'
+            + b"\xef\xbb\xbf{}\n"
+        )
+        response = post_bulk(test_client, superuser_token, body, "application/x-ndjson")
+        assert response.status_code == 200, f"Error: {response.text}"
+        results, summary = read_report(response)
+        assert [result['status'] for result in results] == ["created", "error", "error", "error"]
+        assert results[1]['detail'] == "Invalid UTF-8"
+        assert results[2]['detail'] == "Line longer than 200 bytes"
+        # el BOM solo se quita de la primera línea
+        assert "Invalid JSON" in results[3]['detail']
+        assert summary == {"created": 1, "failed": 3}
+
+
+    def test_csv_quoted_fields_span_lines(self, superuser_token, test_client):
+        body = (
+            'username,email,password,address\n'
+            'csvmulti1,csvmulti1@prueba.com,csvpassword,"Calle 1\nPiso 2, ""B"""\n'
+            'csvmulti2,csvmulti2@prueba.com,csvpassword,"Calle 2\n'
+            '\n'
+            'Piso 3"\n'
+            'csvmulti3,csvmulti3@prueba.com,csvpassword,"sin cerrar\n'
+        )
+        response = post_bulk(test_client, superuser_token, body, "text/csv")
+        results, summary = read_report(response)
+        assert [result['status'] for result in results] == ["created", "created", "error"]
+        assert results[2]['detail'] == "Unterminated quoted field"
+        assert summary == {"created": 2, "failed": 1}
+
+        user = test_client.get(
+            f"/users/{results[0]['id']}", headers={"Authorization": f"Bearer {superuser_token}"}
+        ).json()
+        assert user['address'] == 'Calle 1\nPiso 2, "B"'
+
+
+    def test_concurrent_insert_fails_only_its_row(self, test_client, monkeypatch):
+        test_client.post("/users/", json=TEST_USER)
+        with TestingSessionLocal() as db:
+            repository = UserRepository(db)
+            checked = repository.get_existing_identities
+            calls = []
+
+            def stale_first_check(usernames, emails):
+                # La primera consulta no ve el usuario: como si se hubiera creado justo después
+                calls.append(usernames)
+                return (set(), set()) if len(calls) == 1 else checked(usernames, emails)
+
+            monkeypatch.setattr(repository, "get_existing_identities", stale_first_check)
+            results = UserService(repository).import_users([
+                (1, {"email": TEST_USER['email'], "username": "racinguser1", "password": "racingpassword"}),
+                (2, {"email": "racing2@prueba.com", "username": "racinguser2", "password": "racingpassword"}),
+            ])
+        assert len(calls) == 2
+        assert results[0] == {"row": 1, "status": "error",
+                              "detail": f"User with email '{TEST_USER['email']}' already exists"}
+        assert results[1]['status'] == "created"
+
+
+    def test_requires_superuser(self, auth_token, test_client):
+        response = post_bulk(test_client, auth_token, "", "application/x-ndjson")
+        assert response.status_code == 403
+
+
+    def test_unsupported_content_type(self, superuser_token, test_client):
+        response = post_bulk(test_client, superuser_token, "{}", "application/xml")
+        assert response.status_code == 415
+
+
+class TestImportReport:
+
+    def test_reports_each_batch_before_reading_the_rest(self):
+        read = []
+
+        async def rows():
+            for row in range(1, 6):
+                read.append(row)
+                yield row, {"row": row}
+
+        async def import_batch(batch):
+            return [{"row": row, "status": "created" if row % 2 else "error"} for row, _ in batch]
+
+        async def scenario():
+            chunks = []
+            async for chunk in import_report(rows(), import_batch, 2):
+                chunks.append((chunk, list(read)))
+            return chunks
+
+        chunks = asyncio.run(scenario())
+        # el reporte del primer lote sale antes de leer la fila 3
+        assert [seen for _, seen in chunks] == [[1, 2], [1, 2, 3, 4], [1, 2, 3, 4, 5], [1, 2, 3, 4, 5]]
+        lines = [json.loads(line) for chunk, _ in chunks for line in chunk.decode().splitlines()]
+        assert [line.get("row") for line in lines[:-1]] == [1, 2, 3, 4, 5]
+        assert lines[-1] == {"summary": {"created": 3, "failed": 2}}
+
+
+    def test_failed_batch_is_reported_and_import_goes_on(self):
+        async def rows():
+            for row in range(1, 6):
+                yield row, {"row": row}
+
+        async def import_batch(batch):
+            if batch[0][0] == 3:
+                raise ConnectionError("server closed the connection unexpectedly")
+            return [{"row": row, "status": "created"} for row, _ in batch]
+
+        async def scenario():
+            return b"".join([chunk async for chunk in import_report(rows(), import_batch, 2)])
+
+        lines = [json.loads(line) for line in asyncio.run(scenario()).decode().splitlines()]
+        assert [line.get("status") for line in lines[:-1]] == ["created", "created", "error", "error", "created"]
+        assert lines[2]['detail'] == BATCH_FAILED
+        assert lines[-1] == {"summary": {"created": 3, "failed": 2}}
+
+
+class TestIterLines:
+
+    def test_lines_split_across_chunks(self):
+        async def chunks():
+            for chunk in (b"ab", b"c\nd", b"\xc3", b"\xa9\r\n", b"x" * 5, b"x" * 5, b"\nlast"):
+                yield chunk
+
+        async def scenario():
+            return [line async for line in iter_lines(chunks(), 8)]
+
+        assert asyncio.run(scenario()) == [
+            ("abc", None), ("d\u00e9", None), (None, "Line longer than 8 bytes"), ("last", None),
+        ]
+
+
+    def test_csv_record_size_is_bounded(self):
+        async def chunks():
+            yield b'a,"open\n' + b"line\n" * 10 + b'end"\nb,c\n'
+
+        async def scenario():
+            return [record async for record in iter_csv_records(chunks(), 20)]
+
+        records = asyncio.run(scenario())
+        assert records[0] == (None, "Record longer than 20 bytes")
+        assert records[-1] == (["b", "c"], None)
@@ -0,0 +1,118 @@
+import gzip
+import importlib.util
+import json
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, codec, compression_input_bytes, negotiate
+
+PAYLOAD = json.dumps([{"id": i, "username": f"user{i}", "email": f"user{i}@prueba.com"} for i in range(100)])
+
+
+def compressed_client(minimum_size=500):
+    app = FastAPI()
+
+    @app.get("/json")
+    def json_body():
+        return Response(PAYLOAD, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small_body():
+        return Response('{"ok": true}', media_type="application/json")
+
+    @app.get("/png")
+    def png_body():
+        return Response(PAYLOAD.encode(), media_type="image/png")
+
+    @app.get("/not-modified")
+    def not_modified():
+        return Response(status_code=304, headers={"ETag": 'W/"v1"'})
+
+    @app.get("/stream")
+    def stream_body():
+        lines = (json.dumps({"row": i}) + "\n" for i in range(1000))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    app.add_middleware(
+        CompressionMiddleware, codecs={"gzip": codec("gzip", 6)}, minimum_size=minimum_size,
+        content_types=("application/json", "application/x-ndjson"),
+    )
+    return TestClient(app)
+
+
+def raw_get(client, url, accept_encoding="gzip"):
+    with client.stream("GET", url, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+class TestCompressionMiddleware:
+
+    def test_compresses_json_and_weakens_etag(self):
+        before = compression_input_bytes.labels("gzip").value
+        response, raw = raw_get(compressed_client(), "/json")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == 'W/"v1"'
+        assert int(response.headers["content-length"]) == len(raw) < len(PAYLOAD)
+        assert gzip.decompress(raw).decode() == PAYLOAD
+        assert compression_input_bytes.labels("gzip").value - before == len(PAYLOAD)
+
+
+    def test_skips_small_other_types_and_304(self):
+        client = compressed_client()
+        small, _ = raw_get(client, "/small")
+        assert "content-encoding" not in small.headers
+        assert small.headers["vary"] == "Accept-Encoding"
+        png, raw = raw_get(client, "/png")
+        assert "content-encoding" not in png.headers and raw == PAYLOAD.encode()
+        not_modified, _ = raw_get(client, "/not-modified")
+        assert not_modified.status_code == 304 and "content-encoding" not in not_modified.headers
+
+
+    def test_respects_accept_encoding(self):
+        client = compressed_client()
+        for accept_encoding in ("identity", "gzip;q=0", "br"):
+            response, raw = raw_get(client, "/json", accept_encoding)
+            assert "content-encoding" not in response.headers
+            assert raw.decode() == PAYLOAD
+        response, _ = raw_get(client, "/json", "br;q=1, *;q=0.5")
+        assert response.headers["content-encoding"] == "gzip"
+
+
+    def test_streaming_response(self):
+        response, raw = raw_get(compressed_client(), "/stream")
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        lines = gzip.decompress(raw).decode().splitlines()
+        assert len(lines) == 1000 and json.loads(lines[-1]) == {"row": 999}
+
+
+    def test_app_lists_compressed(self, auth_token, test_client):
+        for i in range(20):
+            test_client.post("/users/", json={
+                "email": f"gzip{i}@prueba.com", "username": f"gzipuser{i}", "password": "gzippassword",
+            })
+        response = test_client.get(
+            "/users/?limit=50", headers={"Authorization": f"Bearer {auth_token}", "Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["data"]) == 21
+
+
+class TestNegotiation:
+
+    def test_server_preference_breaks_ties(self):
+        assert negotiate("gzip, br", ("br", "gzip")) == "br"
+        assert negotiate("gzip, br;q=0.5", ("br", "gzip")) == "gzip"
+        assert negotiate("*", ("zstd", "gzip")) == "zstd"
+        assert negotiate("deflate", ("gzip",)) is None
+
+
+    @pytest.mark.skipif(importlib.util.find_spec("brotli") is not None, reason="brotli is installed")
+    def test_missing_optional_package(self):
+        with pytest.raises(RuntimeError, match="brotli"):
+            codec("br", 4)
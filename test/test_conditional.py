@@ -0,0 +1,111 @@
+import pytest
+
+from app.core.instrumentation import sql_trace
+from app.utils.cache import Cache, InMemoryCache, SharedStoreCache, response_cache
+from app.utils.conditional import etag_matches
+from test.conftest import TEST_USER
+
+
+@pytest.fixture
+def auth(test_client):
+    created = test_client.post("/users/", json=TEST_USER).json()
+    login = test_client.post(
+        "/auth/login", data={"username": TEST_USER['username'], "password": TEST_USER['password']}
+    )
+    return created['id'], {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+@pytest.fixture(params=["memory", "shared"])
+def server_cache(request, monkeypatch, fake_redis):
+    """Cache de respuestas habilitada, en memoria o en el store compartido"""
+    backend = InMemoryCache() if request.param == "memory" else SharedStoreCache(fake_redis, prefix="response:")
+    monkeypatch.setattr(response_cache, "cache", Cache("response", backend, 30))
+    return response_cache
+
+
+def _queries(test_client, url, headers):
+    reports = []
+    sql_trace.subscribe(reports.append)
+    try:
+        response = test_client.get(url, headers=headers)
+    finally:
+        sql_trace.unsubscribe(reports.append)
+    return response, reports[-1].queries
+
+
+class TestEtagMatching:
+
+    def test_weak_comparison(self):
+        assert etag_matches('W/"abc"', 'W/"abc"')
+        assert etag_matches('"abc"', 'W/"abc"')
+        assert etag_matches('W/"xyz", W/"abc"', 'W/"abc"')
+        assert etag_matches('*', 'W/"abc"')
+        assert not etag_matches('W/"xyz"', 'W/"abc"')
+        assert not etag_matches(None, 'W/"abc"')
+
+
+class TestConditionalGet:
+
+    @pytest.mark.parametrize("path", ["/users/{id}", "/users/email/" + TEST_USER['email'], "/users/?limit=10"])
+    def test_revalidation_returns_304(self, test_client, auth, path):
+        user_id, headers = auth
+        url = path.format(id=user_id)
+        first = test_client.get(url, headers=headers)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+        assert first.headers["cache-control"] == "private, no-cache"
+
+        revalidated = test_client.get(url, headers={**headers, "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+
+
+    def test_update_changes_the_etag(self, test_client, auth):
+        user_id, headers = auth
+        etag = test_client.get(f"/users/{user_id}", headers=headers).headers["etag"]
+        assert test_client.put(f"/users/{user_id}", json={"address": "New address"}, headers=headers).status_code == 200
+
+        response = test_client.get(f"/users/{user_id}", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()['address'] == "New address"
+        assert "updated_at" not in response.json()
+        assert response.headers["etag"] != etag
+
+
+    def test_new_user_changes_the_page_etag(self, test_client, auth):
+        _, headers = auth
+        etag = test_client.get("/users/?limit=10", headers=headers).headers["etag"]
+        test_client.post("/users/", json={"email": "other@prueba.com", "username": "otheruser", "password": "otherpass"})
+        response = test_client.get("/users/?limit=10", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()['metadata']['total_count'] == 2
+
+
+class TestResponseCache:
+
+    def test_repeat_reads_skip_the_database(self, test_client, auth, server_cache):
+        user_id, headers = auth
+        first, _ = _queries(test_client, f"/users/{user_id}", headers)
+        cached, queries = _queries(test_client, f"/users/{user_id}", headers)
+        assert queries == 0
+        assert cached.content == first.content
+        assert cached.headers["etag"] == first.headers["etag"]
+
+        revalidated = test_client.get(f"/users/{user_id}", headers={**headers, "If-None-Match": first.headers["etag"]})
+        assert revalidated.status_code == 304
+
+
+    def test_writes_invalidate_cached_reads(self, test_client, auth, server_cache):
+        user_id, headers = auth
+        test_client.get(f"/users/{user_id}", headers=headers)
+        test_client.get("/users/?limit=10", headers=headers)
+
+        test_client.put(f"/users/{user_id}", json={"address": "Cached address"}, headers=headers)
+        assert test_client.get(f"/users/{user_id}", headers=headers).json()['address'] == "Cached address"
+
+        test_client.post("/users/", json={"email": "other@prueba.com", "username": "otheruser", "password": "otherpass"})
+        page, queries = _queries(test_client, "/users/?limit=10", headers)
+        assert queries > 0
+        assert page.json()['metadata']['total_count'] == 2
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.core.config import Settings, get_settings, settings
+from app.utils.token import Token
+
+ENV = {"SECRET_KEY": "secret"}
+
+
+class TestSettings:
+
+    def test_values_are_parsed(self):
+        parsed = Settings.from_env({
+            **ENV, "DB_PORT": "5433", "DB_ASYNC": "yes", "PRINCIPAL_CACHE_TTL": "2.5", "UNRELATED": "x",
+        })
+        assert parsed.DB_PORT == 5433
+        assert parsed.DB_ASYNC is True
+        assert parsed.PRINCIPAL_CACHE_TTL == 2.5
+
+    @pytest.mark.parametrize("name, value", [
+        ("DB_POOL_SIZE", "0"), ("HASH_POOL_KIND", "fork"), ("BCRYPT_ROUNDS", "3"), ("DB_PORT", "abc"),
+    ])
+    def test_invalid_values_fail_at_load(self, name, value):
+        with pytest.raises(ValidationError):
+            Settings.from_env({**ENV, name: value})
+
+    def test_secret_key_is_required(self):
+        with pytest.raises(ValidationError):
+            Settings.from_env({})
+
+    def test_database_uri_escapes_credentials(self):
+        parsed = Settings.from_env({
+            **ENV, "DB_USER": "app", "DB_PASSWORD": "p@ss/word", "DB_HOST": "db", "DB_PORT": "5432", "DB_NAME": "users",
+        })
+        assert parsed.SQLALCHEMY_DATABASE_URI == "postgresql+psycopg2://app:p%40ss%2Fword@db:5432/users"
+        assert parsed.SQLALCHEMY_ASYNC_DATABASE_URI.startswith("postgresql+asyncpg://app:p%40ss%2Fword@")
+
+    def test_settings_are_built_once(self):
+        assert get_settings() is get_settings()
+        assert settings is get_settings()
+
+    def test_token_expiration_setting(self, monkeypatch):
+        monkeypatch.setattr(settings, "ACCESS_TOKEN_EXPIRE_MINUTES", 5)
+        claims = Token.decode_token(Token.generate_token({"sub": "user"}), HTTPException(status_code=401))
+        assert abs(claims["exp"] - (time.time() + 300)) < 5
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, exc, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.database import Base, Database
+from app.db.initialize_db import create_superuser
+from app.models.user import User
+from app.db.pool import engine_options, instrument_pool, pool_in_use, pool_timeouts
+from app.server import hash_workers_per_process, server_options
+
+DB_PATH = os.path.join(os.path.dirname(__file__), 'test_pool.db')
+
+
+class TestConnectionPool:
+
+    def test_statement_timeout_connect_args(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 5000)
+        sync_options = engine_options("postgresql+psycopg2://u:p@localhost/db")
+        async_options = engine_options("postgresql+asyncpg://u:p@localhost/db", is_async=True)
+        assert sync_options["connect_args"] == {"options": "-c statement_timeout=5000"}
+        assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+        assert "connect_args" not in engine_options(f"sqlite:///{DB_PATH}")
+
+
+    def test_pool_saturation(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+        monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 0)
+        monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 0.1)
+        url = f"sqlite:///{DB_PATH}"
+        engine = create_engine(url, **engine_options(url))
+        instrument_pool(engine)
+        in_use = pool_in_use.value
+        timeouts = pool_timeouts.value
+        try:
+            held = engine.connect()
+            assert pool_in_use.value == in_use + 1
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+            assert pool_timeouts.value == timeouts + 1
+            held.close()
+            assert pool_in_use.value == in_use
+        finally:
+            engine.dispose()
+            if os.path.exists(DB_PATH):
+                os.remove(DB_PATH)
+
+
+class TestDatabaseLifecycle:
+
+    def test_engine_is_created_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{DB_PATH}")
+        database = Database()
+        assert database._engine is None
+        try:
+            session = next(database.get_db())
+            assert session.execute(text("SELECT 1")).scalar() == 1
+            session.close()
+            assert database.engine is database._engine
+        finally:
+            asyncio.run(database.dispose())
+            if os.path.exists(DB_PATH):
+                os.remove(DB_PATH)
+
+    def test_reset_after_fork_keeps_engine_usable(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{DB_PATH}")
+        database = Database()
+        try:
+            with database.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            pool = database.engine.pool
+            database.reset_after_fork()
+            assert database.engine.pool is not pool
+            with database.engine.connect() as conn:
+                assert conn.execute(text("SELECT 1")).scalar() == 1
+        finally:
+            asyncio.run(database.dispose())
+            if os.path.exists(DB_PATH):
+                os.remove(DB_PATH)
+
+    def test_async_engine_requires_async_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_ASYNC", False)
+        with pytest.raises(RuntimeError):
+            Database().async_engine
+
+
+class TestServer:
+
+    def test_server_options(self, monkeypatch):
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 0)
+        monkeypatch.setattr(settings, "SERVER_KEEP_ALIVE", 15)
+        options = server_options()
+        assert options["workers"] == 1
+        assert options["timeout_keep_alive"] == 15
+        assert options["timeout_graceful_shutdown"] == settings.SERVER_GRACEFUL_TIMEOUT
+
+    def test_hash_workers_split_cpus(self, monkeypatch):
+        monkeypatch.setattr(os, "cpu_count", lambda: 8)
+        assert hash_workers_per_process(4) == 2
+        assert hash_workers_per_process(16) == 1
+
+
+class TestStartup:
+
+    def test_import_has_no_side_effects(self):
+        code = (
+            "import app.core.config as config\n"
+            "assert 'settings' not in vars(config)\n"
+            "import main\n"
+            "from app.db.database import db\n"
+            "assert db._engine is None\n"
+        )
+        root = os.path.join(os.path.dirname(__file__), '..')
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == ""
+
+    def test_create_superuser_is_idempotent(self, monkeypatch):
+        monkeypatch.setattr(settings, "SUPERUSER_USERNAME", "root")
+        monkeypatch.setattr(settings, "SUPERUSER_EMAIL", "root@example.com")
+        monkeypatch.setattr(settings, "SUPERUSER_PASS", "rootpassword")
+        engine = create_engine(f"sqlite:///{DB_PATH}")
+        Base.metadata.create_all(bind=engine)
+        session_local = sessionmaker(bind=engine)
+        try:
+            assert create_superuser(session_local) is True
+            assert create_superuser(session_local) is False
+            with session_local() as session:
+                assert session.scalars(select(User.username).where(User.is_superuser.is_(True))).all() == ["root"]
+        finally:
+            engine.dispose()
+            if os.path.exists(DB_PATH):
+                os.remove(DB_PATH)
+
+    def test_create_superuser_requires_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "SUPERUSER_PASS", None)
+        assert create_superuser() is False
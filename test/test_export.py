@@ -0,0 +1,32 @@
+import csv
+import io
+import json
+
+from test.conftest import TEST_USER
+
+
+class TestExport:
+
+    def test_ndjson_export(self, superuser_token, test_client):
+        test_client.post("/users/", json={"email": "export@prueba.com", "username": "exportuser", "password": "exportpassword"})
+        response = test_client.get("/users/export", headers={"Authorization": f"Bearer {superuser_token}"})
+        assert response.status_code == 200, f"Error: {response.text}"
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row['username'] for row in rows] == [TEST_USER['username'], "exportuser"]
+        assert set(rows[0]) == {"id", "username", "email", "address"}
+
+
+    def test_csv_export(self, superuser_token, test_client):
+        response = test_client.get(
+            "/users/export", params={"format": "csv"}, headers={"Authorization": f"Bearer {superuser_token}"}
+        )
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert response.headers["content-type"].startswith("text/csv")
+        assert rows[0]['email'] == TEST_USER['email']
+        assert 'password' not in rows[0]
+
+
+    def test_requires_superuser(self, auth_token, test_client):
+        response = test_client.get("/users/export", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.status_code == 403
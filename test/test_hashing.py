@@ -0,0 +1,201 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from passlib.hash import bcrypt
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedError
+from app.models.user import User
+from app.utils import hashing
+from app.utils.hashing import (
+    Hasher, HashingPool, apply_calibration, calibrate, configure_policy, context_config, hashing_pool,
+    password_rehash, pwd_context,
+)
+from test.conftest import TestingSessionLocal
+
+USER = {
+    "email": "hash@prueba.com",
+    "username": "hashusername",
+    "password": "hashpassword",
+}
+
+
+class TestHashingPool:
+
+    def test_async_hash_and_verify(self):
+        async def scenario():
+            hashed = await Hasher.get_password_hash_async("secret-password")
+            return await Hasher.verify_password_async("secret-password", hashed)
+
+        assert asyncio.run(scenario())
+
+
+    def test_rejects_when_saturated(self):
+        pool = HashingPool(kind="thread", max_workers=1, queue_size=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return True
+
+        running = threading.Thread(target=pool.run_sync, args=(blocking,))
+        queued = threading.Thread(target=pool.run_sync, args=(blocking,))
+        running.start()
+        started.wait(5)
+        queued.start()
+        # Esperar a que el segundo job quede encolado
+        for _ in range(100):
+            if pool.queue_depth.value == 1:
+                break
+            threading.Event().wait(0.01)
+        assert pool.queue_depth.value == 1
+
+        rejected_before = pool.rejected.value
+        with pytest.raises(ServiceOverloadedError):
+            pool.run_sync(blocking)
+        assert pool.rejected.value == rejected_before + 1
+
+        release.set()
+        running.join()
+        queued.join()
+        pool.shutdown()
+        assert pool.in_flight.value == 0
+
+
+    def test_batches_wait_instead_of_failing(self):
+        pool = HashingPool(kind="thread", max_workers=1, queue_size=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return True
+
+        # Un login ocupa el worker: el lote espera en lugar de devolver ServiceOverloadedError
+        running = threading.Thread(target=pool.run_sync, args=(blocking,))
+        running.start()
+        started.wait(5)
+        results = []
+        batch = threading.Thread(target=lambda: results.extend(pool.map_sync(str.upper, [("a",), ("b",)])))
+        batch.start()
+        batch.join(0.1)
+        assert batch.is_alive() and not results
+        release.set()
+        batch.join(5)
+        running.join()
+        assert results == ["A", "B"]
+
+        release.clear()
+        started.clear()
+
+        async def scenario():
+            login = asyncio.create_task(pool.run(blocking))
+            await asyncio.sleep(0.05)
+            mapped = asyncio.create_task(pool.map(str.upper, [("c",), ("d",)]))
+            await asyncio.sleep(0.05)
+            assert not mapped.done()
+            # el lugar en la cola sigue libre para requests interactivos
+            assert pool.queue_depth.value == 0
+            release.set()
+            await login
+            return await mapped
+
+        assert asyncio.run(scenario()) == ["C", "D"]
+        pool.shutdown()
+        assert pool.in_flight.value == 0
+
+
+    def test_create_user_returns_503_when_overloaded(self, test_client, monkeypatch):
+        monkeypatch.setattr(hashing_pool, "max_workers", 0)
+        monkeypatch.setattr(hashing_pool, "queue_size", 0)
+        response = test_client.post("/users/", json=USER)
+        assert response.status_code == 503, f"Error: {response.json()}"
+        assert response.headers["Retry-After"] == "1"
+
+
+def _stored_hash(username: str) -> str:
+    with TestingSessionLocal() as db:
+        return db.scalar(select(User.password).where(User.username == username))
+
+
+def _set_stored_hash(username: str, hashed: str) -> None:
+    with TestingSessionLocal() as db:
+        db.execute(update(User).where(User.username == username).values(password=hashed))
+        db.commit()
+
+
+class TestPasswordPolicy:
+
+    def test_calibrate_extrapolates_from_the_floor(self):
+        # 10 ms a costo 10: cada unidad duplica el tiempo, 80 ms alcanzan para 3 unidades más
+        assert calibrate("bcrypt", 0.08, measure=lambda scheme, rounds: 0.01) == 13
+        assert calibrate("bcrypt", 0.005, measure=lambda scheme, rounds: 0.01) == 10
+        assert calibrate("bcrypt", 1e9, measure=lambda scheme, rounds: 0.01) == 31
+        # argon2 crece linealmente con las pasadas
+        assert calibrate("argon2", 0.1, measure=lambda scheme, rounds: 0.02) == 10
+
+
+    def test_calibration_never_lowers_the_configured_cost(self, monkeypatch, caplog):
+        # Ningún costo entra en 1 ms: la calibración da el mínimo (10), debajo de BCRYPT_ROUNDS
+        monkeypatch.setattr(settings, "PASSWORD_HASH_TARGET_MS", 1)
+        with caplog.at_level(logging.WARNING, logger="app.utils.hashing"):
+            assert apply_calibration() == settings.BCRYPT_ROUNDS
+        assert "keeping the configured cost" in caplog.text
+        assert hashing.current_policy() == (settings.PASSWORD_SCHEME, settings.BCRYPT_ROUNDS)
+
+
+    def test_process_pool_gets_the_policy(self, monkeypatch):
+        # spawn: los procesos importan de nuevo el módulo con la política de settings
+        monkeypatch.setattr(hashing, "ProcessPoolExecutor", functools.partial(
+            ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")
+        ))
+        configure_policy(settings.PASSWORD_SCHEME, 5)
+        pool = HashingPool(kind="process", max_workers=1)
+        try:
+            assert pool.run_sync(Hasher.get_password_hash, "secret-password").startswith("$2b$05$")
+        finally:
+            pool.shutdown()
+            configure_policy(settings.PASSWORD_SCHEME, settings.BCRYPT_ROUNDS)
+
+
+    def test_unavailable_scheme_fails(self):
+        with pytest.raises(ValueError):
+            context_config("md5_crypt", 10)
+
+
+    def test_login_rehashes_a_cheaper_hash(self, test_client):
+        test_client.post("/users/", json=USER)
+        _set_stored_hash(USER['username'], bcrypt.using(rounds=4).hash(USER['password']))
+        rehashed = password_rehash.value
+
+        login = {"username": USER['username'], "password": USER['password']}
+        assert test_client.post("/auth/login", data=login).status_code == 200
+        assert _stored_hash(USER['username']).startswith(f"$2b${settings.BCRYPT_ROUNDS}$")
+        assert password_rehash.value == rehashed + 1
+
+        # El hash ya está al día: el siguiente login no vuelve a escribirlo
+        stored = _stored_hash(USER['username'])
+        assert test_client.post("/auth/login", data=login).status_code == 200
+        assert _stored_hash(USER['username']) == stored
+
+
+    def test_login_migrates_to_the_new_scheme(self, test_client):
+        test_client.post("/users/", json=USER)
+        configure_policy("scrypt", 10)
+        try:
+            assert pwd_context.needs_update(_stored_hash(USER['username']))
+            login = {"username": USER['username'], "password": USER['password']}
+            assert test_client.post("/auth/login", data=login).status_code == 200
+            assert _stored_hash(USER['username']).startswith("$scrypt$ln=10,")
+            assert test_client.post("/auth/login", data=login).status_code == 200
+        finally:
+            configure_policy(settings.PASSWORD_SCHEME, settings.BCRYPT_ROUNDS)
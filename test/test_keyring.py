@@ -0,0 +1,96 @@
+import base64
+import hashlib
+import hmac
+import json
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi import HTTPException
+from jose import jwt
+
+from app.api.v1.endpoints import jwks as jwks_module
+from app.utils import token as token_module
+from app.utils.keyring import KeyRing
+from app.utils.token import Token
+
+CLAIMS = {"sub": "keyuser", "id": 7, "is_superuser": False, "active": True}
+INVALID = HTTPException(status_code=401)
+
+
+def write_private(path, key):
+    path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+
+
+def write_public(path, key):
+    path.write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ))
+
+
+@pytest.fixture
+def keys_dir(tmp_path):
+    """Directorio con una clave RSA retirada (solo pública) y dos privadas, RSA y EC"""
+    retired = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    write_public(tmp_path / "2025-12.pem", retired)
+    write_private(tmp_path / "2026-01.pem", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    write_private(tmp_path / "2026-06.pem", ec.generate_private_key(ec.SECP256R1()))
+    return tmp_path
+
+
+def use_ring(monkeypatch, ring):
+    monkeypatch.setattr(token_module, "get_key_ring", lambda: ring)
+    monkeypatch.setattr(jwks_module, "get_key_ring", lambda: ring)
+
+
+class TestKeyRing:
+
+    def test_tokens_carry_the_active_kid(self, keys_dir, monkeypatch):
+        ring = KeyRing.from_directory(str(keys_dir), "2026-06")
+        use_ring(monkeypatch, ring)
+        token = Token.generate_token(CLAIMS)
+        assert jwt.get_unverified_header(token) == {"alg": "ES256", "kid": "2026-06", "typ": "JWT"}
+        assert Token.verify_token(token, INVALID).username == CLAIMS['sub']
+
+
+    def test_rotation_keeps_old_tokens_valid(self, keys_dir, monkeypatch):
+        use_ring(monkeypatch, KeyRing.from_directory(str(keys_dir), "2026-01"))
+        token = Token.generate_token(CLAIMS)
+        use_ring(monkeypatch, KeyRing.from_directory(str(keys_dir), "2026-06"))
+        assert Token.verify_token(token, INVALID).id == CLAIMS['id']
+        (keys_dir / "2026-01.pem").unlink()
+        use_ring(monkeypatch, KeyRing.from_directory(str(keys_dir), "2026-06"))
+        with pytest.raises(HTTPException):
+            Token.verify_token(token, INVALID)
+
+
+    def test_algorithm_confusion_is_rejected(self, keys_dir, monkeypatch):
+        use_ring(monkeypatch, KeyRing.from_directory(str(keys_dir), "2026-01"))
+        public_pem = (keys_dir / "2025-12.pem").read_text()
+        # HS256 firmado con la clave pública como secreto
+        encode = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=")
+        signing_input = encode({"alg": "HS256", "kid": "2025-12"}) + b"." + encode({**CLAIMS, "exp": 4102444800})
+        signature = hmac.new(public_pem.encode(), signing_input, hashlib.sha256).digest()
+        forged = (signing_input + b"." + base64.urlsafe_b64encode(signature).rstrip(b"=")).decode()
+        with pytest.raises(HTTPException):
+            Token.verify_token(forged, INVALID)
+
+
+    def test_signing_key_must_be_unambiguous(self, keys_dir):
+        with pytest.raises(ValueError):
+            KeyRing.from_directory(str(keys_dir))
+        with pytest.raises(ValueError):
+            KeyRing.from_directory(str(keys_dir), "2025-12")
+
+
+    def test_jwks_endpoint(self, keys_dir, monkeypatch, test_client):
+        assert test_client.get("/.well-known/jwks.json").json() == {"keys": []}
+        use_ring(monkeypatch, KeyRing.from_directory(str(keys_dir), "2026-06"))
+        response = test_client.get("/.well-known/jwks.json")
+        assert response.headers["cache-control"].startswith("public")
+        keys = {key["kid"]: key for key in response.json()["keys"]}
+        assert set(keys) == {"2025-12", "2026-01", "2026-06"}
+        assert keys["2026-06"]["alg"] == "ES256" and keys["2026-01"]["alg"] == "RS256"
+        assert all("d" not in key for key in keys.values())
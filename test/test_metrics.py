@@ -0,0 +1,74 @@
+import asyncio
+
+from app.core.instrumentation import http_request_queries
+from app.core.metrics import Histogram, MetricsRegistry, timed
+from test.conftest import TEST_USER
+
+
+class TestMetricsRegistry:
+
+    def test_histogram_exposition(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("op_seconds", "Operation time", ("op",), buckets=(0.1, 1.0))
+        histogram.labels("read").observe(0.05)
+        histogram.labels("read").observe(0.5)
+        histogram.labels("read").observe(3)
+
+        text = registry.render()
+        assert "# TYPE op_seconds histogram" in text
+        assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+        assert 'op_seconds_bucket{op="read",le="1.0"} 2' in text
+        assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+        assert 'op_seconds_count{op="read"} 3' in text
+
+
+    def test_labeled_counter_and_wrong_labels(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls", ("status",))
+        counter.labels("200").inc()
+        counter.labels("200").inc()
+        assert 'calls_total{status="200"} 2' in registry.render()
+        try:
+            counter.labels("200", "extra")
+        except ValueError:
+            return
+        raise AssertionError("labels with the wrong arity were accepted")
+
+
+    def test_timed_async_function(self):
+        histogram = Histogram("async_seconds", "Async op")
+
+        @timed(histogram)
+        async def work():
+            return 42
+
+        assert asyncio.run(work()) == 42
+        assert histogram.count == 1
+
+
+class TestMetricsEndpoint:
+
+    def test_request_metrics_exported(self, auth_token, test_client):
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        user_id = test_client.get("/users/", headers=headers).json()['data'][0]['id']
+        before = http_request_queries.labels("GET", "/users/{user_id}").count
+
+        response = test_client.get(f"/users/{user_id}", headers=headers)
+        assert response.status_code == 200
+        assert http_request_queries.labels("GET", "/users/{user_id}").count == before + 1
+
+        metrics_response = test_client.get("/metrics")
+        assert metrics_response.status_code == 200
+        assert metrics_response.headers["content-type"].startswith("text/plain")
+        text = metrics_response.text
+        assert 'http_requests_total{method="GET",route="/users/{user_id}",status="200"}' in text
+        assert 'http_request_db_queries_count{method="GET",route="/users/{user_id}"}' in text
+        assert 'repository_call_duration_seconds_count{repository="UserRepository",method="get"}' in text
+        assert 'password_hash_duration_seconds_count{operation="verify"}' in text
+        # El propio request a /metrics está en curso mientras se renderiza
+        assert "db_queries_total" in text and "http_requests_in_flight 1" in text
+
+
+    def test_unmatched_route_label(self, test_client):
+        test_client.get(f"/does-not-exist/{TEST_USER['username']}")
+        assert 'route="unmatched",status="404"' in test_client.get("/metrics").text
@@ -0,0 +1,111 @@
+from app.repositories.user_respository import RESPONSE_COLUMNS, UserRepository
+from app.services.user_service import validate_rows
+from test.conftest import TEST_USER, TestingSessionLocal
+
+
+def create_users(test_client, count):
+    for i in range(count):
+        test_client.post("/users/", json={
+            "email": f"page{i}@prueba.com",
+            "username": f"pageuser{i}",
+            "password": "pagepassword",
+        })
+
+
+class TestCursorPagination:
+
+    def test_cursor_walk(self, auth_token, test_client):
+        create_users(test_client, 2)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        first = test_client.get("/users/", params={"limit": 2, "mode": "cursor"}, headers=headers)
+        assert first.status_code == 200, f"Error: {first.json()}"
+        body = first.json()
+        assert [u['username'] for u in body['data']] == [TEST_USER['username'], "pageuser0"]
+        assert body['metadata']['total_count'] == 3
+        assert body['metadata']['next_cursor']
+
+        second = test_client.get(
+            "/users/", params={"limit": 2, "cursor": body['metadata']['next_cursor']}, headers=headers
+        )
+        assert second.status_code == 200, f"Error: {second.json()}"
+        assert [u['username'] for u in second.json()['data']] == ["pageuser1"]
+        assert second.json()['metadata']['next_cursor'] is None
+
+
+    def test_invalid_cursor(self, auth_token, test_client):
+        response = test_client.get(
+            "/users/", params={"cursor": "not-a-cursor"}, headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 400, f"Error: {response.json()}"
+
+
+    def test_offset_mode_unchanged(self, auth_token, test_client):
+        response = test_client.get("/users/", headers={"Authorization": f"Bearer {auth_token}"})
+        metadata = response.json()['metadata']
+        assert metadata['offset'] == 0 and metadata['current_page'] == 1 and metadata['total_pages'] == 1
+        assert metadata['next_cursor'] is None
+
+
+class TestCountModes:
+
+    def test_skip_total(self, auth_token, test_client):
+        response = test_client.get(
+            "/users/", params={"include_total": "false"}, headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        metadata = response.json()['metadata']
+        assert response.status_code == 200
+        assert metadata['total_count'] is None and metadata['total_pages'] is None
+        assert metadata['count_kind'] is None
+
+
+    def test_exact_total(self, auth_token, test_client):
+        create_users(test_client, 2)
+        response = test_client.get(
+            "/users/", params={"limit": 1, "offset": 5}, headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        metadata = response.json()['metadata']
+        # Página vacía: el total se obtiene con un COUNT aparte
+        assert response.json()['data'] == []
+        assert metadata['total_count'] == 3 and metadata['count_kind'] == "exact"
+
+
+    def test_cached_total_is_reused(self, auth_token, test_client):
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        first = test_client.get("/users/", params={"count": "cached"}, headers=headers).json()['metadata']
+        create_users(test_client, 1)
+        second = test_client.get("/users/", params={"count": "cached"}, headers=headers).json()['metadata']
+        assert first['count_kind'] == "exact" and first['total_count'] == 1
+        assert second['count_kind'] == "cached" and second['total_count'] == 1
+
+
+    def test_estimated_falls_back_to_exact(self, auth_token, test_client):
+        response = test_client.get(
+            "/users/", params={"count": "estimated", "mode": "cursor"}, headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        # SQLite no tiene estadísticas del planner
+        assert response.json()['metadata']['count_kind'] == "exact"
+        assert response.json()['metadata']['total_count'] == 1
+
+
+class TestProjection:
+
+    def test_list_reads_skip_private_columns(self, auth_token, test_client):
+        create_users(test_client, 2)
+        with TestingSessionLocal() as db:
+            repo = UserRepository(db)
+            rows, count = repo.get_all_with_count(10, 0)
+            assert count == 3
+            assert all(row._fields == RESPONSE_COLUMNS + ("total_count",) for row in rows)
+            assert "password" not in repo.get_after(None, 10)[0]._fields
+            assert not db.identity_map
+            users = validate_rows(rows)
+            assert [user.id for user in users] == [row.id for row in rows]
+            assert not hasattr(users[0], "total_count")
+
+
+    def test_detail_read_includes_account_flags(self, auth_token):
+        with TestingSessionLocal() as db:
+            user = UserRepository(db).get_user_by_email(TEST_USER['email'])
+            assert user.username == TEST_USER['username'] and user.active is True
+            assert not hasattr(user, "password")
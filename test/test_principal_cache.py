@@ -0,0 +1,110 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings, settings
+from app.schemas.token import TokenData
+from app.utils.cache import (
+    Cache, InMemoryCache, PrincipalCache, SharedStoreCache, principal_cache
+)
+
+USER = {
+    "email": "cache@prueba.com",
+    "username": "cacheusername",
+    "password": "cachepassword",
+    "address": "cache address"
+}
+
+
+def login(test_client):
+    new_user = test_client.post("/users/", json=USER)
+    res = test_client.post("/auth/login", data={"username": USER['username'], "password": USER['password']})
+    return new_user.json()['id'], {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+class TestInMemoryCache:
+
+    def test_ttl_expiry(self):
+        now = [0.0]
+        cache = InMemoryCache(max_size=10, clock=lambda: now[0])
+        cache.set("a", 1, ttl=5)
+        assert cache.get("a") == 1
+        now[0] = 5.0
+        assert cache.get("a") is None
+
+
+    def test_lru_bound(self):
+        cache = InMemoryCache(max_size=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert len(cache) == 2
+
+
+class TestPrincipalCache:
+
+    def test_shared_backend_roundtrip(self, fake_redis):
+        cache = PrincipalCache(Cache("test_principal", SharedStoreCache(fake_redis, prefix="p:"), ttl=30))
+        principal = TokenData(id=7, username="shared", is_superuser=False, active=True)
+        cache.set(principal)
+        assert cache.get(7) == principal
+        fake_redis.advance(31)
+        assert cache.get(7) is None
+        cache.set(principal)
+        cache.invalidate(7)
+        assert cache.get(7) is None
+
+
+    def test_read_before_invalidation_is_not_served(self, fake_redis):
+        cache = PrincipalCache(Cache("test_principal", SharedStoreCache(fake_redis, prefix="p:"), ttl=30))
+        principal = TokenData(id=7, username="stale", is_superuser=False, active=True)
+        # Un request lee la versión y la fila; un delete concurrente invalida antes de que guarde
+        version = cache.version(7)
+        cache.invalidate(7)
+        cache.set(principal, version)
+        assert cache.get(7) is None
+
+
+    def test_authenticated_requests_hit_cache(self, test_client):
+        user_id, headers = login(test_client)
+        hits = principal_cache.cache.hits.value
+        misses = principal_cache.cache.misses.value
+        test_client.get(f"/users/{user_id}", headers=headers)
+        test_client.get(f"/users/{user_id}", headers=headers)
+        assert principal_cache.cache.misses.value == misses + 1
+        assert principal_cache.cache.hits.value == hits + 1
+
+
+    def test_update_invalidates_principal(self, test_client):
+        user_id, headers = login(test_client)
+        test_client.get(f"/users/{user_id}", headers=headers)
+        assert principal_cache.get(user_id) is not None
+        response = test_client.put(f"/users/{user_id}", json={"address": "new address"}, headers=headers)
+        assert response.status_code == 200, f"Error: {response.json()}"
+        assert principal_cache.get(user_id) is None
+
+
+    def test_deleted_user_is_rejected(self, test_client):
+        user_id, headers = login(test_client)
+        test_client.get(f"/users/{user_id}", headers=headers)
+        response = test_client.delete(f"/users/{user_id}", headers=headers)
+        assert response.status_code == 204
+        response = test_client.get(f"/users/{user_id}", headers=headers)
+        assert response.status_code == 401
+
+
+    def test_memory_backend_refused_with_several_workers(self):
+        env = {"SECRET_KEY": "secret", "WEB_CONCURRENCY": "4"}
+        # Sin definir: cae a none en lugar de una cache por worker
+        assert Settings.from_env(env).PRINCIPAL_CACHE_BACKEND == "none"
+        assert Settings.from_env({**env, "WEB_CONCURRENCY": "1"}).PRINCIPAL_CACHE_BACKEND == "memory"
+        assert Settings.from_env({**env, "PRINCIPAL_CACHE_BACKEND": "redis"}).PRINCIPAL_CACHE_BACKEND == "redis"
+        with pytest.raises(ValidationError, match="PRINCIPAL_CACHE_BACKEND=memory"):
+            Settings.from_env({**env, "PRINCIPAL_CACHE_BACKEND": "memory"})
+        with pytest.raises(ValidationError, match="RESPONSE_CACHE_BACKEND=memory"):
+            Settings.from_env({**env, "RESPONSE_CACHE_BACKEND": "memory"})
+        with pytest.raises(ValidationError, match="USERNAME_FILTER_BACKEND=memory"):
+            Settings.from_env({**env, "USERNAME_FILTER_BACKEND": "memory"})
+        assert Settings.from_env({**env, "WEB_CONCURRENCY": "1", "RESPONSE_CACHE_BACKEND": "memory"})
@@ -0,0 +1,99 @@
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import RateLimitExceededError
+from app.core.instrumentation import sql_trace
+from app.utils import hashing
+from app.utils.rate_limit import (
+    InMemoryRateLimitBackend, RateLimiter, SharedStoreRateLimitBackend, rate_limit_throttled,
+)
+from test.conftest import TEST_USER
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def limiter_backends(fake_redis, clock):
+    fake_redis.now = clock.now
+    return [InMemoryRateLimitBackend(max_keys=16), SharedStoreRateLimitBackend(fake_redis)]
+
+
+class TestRateLimiter:
+
+    @pytest.mark.parametrize("backend_index", [0, 1])
+    def test_sliding_window(self, fake_redis, backend_index):
+        clock = Clock(1000.0)
+        backend = limiter_backends(fake_redis, clock)[backend_index]
+        limiter = RateLimiter("test", backend, window=60, clock=clock)
+        for _ in range(3):
+            limiter.check("ip", "1.2.3.4", limit=3)
+        with pytest.raises(RateLimitExceededError) as e:
+            limiter.check("ip", "1.2.3.4", limit=3)
+        assert 0 < e.value.retry_after <= 60
+        # Otra clave tiene su propio contador
+        limiter.check("ip", "5.6.7.8", limit=3)
+        # En la ventana siguiente los hits anteriores pesan según el solapamiento
+        clock.now = 1030.0
+        fake_redis.now = clock.now
+        with pytest.raises(RateLimitExceededError):
+            limiter.check("ip", "1.2.3.4", limit=3)
+        clock.now = 1200.0
+        fake_redis.now = clock.now
+        limiter.check("ip", "1.2.3.4", limit=3)
+
+
+    def test_reset(self):
+        limiter = RateLimiter("test", InMemoryRateLimitBackend(), window=60, clock=Clock(10.0))
+        for _ in range(2):
+            limiter.check("username", "user", limit=2)
+        limiter.reset("username", "user")
+        limiter.check("username", "user", limit=2)
+
+
+class TestLoginThrottling:
+
+    def test_throttled_login_skips_database_and_hashing(self, test_client, monkeypatch):
+        test_client.post("/users/", json=TEST_USER)
+        wrong = {"username": TEST_USER['username'], "password": "wrongpassword"}
+        for _ in range(settings.LOGIN_RATE_LIMIT_PER_USERNAME):
+            assert test_client.post("/auth/login", data=wrong).status_code == 401
+
+        def fail_verify(*args, **kwargs):
+            raise AssertionError("a throttled login must not hash")
+
+        monkeypatch.setattr(hashing.pwd_context, "verify_and_update", fail_verify)
+        reports = []
+        sql_trace.subscribe(reports.append)
+        throttled = rate_limit_throttled.labels("login", "username").value
+        try:
+            # Otra capitalización del mismo username comparte el límite
+            response = test_client.post("/auth/login", data={**wrong, "username": TEST_USER['username'].upper()})
+        finally:
+            sql_trace.unsubscribe(reports.append)
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) > 0
+        assert reports[-1].queries == 0
+        assert rate_limit_throttled.labels("login", "username").value == throttled + 1
+
+
+    def test_successful_login_resets_username_limit(self, test_client):
+        test_client.post("/users/", json=TEST_USER)
+        credentials = {"username": TEST_USER['username'], "password": TEST_USER['password']}
+        wrong = {**credentials, "password": "wrongpassword"}
+        for _ in range(settings.LOGIN_RATE_LIMIT_PER_USERNAME - 1):
+            test_client.post("/auth/login", data=wrong)
+        assert test_client.post("/auth/login", data=credentials).status_code == 200
+        assert test_client.post("/auth/login", data=wrong).status_code == 401
+
+
+    def test_ip_limit(self, test_client, monkeypatch):
+        monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 2)
+        for i in range(2):
+            test_client.post("/auth/login", data={"username": f"nobody{i}", "password": "whatever1"})
+        response = test_client.post("/auth/login", data={"username": "nobody", "password": "whatever1"})
+        assert response.status_code == 429
@@ -0,0 +1,64 @@
+from app.models.user import User
+from app.utils import hashing
+from test.conftest import TEST_USER, TestingSessionLocal
+
+
+def login(test_client):
+    test_client.post("/users/", json=TEST_USER)
+    response = test_client.post(
+        "/auth/login", data={"username": TEST_USER['username'], "password": TEST_USER['password']}
+    )
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+class TestRefreshToken:
+
+    def test_refresh_rotates_without_hashing(self, test_client, monkeypatch):
+        tokens = login(test_client)
+        assert tokens['refresh_token']
+
+        def fail_verify(*args, **kwargs):
+            raise AssertionError("refresh should not verify passwords")
+
+        monkeypatch.setattr(hashing.pwd_context, "verify_and_update", fail_verify)
+        response = test_client.post("/auth/refresh", json={"refresh_token": tokens['refresh_token']})
+        assert response.status_code == 200, response.json()
+        rotated = response.json()
+        assert rotated['refresh_token'] != tokens['refresh_token']
+        users = test_client.get("/users/", headers={"Authorization": f"Bearer {rotated['access_token']}"})
+        assert users.status_code == 200
+
+
+    def test_reuse_revokes_the_family(self, test_client):
+        tokens = login(test_client)
+        rotated = test_client.post("/auth/refresh", json={"refresh_token": tokens['refresh_token']}).json()
+        reused = test_client.post("/auth/refresh", json={"refresh_token": tokens['refresh_token']})
+        assert reused.status_code == 401
+        # El token emitido por la rotación también queda revocado
+        descendant = test_client.post("/auth/refresh", json={"refresh_token": rotated['refresh_token']})
+        assert descendant.status_code == 401
+
+
+    def test_token_types_are_not_interchangeable(self, test_client):
+        tokens = login(test_client)
+        as_access = test_client.get("/users/", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+        assert as_access.status_code == 401
+        as_refresh = test_client.post("/auth/refresh", json={"refresh_token": tokens['access_token']})
+        assert as_refresh.status_code == 401
+
+
+    def test_revoke(self, test_client):
+        tokens = login(test_client)
+        assert test_client.post("/auth/revoke", json={"refresh_token": tokens['refresh_token']}).status_code == 204
+        response = test_client.post("/auth/refresh", json={"refresh_token": tokens['refresh_token']})
+        assert response.status_code == 401
+
+
+    def test_inactive_user_cannot_refresh(self, test_client):
+        tokens = login(test_client)
+        with TestingSessionLocal() as db:
+            db.query(User).filter(User.username == TEST_USER['username']).update({"active": False})
+            db.commit()
+        response = test_client.post("/auth/refresh", json={"refresh_token": tokens['refresh_token']})
+        assert response.status_code == 401
@@ -0,0 +1,68 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api.v1.endpoints.auth import auth_router
+from app.api.v1.endpoints.user import user_router
+from app.core.instrumentation import MetricsMiddleware, query_budget, query_budget_exceeded, sql_trace
+from test.conftest import ENGINE_TEST, TEST_USER
+
+
+def traced_app():
+    """App mínima con rutas que violan su presupuesto a propósito"""
+    app = FastAPI()
+
+    @app.get("/two-queries")
+    @query_budget(1)
+    def two_queries():
+        with ENGINE_TEST.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {}
+
+    @app.get("/n-plus-one")
+    @query_budget(None)
+    def n_plus_one():
+        with ENGINE_TEST.connect() as conn:
+            for user_id in range(3):
+                conn.execute(text("SELECT :id"), {"id": user_id})
+        return {}
+
+    app.add_middleware(MetricsMiddleware)
+    return TestClient(app)
+
+
+class TestSqlBudget:
+
+    def test_every_endpoint_declares_budget(self):
+        for route in [*user_router.routes, *auth_router.routes]:
+            assert hasattr(route.endpoint, "__query_budget__"), f"{route.path} has no query budget"
+
+
+    def test_over_budget_is_reported(self, sql_budget):
+        exceeded = query_budget_exceeded.labels("GET", "/two-queries").value
+        traced_app().get("/two-queries")
+        assert sql_budget == ["GET /two-queries ran 2 SQL statements, budget is 1"]
+        assert query_budget_exceeded.labels("GET", "/two-queries").value == exceeded + 1
+        sql_budget.clear()
+
+
+    def test_repeated_statement_is_reported(self, sql_budget):
+        traced_app().get("/n-plus-one")
+        assert len(sql_budget) == 1 and "ran 3 times: SELECT ?" in sql_budget[0]
+        sql_budget.clear()
+
+
+    def test_update_query_count(self, auth_token, test_client):
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        user_id = test_client.get("/users/", headers=headers).json()['data'][0]['id']
+        reports = []
+        sql_trace.subscribe(reports.append)
+        try:
+            response = test_client.put(f"/users/{user_id}", json={"address": "new"}, headers=headers)
+        finally:
+            sql_trace.unsubscribe(reports.append)
+        assert response.status_code == 200
+        # Con el principal en cache, el PUT es un único UPDATE ... RETURNING
+        assert [report.queries for report in reports] == [1]
+        assert TEST_USER['username'] == response.json()['username']
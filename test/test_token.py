@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from app.utils import token as token_module
+from app.utils.oauth import OAuth
+from app.utils.token import Token, VerifiedTokenCache
+
+CLAIMS = {"sub": "tokenuser", "id": 3, "is_superuser": False, "active": True}
+
+
+class TestVerifiedTokenCache:
+
+    def test_cached_token_skips_decode(self, monkeypatch):
+        oauth = OAuth(Token(), VerifiedTokenCache(max_size=8))
+        token = Token.generate_token(CLAIMS)
+        first = oauth.get_current_user(token)
+
+        def fail_decode(*args, **kwargs):
+            raise AssertionError("decode should not run for a cached token")
+
+        monkeypatch.setattr(token_module.jwt, "decode", fail_decode)
+        assert oauth.get_current_user(token) == first
+        assert first.username == CLAIMS['sub']
+
+
+    def test_entry_expires_at_token_exp(self):
+        cache = VerifiedTokenCache(max_size=8)
+        token = Token.generate_token(CLAIMS)
+        token_data = Token.verify_token(token, Exception())
+        cache.set(token, token_data, time.time() - 1)
+        assert cache.get(token) is None
+        cache.set(token, token_data, time.time() + 60)
+        assert cache.get(token) == token_data
+
+
+    def test_invalid_token_is_not_cached(self):
+        cache = VerifiedTokenCache(max_size=8)
+        oauth = OAuth(Token(), cache)
+        tampered = Token.generate_token(CLAIMS) + "x"
+        with pytest.raises(Exception):
+            oauth.get_current_user(tampered)
+        assert cache.get(tampered) is None
+
+
+    def test_only_misses_are_timed_and_counted(self):
+        cache = VerifiedTokenCache(max_size=8)
+        oauth = OAuth(Token(), cache)
+        token = Token.generate_token(CLAIMS)
+        timed_before = token_module.token_verify_seconds.count
+        hits, misses = cache.cache.hits.value, cache.cache.misses.value
+        for _ in range(3):
+            oauth.get_current_user(token)
+        assert token_module.token_verify_seconds.count - timed_before == 1
+        assert cache.cache.misses.value - misses == 1
+        assert cache.cache.hits.value - hits == 2
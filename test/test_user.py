@@ -57,3 +57,15 @@ class TestUserAPI:
         response = test_client.get(f"/users/{user_id}", headers={"Authorization": f"Bearer {jwt}"})
         assert response.json()['username'] == "asd"
         assert response.json()['address'] == "fabian address"
+
+
+    def test_write_responses_expose_public_fields(self, test_client):
+        created = test_client.post("/users/", json=USER)
+        assert created.headers["content-type"] == "application/json"
+        assert set(created.json()) == {"id", "username", "email", "address"}
+        res = test_client.post("/auth/login", data={"username": USER['username'], "password": USER['password']})
+        jwt = res.json()['access_token']
+        updated = test_client.put(
+            f"/users/{created.json()['id']}", json={"address": "new address"}, headers={"Authorization": f"Bearer {jwt}"}
+        )
+        assert updated.json() == {**created.json(), "address": "new address"}
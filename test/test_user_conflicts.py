@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from app.core.exceptions import ItemNotFoundError, UserAlreadyExistsError
+from app.repositories.user_respository import UserRepository
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.user_service import UserService
+from test.conftest import TestingSessionLocal
+
+
+def new_user(i, username=None):
+    return UserCreate(email=f"conflict{i}@prueba.com", username=username or f"conflict{i}", password="conflictpass")
+
+
+def run_concurrently(calls):
+    """Ejecuta cada llamada con su propia sesión, liberándolas juntas, y devuelve los resultados en orden"""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(index, call):
+        with TestingSessionLocal() as db:
+            service = UserService(UserRepository(db))
+            barrier.wait()
+            try:
+                results[index] = call(service)
+            except Exception as e:
+                results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestUniqueConflicts:
+
+    def test_update_to_taken_email(self, test_client):
+        first = test_client.post("/users/", json=new_user(0).model_dump()).json()
+        test_client.post("/users/", json=new_user(1).model_dump())
+        token = test_client.post(
+            "/auth/login", data={"username": first['username'], "password": "conflictpass"}
+        ).json()['access_token']
+
+        response = test_client.put(
+            f"/users/{first['id']}", json={"email": "conflict1@prueba.com"}, headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 409, f"Error: {response.json()}"
+        assert "email" in response.json()['detail']
+
+
+    def test_update_missing_user(self):
+        with TestingSessionLocal() as db:
+            with pytest.raises(ItemNotFoundError):
+                UserRepository(db).update(12345, UserUpdate(address="nowhere"))
+
+
+    def test_concurrent_creates(self):
+        results = run_concurrently([
+            lambda service, i=i: service.create_user(new_user(i, username="samename")) for i in range(4)
+        ])
+        created = [r for r in results if not isinstance(r, Exception)]
+        conflicts = [r for r in results if isinstance(r, UserAlreadyExistsError)]
+        assert len(created) == 1 and len(conflicts) == 3, results
+        assert all(conflict.field == "username" for conflict in conflicts)
+
+
+    def test_concurrent_renames(self):
+        with TestingSessionLocal() as db:
+            ids = [UserRepository(db).add(new_user(i)).id for i in range(2)]
+
+        results = run_concurrently([
+            lambda service, user_id=user_id: service.update_user(user_id, UserUpdate(username="takenname"))
+            for user_id in ids
+        ])
+        assert sum(isinstance(r, UserAlreadyExistsError) for r in results) == 1, results
+        assert sum(getattr(r, "username", None) == "takenname" for r in results) == 1, results
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import event
+
+from app.utils import hashing
+from app.utils.username_filter import (
+    BloomFilter, InMemoryBitStore, SharedStoreBitStore, UsernameFilter, username_filter_rejected,
+)
+from app.core.instrumentation import sql_trace
+from test.conftest import ENGINE_TEST, FakeRedis, TEST_USER, TestingSessionLocal
+
+
+@pytest.fixture
+def memory_filter(monkeypatch):
+    """Filtro en memoria instalado en los repositorios, sin construir"""
+    bloom = BloomFilter(1000, 0.01)
+    usernames = UsernameFilter(bloom, InMemoryBitStore(bloom.size))
+    for module in ("app.repositories.auth_repository", "app.repositories.user_respository"):
+        monkeypatch.setattr(f"{module}.username_filter", usernames)
+    return usernames
+
+
+def _count_dummy_verifies(monkeypatch) -> list:
+    calls = []
+    dummy_verify = hashing.pwd_context.dummy_verify
+    monkeypatch.setattr(hashing.pwd_context, "dummy_verify", lambda: calls.append(1) or dummy_verify())
+    return calls
+
+
+class TestBloomFilter:
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(2000, 0.01)
+        store = InMemoryBitStore(bloom.size)
+        store.merge(bloom.bits_of(f"user{i}" for i in range(2000))[0])
+        assert all(store.all_set(bloom.positions(f"user{i}")) for i in range(2000))
+        false_positives = sum(store.all_set(bloom.positions(f"other{i}")) for i in range(10000))
+        assert false_positives < 200
+
+
+    def test_shared_store_uses_the_same_bit_layout(self):
+        bloom = BloomFilter(100, 0.01)
+        shared = SharedStoreBitStore(FakeRedis(), key="usernames")
+        shared.merge(bloom.bits_of(["alice"])[0])
+        shared.set_bits(bloom.positions("bob"))
+        # Otro rebuild no borra los bits agregados entre medio
+        shared.merge(bloom.bits_of(["alice"])[0])
+        assert shared.all_set(bloom.positions("alice"))
+        assert shared.all_set(bloom.positions("bob"))
+        assert not shared.all_set(bloom.positions("carol"))
+
+
+class TestConstantTimeLogin:
+
+    def test_unknown_username_costs_a_verification(self, test_client, monkeypatch):
+        test_client.post("/users/", json=TEST_USER)
+        dummy_verifies = _count_dummy_verifies(monkeypatch)
+
+        unknown = test_client.post("/auth/login", data={"username": "nobody", "password": "whatever1"})
+        wrong = test_client.post("/auth/login", data={"username": TEST_USER['username'], "password": "wrong1"})
+        assert unknown.status_code == wrong.status_code == 401
+        assert unknown.json() == wrong.json()
+        assert len(dummy_verifies) == 1
+
+
+    def test_login_projects_the_credential_columns(self, test_client):
+        test_client.post("/users/", json=TEST_USER)
+        statements = []
+        capture = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(ENGINE_TEST, "before_cursor_execute", capture)
+        try:
+            response = test_client.post(
+                "/auth/login", data={"username": TEST_USER['username'], "password": TEST_USER['password']}
+            )
+        finally:
+            event.remove(ENGINE_TEST, "before_cursor_execute", capture)
+        assert response.status_code == 200
+        lookup = next(statement for statement in statements if statement.lstrip().startswith("SELECT"))
+        assert "users.password" in lookup
+        assert "address" not in lookup and "email" not in lookup
+
+
+    def test_filter_rejects_unknown_usernames_without_a_query(self, test_client, memory_filter, monkeypatch):
+        test_client.post("/users/", json=TEST_USER)
+        # Sin construir deja pasar todo
+        assert memory_filter.might_exist("nobody")
+        assert memory_filter.rebuild_from_db(TestingSessionLocal) == 1
+
+        dummy_verifies = _count_dummy_verifies(monkeypatch)
+        rejected = username_filter_rejected.value
+        reports = []
+        sql_trace.subscribe(reports.append)
+        try:
+            response = test_client.post("/auth/login", data={"username": "nobody", "password": "whatever1"})
+        finally:
+            sql_trace.unsubscribe(reports.append)
+        assert response.status_code == 401
+        assert reports[-1].queries == 0
+        assert len(dummy_verifies) == 1
+        assert username_filter_rejected.value == rejected + 1
+
+
+    def test_users_created_after_the_rebuild_can_log_in(self, test_client, memory_filter):
+        memory_filter.rebuild_from_db(TestingSessionLocal)
+        test_client.post("/users/", json=TEST_USER)
+        response = test_client.post(
+            "/auth/login", data={"username": TEST_USER['username'], "password": TEST_USER['password']}
+        )
+        assert response.status_code == 200, response.json()